@@ -28,6 +28,9 @@ _BUILD_OPTION_NAMES = [
     '--enable-geoip',
     '--no-parallel-builds',
     '--target-arch',
+    '--offline',
+    '--refresh-package-indexes',
+    '--local-mirror',
 ]
 
 _BUILD_OPTIONS = [
@@ -38,6 +41,16 @@ _BUILD_OPTIONS = [
          help='Force a sequential build.'),
     dict(metavar='<arch>',
          help='Target architecture to cross compile to'),
+    dict(is_flag=True,
+         help=('Only use the package indexes and stage-packages already '
+               'in the cache.')),
+    dict(is_flag=True,
+         help=('Update the package indexes for stage-packages, even if '
+               'they were updated recently.')),
+    dict(metavar='<dir>',
+         type=click.Path(exists=True, file_okay=False),
+         help=('Get stage-packages only from the .deb files in this '
+               'directory, such as a copy of the stage-packages cache.')),
 ]
 
 
@@ -62,5 +75,8 @@ def get_project_options(**kwargs):
         debug=kwargs.pop('debug'),
         use_geoip=kwargs.pop('enable_geoip'),
         parallel_builds=not kwargs.pop('no_parallel_builds'),
-        target_deb_arch=kwargs.pop('target_arch'))
+        target_deb_arch=kwargs.pop('target_arch'),
+        offline=kwargs.pop('offline'),
+        local_mirror=kwargs.pop('local_mirror'),
+        refresh_package_indexes=kwargs.pop('refresh_package_indexes'))
     return project
@@ -23,6 +23,7 @@ import click
 import snapcraft
 from snapcraft.internal import log
 from .assertions import assertionscli
+from .cache import cachecli
 from .containers import containerscli
 from .discovery import discoverycli
 from .lifecycle import lifecyclecli
@@ -40,6 +41,7 @@ command_groups = [
     storecli,
     cicli,
     assertionscli,
+    cachecli,
     containerscli,
     discoverycli,
     helpcli,
@@ -0,0 +1,94 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+import click
+from tabulate import tabulate
+
+from snapcraft.internal import cache as _cache
+
+
+_DEFAULT_MAX_SIZE = '10G'
+
+
+@click.group()
+def cachecli():
+    pass
+
+
+@cachecli.group()
+def cache():
+    """Inspect and prune the snapcraft caches."""
+
+
+@cache.command()
+def stats():
+    """Show the size, age and hit rate of each cache.
+
+    Examples:
+        snapcraft cache stats
+    """
+    now = time.time()
+    rows = []
+    for stats in _cache.CacheManager().get_stats():
+        lookups = stats.hits + stats.misses
+        rows.append([
+            stats.namespace,
+            stats.entries,
+            _format_size(stats.size),
+            _format_age(now, stats.oldest),
+            _format_age(now, stats.newest),
+            '{:.0%}'.format(stats.hits / lookups) if lookups else '-',
+        ])
+    click.echo(tabulate(rows, headers=[
+        'Cache', 'Entries', 'Size', 'Oldest', 'Newest', 'Hit rate'],
+        tablefmt='plain'))
+
+
+@cache.command()
+@click.option('--max-size', metavar='<size>', default=_DEFAULT_MAX_SIZE,
+              envvar=_cache.MAX_SIZE_ENVVAR, show_default=True,
+              help='Size to shrink the caches to, such as 500M or 10G.')
+def prune(max_size):
+    """Evict the least recently used cache entries.
+
+    Examples:
+        snapcraft cache prune
+        snapcraft cache prune --max-size 2G
+    """
+    pruned = _cache.CacheManager().prune(max_size=_cache.parse_size(max_size))
+    click.echo('Pruned {} entries, freeing {}.'.format(
+        len(pruned), _format_size(sum(e.size for e in pruned))))
+
+
+def _format_size(size):
+    if size < 1024:
+        return '{} B'.format(size)
+    for unit in ('KiB', 'MiB', 'GiB', 'TiB'):
+        size /= 1024
+        if size < 1024 or unit == 'TiB':
+            return '{:.1f} {}'.format(size, unit)
+
+
+def _format_age(now, timestamp):
+    if timestamp is None:
+        return '-'
+    age = max(now - timestamp, 0)
+    for unit, seconds in (('d', 86400), ('h', 3600), ('m', 60)):
+        if age >= seconds:
+            return '{}{}'.format(int(age // seconds), unit)
+    return '{}s'.format(int(age))
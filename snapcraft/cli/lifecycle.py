@@ -115,13 +115,18 @@ def prime(parts, **kwargs):
 @add_build_options()
 @click.argument('directory', required=False)
 @click.option('--output', '-o', help='path to the resulting snap.')
-def snap(directory, output, **kwargs):
+@click.option('--profile', type=click.Choice(list(lifecycle.PACK_PROFILES)),
+              default='store', show_default=True,
+              help="compression settings, 'dev' trades size for speed "
+                   "and creates snaps the store does not accept.")
+def snap(directory, output, profile, **kwargs):
     """Create a snap.
 
     \b
     Examples:
         snapcraft snap
         snapcraft snap --output renamed-snap.snap
+        snapcraft snap --profile dev
 
     If you want to snap a directory, you should use the pack command
     instead.
@@ -132,18 +137,26 @@ def snap(directory, output, **kwargs):
     project_options = get_project_options(**kwargs)
     container_config = env.get_container_config()
     if container_config.use_container:
+        args = [directory] if directory else []
+        if profile != 'store':
+            args += ['--profile', profile]
         lifecycle.containerbuild('snap', project_options,
-                                 container_config, output, directory)
+                                 container_config, output, args)
     else:
         snap_name = lifecycle.snap(
-            project_options, directory=directory, output=output)
+            project_options, directory=directory, output=output,
+            profile=profile)
         echo.info('Snapped {}'.format(snap_name))
 
 
 @lifecyclecli.command()
 @click.argument('directory')
 @click.option('--output', '-o', help='path to the resulting snap.')
-def pack(directory, output, **kwargs):
+@click.option('--profile', type=click.Choice(list(lifecycle.PACK_PROFILES)),
+              default='store', show_default=True,
+              help="compression settings, 'dev' trades size for speed "
+                   "and creates snaps the store does not accept.")
+def pack(directory, output, profile, **kwargs):
     """Create a snap from a directory holding a valid snap.
 
     The layout of <directory> should contain a valid meta/snap.yaml in
@@ -153,9 +166,10 @@ def pack(directory, output, **kwargs):
     Examples:
         snapcraft pack my-snap-directory
         snapcraft pack my-snap-directory --output renamed-snap.snap
+        snapcraft pack my-snap-directory --profile dev
 
     """
-    snap_name = lifecycle.pack(directory, output)
+    snap_name = lifecycle.pack(directory, output, profile)
     echo.info('Snapped {}'.format(snap_name))
 
 
@@ -21,11 +21,18 @@ import logging
 import re
 import os
 import shutil
+import stat
 import subprocess
 import sys
 from typing import Pattern, Callable, Generator, List
 from typing import Set  # noqa F401
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where there is no reflinking either.
+    fcntl = None
+
 from snapcraft.internal import common
 from snapcraft.internal.errors import (
     RequiredCommandFailure,
@@ -40,6 +47,9 @@ if sys.version_info < (3, 6):
 
 logger = logging.getLogger(__name__)
 
+# The FICLONE ioctl from linux/fs.h
+_FICLONE = 0x40049409
+
 
 def replace_in_file(directory: str, file_pattern: Pattern,
                     search_pattern: Pattern,
@@ -75,23 +85,42 @@ def search_and_replace_contents(file_path: str,
     :param str replacement: The string to replace pattern.
     """
     try:
-        with open(file_path, 'r+') as f:
+        with open(file_path) as f:
             try:
                 original = f.read()
             except UnicodeDecodeError:
                 # This was probably a binary file. Skip it.
                 return
 
-            replaced = search_pattern.sub(replacement, original)
-            if replaced != original:
-                f.seek(0)
-                f.truncate()
+        replaced = search_pattern.sub(replacement, original)
+        if replaced != original:
+            # Do not write through to trees the file is linked from, such as
+            # the unpacked stage-packages cache.
+            break_hard_link(os.path.realpath(file_path))
+            with open(file_path, 'w') as f:
                 f.write(replaced)
     except PermissionError as e:
         logger.warning('Unable to open {path} for writing: {error}'.format(
             path=file_path, error=e))
 
 
+def break_hard_link(path: str) -> None:
+    """Replace path with a writable copy of itself if it is hard-linked.
+
+    Call before modifying a file in place that may share its contents with
+    another tree.
+
+    :param str path: path to the file.
+    """
+    with suppress(FileNotFoundError):
+        file_stat = os.stat(path, follow_symlinks=False)
+        if stat.S_ISREG(file_stat.st_mode) and file_stat.st_nlink > 1:
+            copy_path = path + '.snapcraft-copy'
+            shutil.copy2(path, copy_path)
+            os.chmod(copy_path, stat.S_IMODE(file_stat.st_mode) | stat.S_IWUSR)
+            os.replace(copy_path, path)
+
+
 def link_or_copy(source: str, destination: str,
                  follow_symlinks: bool=False) -> None:
     """Hard-link source and destination files. Copy if it fails to link.
@@ -142,6 +171,71 @@ def link_or_copy(source: str, destination: str,
                     destination=destination, error=e))
 
 
+def clone_or_link(source: str, destination: str) -> None:
+    """Reflink source to destination. Hard-link or copy if it fails to clone.
+
+    A reflink shares the data blocks of source but is otherwise a copy of its
+    own, filesystems without support for it will get a hard-link instead.
+    An existing destination is replaced.
+
+    :param str source: The file to clone.
+    :param str destination: The path for the clone.
+    """
+    with suppress(FileNotFoundError):
+        os.unlink(destination)
+
+    try:
+        _reflink(source, destination)
+        return
+    except OSError as e:
+        logger.debug('Unable to reflink {source}: {error}'.format(
+            source=source, error=e))
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def clone_or_copy(source: str, destination: str) -> None:
+    """Reflink source to destination. Copy if it fails to clone.
+
+    Unlike with clone_or_link, destination never shares its inode with
+    source and can be modified without changing source. Symlinks are copied
+    as symlinks. An existing destination is replaced.
+
+    :param str source: The file to clone.
+    :param str destination: The path for the clone.
+    """
+    with suppress(FileNotFoundError):
+        os.unlink(destination)
+
+    if not os.path.islink(source):
+        try:
+            _reflink(source, destination)
+            return
+        except OSError as e:
+            logger.debug('Unable to reflink {source}: {error}'.format(
+                source=source, error=e))
+
+    shutil.copy2(source, destination, follow_symlinks=False)
+
+
+def _reflink(source: str, destination: str) -> None:
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, 'reflinks are not supported')
+
+    with open(source, 'rb') as source_file:
+        with open(destination, 'xb') as destination_file:
+            try:
+                fcntl.ioctl(destination_file.fileno(), _FICLONE,
+                            source_file.fileno())
+            except OSError:
+                os.unlink(destination)
+                raise
+    shutil.copystat(source, destination)
+
+
 def link_or_copy_tree(source_tree: str, destination_tree: str,
                       ignore: Callable[[str, List[str]], List[str]]=None,
                       copy_function: Callable[..., None]=link_or_copy) -> None:
@@ -289,6 +383,26 @@ def calculate_hash(path: str, *, algorithm: str) -> str:
     return hasher.hexdigest()
 
 
+class HashingWriter:
+    """Write to a binary file object, hashing the data as it is written."""
+
+    def __init__(self, fileobj, *, algorithm: str) -> None:
+        # This will raise an AttributeError if algorithm is unsupported
+        self._hasher = getattr(hashlib, algorithm)()
+        self._fileobj = fileobj
+
+    def write(self, data: bytes) -> int:
+        self._hasher.update(data)
+        return self._fileobj.write(data)
+
+    def update(self, data: bytes) -> None:
+        """Hash data that is already in the file."""
+        self._hasher.update(data)
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
 def get_tool_path(command_name):
     """Return the path to the given command
 
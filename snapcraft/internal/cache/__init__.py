@@ -15,6 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from ._apt import AptStagePackageCache  # noqa
+from ._apt import AptUnpackedPackageCache  # noqa
 from ._cache import SnapcraftCache      # noqa
+from ._compiler import CompilerCache    # noqa
 from ._file import FileCache            # noqa
+from ._git import GitMirrorCache        # noqa
+from ._manager import CacheManager      # noqa
+from ._manager import MAX_SIZE_ENVVAR   # noqa
+from ._manager import get_max_size      # noqa
+from ._manager import parse_size        # noqa
 from ._snap import SnapCache            # noqa
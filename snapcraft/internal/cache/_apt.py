@@ -16,6 +16,9 @@
 
 import logging
 import os
+import shutil
+import tempfile
+from typing import Optional
 
 from ._cache import SnapcraftStagePackageCache
 
@@ -25,6 +28,9 @@ logger = logging.getLogger(__name__)
 class AptStagePackageCache(SnapcraftStagePackageCache):
     """Cache for stage-packages coming from apt."""
 
+    namespace = 'stage-packages'
+    entries_glob = os.path.join('stage-packages', 'apt', '*')
+
     def __init__(self, *, sources_digest):
         """Create a new AptStagePackageCache.
 
@@ -34,10 +40,60 @@ class AptStagePackageCache(SnapcraftStagePackageCache):
         super().__init__()
         cache_base_dir = os.path.join(self.stage_package_cache_root, 'apt')
 
-        # TODO: Clean old cache, LP: #1663051
-
+        # A new digest is created for every change to the sources, old ones
+        # are evicted by the CacheManager once they are no longer used.
         self.base_dir = os.path.join(
             cache_base_dir, sources_digest)
         self.packages_dir = os.path.join(
             self.base_dir, 'var', 'cache', 'apt', 'archives')
+        self._record_lookup(hit=os.path.isdir(self.base_dir))
         os.makedirs(self.packages_dir, exist_ok=True)
+        self._mark_used(self.base_dir)
+
+
+class AptUnpackedPackageCache(SnapcraftStagePackageCache):
+    """Cache of unpacked and normalized stage-packages.
+
+    Each entry is the tree extracted from a .deb, identified by a key that
+    the caller derives from the contents of the .deb. Entries are meant to
+    be cloned into place, never modified.
+    """
+
+    namespace = 'unpacked-stage-packages'
+    # Skip the trees still being unpacked.
+    entries_glob = os.path.join('stage-packages', 'apt-unpacked', '[!.]*')
+
+    def __init__(self):
+        super().__init__()
+        self.unpacked_dir = os.path.join(
+            self.stage_package_cache_root, 'apt-unpacked')
+        os.makedirs(self.unpacked_dir, exist_ok=True)
+
+    def get(self, *, key: str) -> Optional[str]:
+        """Return the path to the tree cached for key or None."""
+        tree = os.path.join(self.unpacked_dir, key)
+        if os.path.isdir(tree):
+            self._record_lookup(hit=True)
+            self._mark_used(tree)
+            return tree
+        self._record_lookup(hit=False)
+        return None
+
+    def new_tree(self) -> str:
+        """Return a new empty directory to unpack a package into."""
+        return tempfile.mkdtemp(prefix='.tmp-', dir=self.unpacked_dir)
+
+    def cache(self, *, key: str, tree: str) -> str:
+        """Move tree, created by new_tree, into the cache as key.
+
+        :returns: the path to the cached tree.
+        """
+        cached_tree = os.path.join(self.unpacked_dir, key)
+        try:
+            os.rename(tree, cached_tree)
+        except OSError:
+            # Someone else cached the same package in the meantime.
+            if not os.path.isdir(cached_tree):
+                raise
+            shutil.rmtree(tree)
+        return cached_tree
@@ -14,16 +14,35 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import json
+import logging
 import os
+import threading
+from typing import Dict  # noqa: F401
 
 from xdg import BaseDirectory
 
+logger = logging.getLogger(__name__)
+
+# Hit and miss counters per namespace, relative to the cache root.
+_STATS_FILE = 'stats.json'
+
 
 class SnapcraftCache:
     """Generic cache base class.
 
     This class is responsible for cache location, notification and pruning.
+
+    Subclasses that want their entries accounted for and pruned by the
+    CacheManager set namespace and entries_glob, a glob relative to the
+    cache root that matches each entry, and call _mark_used and
+    _record_lookup as entries are used.
     """
+
+    namespace = None  # type: str
+    entries_glob = None  # type: str
+
     def __init__(self):
         self.cache_root = os.path.join(
             BaseDirectory.xdg_cache_home, 'snapcraft')
@@ -37,6 +56,46 @@ class SnapcraftCache:
     def prune(self, *args, **kwargs):
         raise NotImplementedError
 
+    def _mark_used(self, path: str) -> None:
+        """Stamp the modification time of path so pruning sees it as recent.
+
+        Access times are no good for this, merely walking the cache to
+        account for it can update them.
+        """
+        try:
+            os.utime(path)
+        except OSError as e:
+            logger.debug('Unable to mark {!r} as used: {}'.format(path, e))
+
+    def _record_lookup(self, *, hit: bool) -> None:
+        """Count a hit or a miss for the namespace of this cache."""
+        if not self.namespace:
+            return
+        stats = self._load_stats()
+        counters = stats.setdefault(self.namespace, dict(hits=0, misses=0))
+        counters['hits' if hit else 'misses'] += 1
+        stats_path = os.path.join(self.cache_root, _STATS_FILE)
+        # Concurrent snapcraft runs and pulls may race here, losing a count
+        # is fine but a torn file is not.
+        temp_path = '{}.{}.{}'.format(
+            stats_path, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(self.cache_root, exist_ok=True)
+            with open(temp_path, 'w') as stats_file:
+                json.dump(stats, stats_file)
+            os.replace(temp_path, stats_path)
+        except OSError as e:
+            logger.debug('Unable to record cache statistics: {}'.format(e))
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+
+    def _load_stats(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(os.path.join(self.cache_root, _STATS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
 
 class SnapcraftProjectCache(SnapcraftCache):
     """Project specific cache"""
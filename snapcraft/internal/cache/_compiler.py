@@ -0,0 +1,88 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+import re
+import subprocess
+from typing import List, Optional, Tuple  # noqa: F401
+
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+# Directory where the ccache package installs the compiler symlinks.
+_CCACHE_MASQUERADE_DIR = os.path.join(os.path.sep, 'usr', 'lib', 'ccache')
+
+# ccache 3.x prints one counter per kind of hit.
+_CCACHE3_HITS = re.compile(
+    r'^cache hit \((?:direct|preprocessed)\)\s+(\d+)', re.MULTILINE)
+_CCACHE3_MISSES = re.compile(r'^cache miss\s+(\d+)', re.MULTILINE)
+# ccache 4.x prints a summary, repeated for each storage backend.
+_CCACHE4_HITS = re.compile(r'^\s*Hits:\s+(\d+)', re.MULTILINE)
+_CCACHE4_MISSES = re.compile(r'^\s*Misses:\s+(\d+)', re.MULTILINE)
+
+
+class CompilerCache(SnapcraftCache):
+    """Persistent ccache directory shared by all the parts."""
+
+    def __init__(self):
+        super().__init__()
+        self.ccache_dir = os.path.join(self.cache_root, 'ccache')
+
+    def env(self) -> List[str]:
+        """Return the build environment entries to compile through ccache."""
+        return [
+            'CCACHE_DIR="{}"'.format(self.ccache_dir),
+            'PATH="{}:$PATH"'.format(_CCACHE_MASQUERADE_DIR),
+        ]
+
+    def zero_stats(self) -> None:
+        """Reset the statistics counters of the cache."""
+        self._run_ccache(['--zero-stats'])
+
+    def get_stats(self) -> Optional[Tuple[int, int]]:
+        """Return the hits and misses since the counters were last reset.
+
+        :returns: a (hits, misses) tuple or None if ccache could not report.
+        """
+        output = self._run_ccache(['--show-stats'])
+        if output is None:
+            return None
+
+        hits = _CCACHE3_HITS.findall(output)
+        misses = _CCACHE3_MISSES.search(output)
+        if hits and misses:
+            return sum(int(h) for h in hits), int(misses.group(1))
+
+        hits = _CCACHE4_HITS.search(output)
+        misses = _CCACHE4_MISSES.search(output)
+        if hits and misses:
+            return int(hits.group(1)), int(misses.group(1))
+
+        logger.debug('Could not parse ccache statistics: {!r}'.format(output))
+        return None
+
+    def _run_ccache(self, args: List[str]) -> Optional[str]:
+        env = os.environ.copy()
+        env['CCACHE_DIR'] = self.ccache_dir
+        try:
+            return subprocess.check_output(
+                ['ccache'] + args, env=env,
+                stderr=subprocess.STDOUT).decode()
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.debug('Failed to run ccache: {}'.format(e))
+            return None
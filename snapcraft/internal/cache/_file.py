@@ -15,9 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import logging
 import os
-import shutil
 
-from snapcraft.file_utils import calculate_hash
+from snapcraft.file_utils import calculate_hash, clone_or_link
 from ._cache import SnapcraftCache
 
 logger = logging.getLogger(__name__)
@@ -26,34 +25,44 @@ logger = logging.getLogger(__name__)
 class FileCache(SnapcraftCache):
     """Generic file cache."""
 
+    namespace = 'files'
+    entries_glob = os.path.join('files', '*', '*')
+
     def __init__(self):
         """Create a FileCache."""
         super().__init__()
         self.file_cache = os.path.join(self.cache_root, 'files')
 
-    def cache(self, *, filename, algorithm, hash):
+    def cache(self, *, filename, algorithm, hash, verify=True):
         """Cache a file revision with hash in XDG cache, unless it already exists.
+
+        The file is reflinked or hard-linked into the cache when possible, so
+        the cached copy is made read-only to keep it from being modified
+        through filename.
+
         :param str filename: path to the file to cache.
         :param str algorithm: algorithm used to calculate the hash as
                               understood by hashlib.
         :param str hash: hash for filename calculated with algorithm.
+        :param bool verify: whether to calculate the hash of filename to
+                            verify it, set to False if the caller already
+                            has.
         :returns: path to cached file.
         """
         # First we verify
-        calculated_hash = calculate_hash(filename, algorithm=algorithm)
-        if calculated_hash != hash:
-            logger.warning('Skipping caching of {!r} as the expected '
-                           'hash does not match the one '
-                           'provided'.format(filename))
-            return None
+        if verify:
+            calculated_hash = calculate_hash(filename, algorithm=algorithm)
+            if calculated_hash != hash:
+                logger.warning('Skipping caching of {!r} as the expected '
+                               'hash does not match the one '
+                               'provided'.format(filename))
+                return None
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
         os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
         try:
             if not os.path.isfile(cached_file_path):
-                # this must not be hard-linked, as rebuilding a snap
-                # with changes should invalidate the cache, hence avoids
-                # using fileutils.link_or_copy.
-                shutil.copyfile(filename, cached_file_path)
+                clone_or_link(filename, cached_file_path)
+                os.chmod(cached_file_path, 0o444)
         except OSError:
             logger.warning(
                 'Unable to cache file {}.'.format(cached_file_path))
@@ -71,6 +80,9 @@ class FileCache(SnapcraftCache):
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
         if os.path.exists(cached_file_path):
             logger.debug('Cache hit for hash {!r}'.format(hash))
+            self._record_lookup(hit=True)
+            self._mark_used(cached_file_path)
             return cached_file_path
         else:
+            self._record_lookup(hit=False)
             return None
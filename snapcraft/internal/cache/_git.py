@@ -0,0 +1,92 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where mirrors are not locked.
+    fcntl = None
+
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+
+class GitMirrorCache(SnapcraftCache):
+    """Bare mirrors of git remotes, shared by all the parts and projects.
+
+    Clones reference the mirror for their objects so only what is new
+    since the last pull of the remote, from any project, comes over the
+    network.
+    """
+
+    namespace = 'git-mirrors'
+    entries_glob = os.path.join('git-mirrors', '*.git')
+
+    def __init__(self):
+        super().__init__()
+        self.mirrors_dir = os.path.join(self.cache_root, 'git-mirrors')
+
+    def get_mirror_path(self, url: str) -> str:
+        """Return the path of the mirror for url, which may not exist yet."""
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.mirrors_dir, '{}.git'.format(key))
+
+    @contextlib.contextmanager
+    def update(self, url: str, *, command: str='git',
+               **call_kwargs) -> Iterator[str]:
+        """Bring the mirror for url up to date and hold it while in use.
+
+        The mirror is locked for the duration of the context so concurrent
+        pulls of the same remote take turns.
+
+        :param str url: the remote to mirror.
+        :param str command: the git command.
+        :param call_kwargs: passed on to subprocess.check_call.
+        :returns: the path to the bare mirror.
+        """
+        path = self.get_mirror_path(url)
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        with open(path + '.lock', 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if os.path.isdir(path):
+                self._record_lookup(hit=True)
+                subprocess.check_call(
+                    [command, '-C', path, 'fetch', '--prune', 'origin'],
+                    **call_kwargs)
+            else:
+                self._record_lookup(hit=False)
+                self._clone(url, path, command, call_kwargs)
+            self._mark_used(path)
+            yield path
+
+    def _clone(self, url, path, command, call_kwargs):
+        # Clone aside so an interrupted clone is never taken for a mirror.
+        partial_path = path + '.partial'
+        shutil.rmtree(partial_path, ignore_errors=True)
+        logger.debug('Creating a mirror of {!r} in {!r}'.format(url, path))
+        subprocess.check_call(
+            [command, 'clone', '--mirror', url, partial_path], **call_kwargs)
+        os.rename(partial_path, path)
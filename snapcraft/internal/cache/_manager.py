@@ -0,0 +1,163 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import glob
+import logging
+import os
+import re
+import shutil
+from typing import List, Optional  # noqa: F401
+
+from snapcraft.internal import errors
+from ._apt import AptStagePackageCache, AptUnpackedPackageCache
+from ._cache import SnapcraftCache
+from ._file import FileCache
+from ._git import GitMirrorCache
+from ._snap import SnapCache
+
+logger = logging.getLogger(__name__)
+
+# The caches the manager accounts for and prunes, the compiler cache is
+# left out as ccache bounds its own size.
+_MANAGED_CACHES = (
+    FileCache,
+    AptStagePackageCache,
+    AptUnpackedPackageCache,
+    SnapCache,
+    GitMirrorCache,
+)
+
+_SIZE_PATTERN = re.compile(r'^\s*(\d+)\s*([KMGT]?)i?B?\s*$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+# Budget applied after each lifecycle run when set.
+MAX_SIZE_ENVVAR = 'SNAPCRAFT_CACHE_MAX_SIZE'
+
+CacheEntry = collections.namedtuple(
+    'CacheEntry', ['namespace', 'path', 'size', 'last_used'])
+
+NamespaceStats = collections.namedtuple(
+    'NamespaceStats',
+    ['namespace', 'entries', 'size', 'oldest', 'newest', 'hits', 'misses'])
+
+
+def parse_size(size: str) -> int:
+    """Return the number of bytes in a size such as 500M or 10G.
+
+    :raises errors.InvalidCacheSizeError: if size cannot be parsed.
+    """
+    match = _SIZE_PATTERN.match(size)
+    if not match:
+        raise errors.InvalidCacheSizeError(size)
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+def get_max_size() -> Optional[int]:
+    """Return the size budget set in the environment, if any."""
+    size = os.environ.get(MAX_SIZE_ENVVAR)
+    if not size:
+        return None
+    return parse_size(size)
+
+
+class CacheManager(SnapcraftCache):
+    """Accounting and size-bounded pruning across the snapcraft caches.
+
+    Entries are evicted least recently used first, going by the
+    modification time the caches stamp on them as they are used.
+    """
+
+    def get_entries(self) -> List[CacheEntry]:
+        """Return the entries of every managed cache."""
+        entries = []
+        for cache_class in _MANAGED_CACHES:
+            pattern = os.path.join(self.cache_root, cache_class.entries_glob)
+            for path in glob.glob(pattern):
+                try:
+                    last_used = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                entries.append(CacheEntry(
+                    namespace=cache_class.namespace, path=path,
+                    size=_get_size(path), last_used=last_used))
+        return entries
+
+    def get_stats(self) -> List[NamespaceStats]:
+        """Return the usage and lookup counters of each managed cache."""
+        entries = self.get_entries()
+        counters = self._load_stats()
+        stats = []
+        for cache_class in _MANAGED_CACHES:
+            namespace = cache_class.namespace
+            used = [e.last_used for e in entries if e.namespace == namespace]
+            lookups = counters.get(namespace, dict())
+            stats.append(NamespaceStats(
+                namespace=namespace,
+                entries=len(used),
+                size=sum(e.size for e in entries if e.namespace == namespace),
+                oldest=min(used) if used else None,
+                newest=max(used) if used else None,
+                hits=lookups.get('hits', 0),
+                misses=lookups.get('misses', 0)))
+        return stats
+
+    def prune(self, *, max_size: int) -> List[CacheEntry]:
+        """Evict the least recently used entries until within max_size.
+
+        :param int max_size: size budget in bytes for all the caches.
+        :returns: the evicted entries.
+        """
+        entries = sorted(self.get_entries(), key=lambda e: e.last_used)
+        total_size = sum(e.size for e in entries)
+        pruned = []
+        for entry in entries:
+            if total_size <= max_size:
+                break
+            try:
+                if os.path.isdir(entry.path):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError as e:
+                logger.warning(
+                    'Unable to prune {}: {}'.format(entry.path, e))
+                continue
+            logger.debug('Pruned {!r} ({} bytes)'.format(
+                entry.path, entry.size))
+            total_size -= entry.size
+            pruned.append(entry)
+        return pruned
+
+
+def _get_size(path: str) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+
+    size = 0
+    seen = set()
+    for root, directories, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            # Unpacked trees are made of hard links, count each inode once.
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+            size += stat.st_size
+    return size
@@ -30,6 +30,9 @@ logger = logging.getLogger(__name__)
 class SnapCache(SnapcraftProjectCache):
     """Cache for snap revisions."""
 
+    namespace = 'snaps'
+    entries_glob = os.path.join('projects', '*', 'snap_hashes', '*', '*')
+
     def __init__(self, *, project_name):
         super().__init__(project_name=project_name)
         self.snap_cache_root = self._setup_snap_cache_root()
@@ -87,6 +90,13 @@ class SnapCache(SnapcraftProjectCache):
 
         :returns: full path to cached snap.
         """
+        # Entries are not stamped with _mark_used as that would change
+        # their ctime, which tells the latest cached revision apart.
+        cached_snap = self._get(deb_arch=deb_arch, snap_hash=snap_hash)
+        self._record_lookup(hit=cached_snap is not None)
+        return cached_snap
+
+    def _get(self, *, deb_arch, snap_hash):
         snap_cache_dir = os.path.join(self.snap_cache_root, deb_arch)
         if not os.path.isdir(snap_cache_dir):
             return None
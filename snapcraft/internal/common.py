@@ -22,10 +22,10 @@ import os
 import shutil
 import subprocess
 import sys
-import tempfile
+import threading
 import urllib
-from contextlib import suppress
-from typing import List  # noqa
+from contextlib import contextmanager, suppress
+from typing import Dict, List, Tuple  # noqa
 
 from snapcraft.internal import errors
 
@@ -45,40 +45,90 @@ _DOCKERENV_FILE = '/.dockerenv'
 MAX_CHARACTERS_WRAP = 120
 
 env = []  # type: List[str]
+# Holds the env of the threads that pull parts concurrently.
+_thread_env = threading.local()
 
 logger = logging.getLogger(__name__)
 
 
+def _get_env():
+    return getattr(_thread_env, 'env', env)
+
+
+@contextmanager
+def thread_env(part_env):
+    """Use part_env instead of env for what runs in the current thread."""
+    _thread_env.env = part_env
+    try:
+        yield
+    finally:
+        del _thread_env.env
+
+
 def assemble_env():
-    return '\n'.join(['export ' + e for e in env])
+    return '\n'.join(['export ' + e for e in _get_env()])
 
 
 def run(cmd, **kwargs):
     assert isinstance(cmd, list), 'run command must be a list'
-    # FIXME: This is gross to keep writing this, even when env is the same
-    with tempfile.NamedTemporaryFile(mode='w+') as f:
-        f.write(assemble_env())
-        f.write('\n')
-        f.write('exec "$@"')
-        f.flush()
-        subprocess.check_call(['/bin/sh', f.name] + cmd, **kwargs)
+    kwargs['env'] = _get_run_env(kwargs.get('env'), kwargs.get('cwd'))
+    subprocess.check_call(cmd, **kwargs)
 
 
 def run_output(cmd, **kwargs):
     assert isinstance(cmd, list), 'run command must be a list'
-    # FIXME: This is gross to keep writing this, even when env is the same
-    with tempfile.NamedTemporaryFile(mode='w+') as f:
-        f.write(assemble_env())
-        f.write('\n')
-        f.write('exec "$@"')
-        f.flush()
-        output = subprocess.check_output(['/bin/sh', f.name] + cmd, **kwargs)
-        try:
-            return output.decode(sys.getfilesystemencoding()).strip()
-        except UnicodeEncodeError:
-            logger.warning('Could not decode output for {!r} correctly'.format(
-                cmd))
-            return output.decode('latin-1', 'surrogateescape').strip()
+    kwargs['env'] = _get_run_env(kwargs.get('env'), kwargs.get('cwd'))
+    output = subprocess.check_output(cmd, **kwargs)
+    try:
+        return output.decode(sys.getfilesystemencoding()).strip()
+    except UnicodeEncodeError:
+        logger.warning('Could not decode output for {!r} correctly'.format(
+            cmd))
+        return output.decode('latin-1', 'surrogateescape').strip()
+
+
+# Variables the shell sets on its own when materializing the environment.
+_SHELL_VARIABLES = ('PWD', 'OLDPWD', 'SHLVL', '_')
+
+_materialized_envs = {}  # type: Dict[Tuple, Dict[str, str]]
+
+
+def _get_run_env(base_env=None, cwd=None):
+    """Return the environment to run commands with as a dictionary.
+
+    The exports from env are evaluated by a shell on top of base_env (or the
+    current environment) only once and cached until the next reset_env, so
+    commands can then be executed directly.
+    """
+    if base_env is None:
+        base_env = os.environ
+    key = (tuple(_get_env()), tuple(sorted(base_env.items())))
+    if key not in _materialized_envs:
+        _materialized_envs[key] = _materialize_env(base_env)
+
+    run_env = _materialized_envs[key].copy()
+    # /bin/sh would have set this for every command it ran.
+    run_env['PWD'] = os.path.abspath(cwd if cwd else os.getcwd())
+    return run_env
+
+
+def _materialize_env(base_env):
+    script = '{}\nexec env -0\n'.format(assemble_env())
+    output = subprocess.check_output(
+        ['/bin/sh'], input=script.encode(), env=base_env)
+
+    materialized_env = dict()
+    for entry in output.split(b'\0'):
+        if entry:
+            name, value = os.fsdecode(entry).split('=', 1)
+            materialized_env[name] = value
+    for name in _SHELL_VARIABLES:
+        if name in base_env:
+            materialized_env[name] = base_env[name]
+        else:
+            materialized_env.pop(name, None)
+
+    return materialized_env
 
 
 def get_core_path(base):
@@ -172,6 +222,7 @@ def isurl(url):
 def reset_env():
     global env
     env = []
+    _materialized_envs.clear()
 
 
 def get_terminal_width(max_width=MAX_CHARACTERS_WRAP):
@@ -13,7 +13,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-from typing import List, Union
+from typing import Dict, List, Union
 
 from snapcraft import formatting_utils
 
@@ -217,6 +217,20 @@ class InvalidContainerRemoteError(SnapcraftError):
         super().__init__(remote=remote)
 
 
+class InvalidPackProfileError(SnapcraftError):
+
+    fmt = (
+        "Failed to create snap: "
+        "{profile!r} is not a valid pack profile.\n"
+        "Use one of {profiles}."
+    )
+
+    def __init__(self, *, profile, profiles):
+        super().__init__(
+            profile=profile,
+            profiles=formatting_utils.humanize_list(profiles, 'or'))
+
+
 class InvalidDesktopFileError(SnapcraftError):
 
     fmt = (
@@ -601,3 +615,47 @@ class SnapcraftctlError(ScriptletBaseError):
 
     def __init__(self, message: str) -> None:
         super().__init__(message=message)
+
+
+class InvalidCacheSizeError(SnapcraftError):
+    fmt = (
+        'Invalid cache size {size!r}: '
+        'use a number of bytes optionally followed by K, M, G or T.'
+    )
+
+    def __init__(self, size: str) -> None:
+        super().__init__(size=size)
+
+
+class DownloadRangeNotSupportedError(SnapcraftError):
+    fmt = (
+        'Failed to download {url!r} in segments: '
+        'the server answered a range request with status {status_code}.'
+    )
+
+    def __init__(self, url: str, status_code: int) -> None:
+        super().__init__(url=url, status_code=status_code)
+
+
+class InvalidPullJobsError(SnapcraftError):
+    fmt = (
+        'Invalid number of parts to pull at once {jobs!r}: '
+        'use a positive integer.'
+    )
+
+    def __init__(self, jobs: str) -> None:
+        super().__init__(jobs=jobs)
+
+
+class PartsPullError(SnapcraftError):
+    fmt = (
+        'Failed to pull {parts_list}:\n'
+        '{details}'
+    )
+
+    def __init__(self, failures: Dict[str, Exception]) -> None:
+        super().__init__(
+            failures=failures,
+            parts_list=formatting_utils.humanize_list(failures, 'and'),
+            details='\n'.join('- {}: {}'.format(name, failure)
+                              for name, failure in failures.items()))
@@ -13,8 +13,14 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import concurrent.futures
+import contextlib
+import json
+import logging
 import os
 import sys
+import threading
+import time
 
 from urllib.request import urlretrieve
 from progressbar import (
@@ -25,6 +31,32 @@ from progressbar import (
     UnknownLength,
 )
 
+import requests
+import urllib3
+
+from snapcraft.file_utils import HashingWriter, calculate_hash
+from snapcraft.internal import errors
+
+logger = logging.getLogger(__name__)
+
+# Downloads are read in chunks between these sizes, see iter_request_chunks.
+_MIN_CHUNK_SIZE = 2**20
+_MAX_CHUNK_SIZE = 8 * 2**20
+# A read of a full chunk faster than _FAST_READ grows the chunk size, a read
+# slower than _SLOW_READ shrinks it (in seconds).
+_FAST_READ = 0.1
+_SLOW_READ = 1.0
+# Seconds between progress bar updates.
+_PROGRESS_INTERVAL = 0.1
+# Downloads of at least this size are split into _SEGMENTS concurrent range
+# requests when the server supports them, see SegmentedDownloader.
+_SEGMENTED_MIN_SIZE = 32 * 2**20
+_SEGMENTS = 4
+# Attempts at each segment and the seconds between saving the progress of
+# the segments.
+_SEGMENT_RETRIES = 5
+_STATE_SAVE_INTERVAL = 1.0
+
 
 def _init_progress_bar(total_length, destination, message=None):
     if not message:
@@ -51,8 +83,12 @@ def _init_progress_bar(total_length, destination, message=None):
 
 
 def download_requests_stream(request_stream, destination, message=None,
-                             total_read=0):
-    """This is a facility to download a request with nice progress bars."""
+                             total_read=0, *, algorithm=None):
+    """This is a facility to download a request with nice progress bars.
+
+    If algorithm is set the destination is hashed as it is written and the
+    hexdigest is returned.
+    """
 
     # Doing len(request_stream.content) may defeat the purpose of a
     # progress bar
@@ -67,18 +103,355 @@ def download_requests_stream(request_stream, destination, message=None,
 
     progress_bar = _init_progress_bar(total_length, destination, message)
     progress_bar.start()
+    progress = _ThrottledProgress(progress_bar)
 
     if os.path.exists(destination):
         mode = 'ab'
     else:
         mode = 'wb'
     with open(destination, mode) as destination_file:
-        for buf in request_stream.iter_content(1024):
-            destination_file.write(buf)
+        writer = destination_file
+        if algorithm:
+            writer = HashingWriter(destination_file, algorithm=algorithm)
+            if mode == 'ab':
+                # What is being resumed needs to be part of the digest.
+                _hash_existing(destination, writer)
+        for buf in iter_request_chunks(request_stream):
+            writer.write(buf)
             total_read += len(buf)
-            progress_bar.update(total_read)
+            progress.update(total_read)
     progress_bar.finish()
 
+    if algorithm:
+        return writer.hexdigest()
+
+
+def iter_request_chunks(request_stream):
+    """Yield the body of a streamed request in adaptively sized chunks.
+
+    Chunks start at _MIN_CHUNK_SIZE and double, up to _MAX_CHUNK_SIZE,
+    while full chunks keep arriving quickly; a read that stalls halves
+    the chunk size again.
+
+    A body that is not content-encoded is read into a single preallocated
+    buffer, so what is yielded is a memoryview that is only valid until the
+    next chunk is requested.
+    """
+    raw = request_stream.raw
+    use_readinto = (hasattr(raw, 'readinto') and
+                    not request_stream.headers.get('Content-Encoding', ''))
+    if use_readinto:
+        buffer = memoryview(bytearray(_MAX_CHUNK_SIZE))
+
+    chunk_size = _MIN_CHUNK_SIZE
+    with _translate_urllib3_errors():
+        while True:
+            start = time.monotonic()
+            if use_readinto:
+                read = raw.readinto(buffer[:chunk_size])
+                chunk = buffer[:read]
+            else:
+                chunk = raw.read(chunk_size, decode_content=True)
+                read = len(chunk)
+            if not read:
+                break
+            yield chunk
+
+            elapsed = time.monotonic() - start
+            if read == chunk_size and elapsed < _FAST_READ:
+                chunk_size = min(chunk_size * 2, _MAX_CHUNK_SIZE)
+            elif elapsed > _SLOW_READ:
+                chunk_size = max(chunk_size // 2, _MIN_CHUNK_SIZE)
+
+
+@contextlib.contextmanager
+def _translate_urllib3_errors():
+    # Reading from the raw response skips the error handling in
+    # requests.Response.iter_content, which callers rely on to retry.
+    try:
+        yield
+    except urllib3.exceptions.ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    except urllib3.exceptions.DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e)
+    except urllib3.exceptions.ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e)
+
+
+class _ThrottledProgress:
+    """Update a progress bar no more often than every _PROGRESS_INTERVAL."""
+
+    def __init__(self, progress_bar):
+        self._progress_bar = progress_bar
+        self._last_update = 0.0
+
+    def update(self, value):
+        now = time.monotonic()
+        if now - self._last_update >= _PROGRESS_INTERVAL:
+            self._progress_bar.update(value)
+            self._last_update = now
+
+
+def _hash_existing(path, writer, blocksize=2**20):
+    with open(path, 'rb') as f:
+        while True:
+            buf = f.read(blocksize)
+            if not buf:
+                break
+            writer.update(buf)
+
+
+class RequestsStreamReader:
+    """Read a streamed request as a file object with a nice progress bar.
+
+    Every chunk that is read is also handed to each of the observers, e.g.;
+    the update method of a hash or the write method of a file.
+    """
+
+    def __init__(self, request_stream, destination, message=None, *,
+                 observers=()):
+        total_length = 0
+        if not request_stream.headers.get('Content-Encoding', ''):
+            total_length = int(
+                request_stream.headers.get('Content-Length', '0'))
+
+        self._raw = request_stream.raw
+        self._observers = list(observers)
+        self._total_read = 0
+        self._progress_bar = _init_progress_bar(
+            total_length, destination, message)
+        self._progress_bar.start()
+        self._progress = _ThrottledProgress(self._progress_bar)
+
+    def read(self, size=-1):
+        with _translate_urllib3_errors():
+            buf = self._raw.read(
+                None if size < 0 else size, decode_content=True)
+        for observer in self._observers:
+            observer(buf)
+        self._total_read += len(buf)
+        self._progress.update(self._total_read)
+        return buf
+
+    def drain(self, size=_MIN_CHUNK_SIZE):
+        """Read what is left of the stream."""
+        while self.read(size):
+            pass
+
+    def close(self):
+        self._progress_bar.finish()
+
+
+def supports_segmented_download(request_stream):
+    """Return True if request_stream is worth downloading in segments.
+
+    That is, the server advertises byte ranges for a large enough body that
+    is sent as is.
+    """
+    headers = request_stream.headers
+    return (headers.get('Accept-Ranges', '') == 'bytes' and
+            not headers.get('Content-Encoding', '') and
+            int(headers.get('Content-Length', '0')) >= _SEGMENTED_MIN_SIZE)
+
+
+class SegmentedDownloader:
+    """Download an uri over concurrent range requests with a progress bar.
+
+    The segments are written with os.pwrite into a preallocated destination.
+    Progress is kept in a state file next to destination so that a download
+    that failed resumes each segment where it was left off.
+    """
+
+    def __init__(self, uri, destination, size, message=None, *,
+                 session=None, segments=_SEGMENTS):
+        self.uri = uri
+        self.destination = destination
+        self.size = size
+        self.message = message
+        self.state_file = _get_state_file(destination)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=segments)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self._session = session
+        self._segment_count = segments
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    def download(self):
+        try:
+            self._download()
+        except errors.DownloadRangeNotSupportedError:
+            # The server ignores ranges, nothing fetched can be resumed.
+            discard_segmented_download(self.destination)
+            raise
+
+    def _download(self):
+        # Each segment is a [next offset, last offset] pair.
+        self._segments = self._load_state()
+        resume = self._segments is not None
+        if not resume:
+            self._segments = self._split()
+        self._total_read = self.size - sum(
+            end - start + 1 for start, end in self._segments)
+
+        progress_bar = _init_progress_bar(
+            self.size, self.destination, self.message)
+        progress_bar.start()
+        self._progress = _ThrottledProgress(progress_bar)
+
+        fd = os.open(self.destination, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not resume:
+                _preallocate(fd, self.size)
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max(len(self._segments), 1)) as executor:
+                futures = [executor.submit(self._fetch_segment, fd, index)
+                           for index in range(len(self._segments))]
+                concurrent.futures.wait(futures)
+            for future in futures:
+                # Raise the first failure, what was fetched is kept.
+                future.result()
+        finally:
+            os.close(fd)
+            self._save_state()
+
+        os.remove(self.state_file)
+        progress_bar.finish()
+
+    def _split(self):
+        segment_size = -(-self.size // self._segment_count)
+        return [[start, min(start + segment_size, self.size) - 1]
+                for start in range(0, self.size, segment_size)]
+
+    def _fetch_segment(self, fd, index):
+        retries = _SEGMENT_RETRIES
+        while True:
+            start, end = self._segments[index]
+            if start > end:
+                return
+            try:
+                self._fetch_range(fd, index, start, end)
+                return
+            except (requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                retries -= 1
+                if not retries:
+                    raise
+                logger.debug(
+                    'Error while downloading bytes {}-{} of {!r}: {!r}. '
+                    'Retries left: {!r}.'.format(
+                        start, end, self.uri, e, retries))
+                time.sleep(1)
+
+    def _fetch_range(self, fd, index, start, end):
+        request = self._session.get(
+            self.uri, headers={'Range': 'bytes={}-{}'.format(start, end)},
+            stream=True, allow_redirects=True)
+        with contextlib.closing(request):
+            request.raise_for_status()
+            if request.status_code != 206:
+                raise errors.DownloadRangeNotSupportedError(
+                    self.uri, request.status_code)
+            for chunk in iter_request_chunks(request):
+                # Never trust the server to stop at the end of the range.
+                chunk = chunk[:end - start + 1]
+                _pwrite_all(fd, chunk, start)
+                start += len(chunk)
+                self._advance(index, start, len(chunk))
+                if start > end:
+                    return
+        raise requests.exceptions.ChunkedEncodingError(
+            'Got {} bytes short of the requested range.'.format(
+                end - start + 1))
+
+    def _advance(self, index, start, read):
+        with self._lock:
+            self._segments[index][0] = start
+            self._total_read += read
+            self._progress.update(self._total_read)
+            if time.monotonic() - self._last_save >= _STATE_SAVE_INTERVAL:
+                self._save_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+
+        if (state.get('uri') != self.uri or
+                state.get('size') != self.size or
+                not os.path.isfile(self.destination) or
+                os.path.getsize(self.destination) != self.size):
+            return None
+        return state['segments']
+
+    def _save_state(self):
+        # Callers either hold the lock or are the only thread left.
+        state = {
+            'uri': self.uri,
+            'size': self.size,
+            'segments': [list(s) for s in self._segments],
+        }
+        tmp_file = '{}.{}'.format(self.state_file, os.getpid())
+        with open(tmp_file, 'w') as state_file:
+            json.dump(state, state_file)
+        os.replace(tmp_file, self.state_file)
+        self._last_save = time.monotonic()
+
+
+def has_pending_segments(destination):
+    """Return True if destination holds a failed segmented download.
+
+    Such a destination is preallocated to its full size, it can only be
+    resumed by downloading in segments again.
+    """
+    return os.path.exists(_get_state_file(destination))
+
+
+def discard_segmented_download(destination):
+    """Remove a failed segmented download of destination."""
+    for path in (destination, _get_state_file(destination)):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def _get_state_file(destination):
+    return destination + '.segments'
+
+
+def download_segmented(uri, destination, size, message=None, *,
+                       session=None, segments=_SEGMENTS, algorithm=None):
+    """Download uri into destination over concurrent range requests.
+
+    If algorithm is set the hexdigest of destination is returned. The
+    segments arrive out of order so it is calculated once they are all in.
+    """
+    SegmentedDownloader(uri, destination, size, message,
+                        session=session, segments=segments).download()
+    if algorithm:
+        return calculate_hash(destination, algorithm=algorithm)
+
+
+def _preallocate(fd, size):
+    os.ftruncate(fd, 0)
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not every platform or filesystem supports fallocate.
+        os.ftruncate(fd, size)
+
+
+def _pwrite_all(fd, data, offset):
+    data = memoryview(data)
+    while data:
+        written = os.pwrite(fd, data, offset)
+        data = data[written:]
+        offset += written
+
 
 class UrllibDownloader(object):
     """This is a facility to download an uri with nice progress bars."""
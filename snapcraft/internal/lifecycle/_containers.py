@@ -30,7 +30,7 @@ def _create_tar_filter(tar_filename):
             return None
         elif fn in ('./stage', './prime', tar_filename):
             return None
-        elif fn.endswith('.snap'):
+        elif fn.endswith('.snap') or fn.endswith('.snap.digest'):
             return None
         elif fn.endswith('_source.tar.bz2'):
             return None
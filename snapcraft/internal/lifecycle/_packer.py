@@ -13,22 +13,44 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import contextlib
+import hashlib
+import json
 import logging
+import multiprocessing
 import os
+import re
+import stat
 import time
-from subprocess import Popen, PIPE, STDOUT
+from subprocess import Popen, PIPE, STDOUT, TimeoutExpired
 
 import yaml
 from progressbar import AnimatedMarker, ProgressBar
 
 from snapcraft import file_utils
-from snapcraft.internal import common, repo
+from snapcraft.internal import cache, common, errors, repo
 from snapcraft.internal.indicators import is_dumb_terminal
 from ._runner import execute
 
 
 logger = logging.getLogger(__name__)
 
+PACK_PROFILES = collections.OrderedDict([
+    # These options need to match the review tools:
+    # http://bazaar.launchpad.net/~click-reviewers/click-reviewers-tools/trunk/view/head:/clickreviews/common.py#L38
+    ('store', ['-noappend', '-comp', 'xz', '-no-xattrs', '-no-fragments']),
+    # Trades size for speed, the resulting snaps are meant to be installed
+    # locally and are rejected by the store.
+    ('dev', ['-noappend', '-comp', 'gzip', '-Xcompression-level', '1',
+             '-b', '1M', '-no-xattrs']),
+])
+
+_MKSQUASHFS_SIZES = re.compile(
+    r'Filesystem size (?P<compressed>[\d.]+) Kbytes.*\n'
+    r'\s*[\d.]+% of uncompressed filesystem size '
+    r'\((?P<uncompressed>[\d.]+) Kbytes\)')
+
 
 def _snap_data_from_dir(directory):
     with open(os.path.join(directory, 'meta', 'snap.yaml')) as f:
@@ -40,15 +62,19 @@ def _snap_data_from_dir(directory):
             'type': snap.get('type', '')}
 
 
-def snap(project_options, directory=None, output=None):
+def snap(project_options, directory=None, output=None, profile='store'):
     if not directory:
         directory = project_options.prime_dir
         execute('prime', project_options)
 
-    return pack(directory, output)
+    return pack(directory, output, profile)
 
 
-def pack(directory, output=None):
+def pack(directory, output=None, profile='store'):
+    if profile not in PACK_PROFILES:
+        raise errors.InvalidPackProfileError(
+            profile=profile, profiles=list(PACK_PROFILES.keys()))
+
     mksquashfs_path = file_utils.get_tool_path('mksquashfs')
 
     # Check for our prerequesite external command early
@@ -57,6 +83,18 @@ def pack(directory, output=None):
     snap = _snap_data_from_dir(directory)
     output_snap_name = output or common.format_snap_name(snap)
 
+    digest_path = _get_digest_path(output_snap_name)
+    previous_digest = _load_digest(digest_path)
+    digest = _calculate_digest(
+        directory, previous_digest.get('files', {}),
+        '{} {}'.format(profile, snap['type']))
+    if _is_snap_current(output_snap_name, digest, previous_digest):
+        logger.info('Reusing {!r} as {!r} did not change'.format(
+            output_snap_name, directory))
+        return output_snap_name
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(digest_path)
+
     # If a .snap-build exists at this point, when we are about to override
     # the snap blob, it is stale. We rename it so user have a chance to
     # recover accidentally lost assertions.
@@ -68,23 +106,111 @@ def pack(directory, output=None):
 
     _run_mksquashfs(
         mksquashfs_path, directory=directory, snap_name=snap['name'],
-        snap_type=snap['type'], output_snap_name=output_snap_name)
+        snap_type=snap['type'], output_snap_name=output_snap_name,
+        profile=profile)
+    _save_digest(digest_path, digest, output_snap_name)
 
     return output_snap_name
 
 
+def _get_digest_path(output_snap_name):
+    # Kept out of the project, where parts using it as their source would
+    # pick it up.
+    key = hashlib.sha256(
+        os.path.abspath(output_snap_name).encode()).hexdigest()
+    return os.path.join(cache.SnapcraftCache().cache_root, 'pack-digests',
+                        '{}.json'.format(key))
+
+
+def _load_digest(digest_path):
+    try:
+        with open(digest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _save_digest(digest_path, digest, output_snap_name):
+    try:
+        snap_stat = os.stat(output_snap_name)
+    except FileNotFoundError:
+        return
+    digest['snap'] = [snap_stat.st_size, snap_stat.st_mtime_ns]
+    os.makedirs(os.path.dirname(digest_path), exist_ok=True)
+    with open(digest_path, 'w') as f:
+        json.dump(digest, f)
+
+
+def _is_snap_current(output_snap_name, digest, previous_digest):
+    try:
+        snap_stat = os.stat(output_snap_name)
+    except FileNotFoundError:
+        return False
+    # The snap itself could have been replaced after it was packed.
+    return (previous_digest.get('digest') == digest['digest'] and
+            previous_digest.get('snap') == [snap_stat.st_size,
+                                            snap_stat.st_mtime_ns])
+
+
+def _calculate_digest(directory, previous_files, pack_options):
+    """Return the digest of the paths, modes and contents in directory.
+
+    Content hashes are reused from previous_files for the files which
+    size, modification time and inode did not change since they were
+    recorded.
+    """
+    hasher = hashlib.sha256(pack_options.encode())
+    files = dict()
+
+    hasher.update(_digest_entry(directory, directory, '', files,
+                                previous_files))
+    for root, dirs, filenames in os.walk(directory):
+        dirs.sort()
+        for name in sorted(dirs + filenames):
+            hasher.update(_digest_entry(directory, root, name, files,
+                                        previous_files))
+
+    return {'digest': hasher.hexdigest(), 'files': files}
+
+
+def _digest_entry(directory, root, name, files, previous_files):
+    path = os.path.join(root, name)
+    relpath = os.path.relpath(path, directory)
+    path_stat = os.lstat(path)
+    mode = path_stat.st_mode
+
+    if stat.S_ISLNK(mode):
+        content = os.readlink(path)
+    elif stat.S_ISREG(mode):
+        file_id = [path_stat.st_size, path_stat.st_mtime_ns, path_stat.st_ino]
+        previous = previous_files.get(relpath)
+        if previous and previous[:3] == file_id:
+            content = previous[3]
+        else:
+            content = file_utils.calculate_hash(path, algorithm='sha256')
+        files[relpath] = file_id + [content]
+    elif stat.S_ISDIR(mode):
+        content = ''
+    else:
+        content = str(path_stat.st_rdev)
+
+    return '{}\0{:o}\0{}\0{}\0{}\n'.format(
+        relpath, mode, path_stat.st_uid, path_stat.st_gid,
+        content).encode('utf-8', 'surrogateescape')
+
+
 def _run_mksquashfs(mksquashfs_command, *, directory, snap_name, snap_type,
-                    output_snap_name):
-    # These options need to match the review tools:
-    # http://bazaar.launchpad.net/~click-reviewers/click-reviewers-tools/trunk/view/head:/clickreviews/common.py#L38
-    mksquashfs_args = ['-noappend', '-comp', 'xz', '-no-xattrs',
-                       '-no-fragments']
+                    output_snap_name, profile='store'):
+    mksquashfs_args = PACK_PROFILES[profile].copy()
+    if profile != 'store':
+        mksquashfs_args += ['-processors', str(multiprocessing.cpu_count())]
     if snap_type != 'os':
         mksquashfs_args.append('-all-root')
 
     complete_command = [
         mksquashfs_command, directory, output_snap_name] + mksquashfs_args
 
+    start_time = time.monotonic()
     with Popen(complete_command, stdout=PIPE, stderr=STDOUT) as proc:
         ret = None
         if is_dumb_terminal():
@@ -106,12 +232,34 @@ def _run_mksquashfs(mksquashfs_command, *, directory, snap_name, snap_type,
                     count = 0
                 progress_indicator.update(count)
                 count += 1
-                time.sleep(.2)
-                ret = proc.poll()
+                try:
+                    ret = proc.wait(timeout=.2)
+                except TimeoutExpired:
+                    ret = None
         print('')
         if ret != 0:
             logger.error(proc.stdout.read().decode('utf-8'))
             raise RuntimeError('Failed to create snap {!r}'.format(
                 output_snap_name))
 
-        logger.debug(proc.stdout.read().decode('utf-8'))
+        mksquashfs_output = proc.stdout.read().decode('utf-8')
+        logger.debug(mksquashfs_output)
+
+    _report_compression(mksquashfs_output, output_snap_name,
+                        time.monotonic() - start_time)
+
+
+def _report_compression(mksquashfs_output, output_snap_name, elapsed):
+    match = _MKSQUASHFS_SIZES.search(mksquashfs_output)
+    if not match:
+        logger.debug('Could not determine the compression ratio')
+        return
+
+    compressed = float(match.group('compressed')) / 1024
+    uncompressed = float(match.group('uncompressed')) / 1024
+    logger.info(
+        'Compressed {:.1f} MiB into {:.1f} MiB ({:.1%}) in {:.1f}s, '
+        '{:.1f} MiB/s'.format(
+            uncompressed, compressed,
+            compressed / uncompressed if uncompressed else 1,
+            elapsed, uncompressed / elapsed if elapsed else 0))
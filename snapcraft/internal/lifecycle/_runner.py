@@ -16,6 +16,8 @@
 import contextlib
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import check_call
 from tempfile import TemporaryDirectory
 
@@ -23,6 +25,7 @@ import yaml
 
 import snapcraft
 from snapcraft.internal import (
+    cache,
     common,
     meta,
     pluginhandler,
@@ -38,6 +41,10 @@ from . import constants
 
 logger = logging.getLogger(__name__)
 
+# Set to the number of parts to pull at the same time.
+_PULL_JOBS_ENVVAR = 'SNAPCRAFT_PULL_JOBS'
+_DEFAULT_PULL_JOBS = 8
+
 
 def execute(step, project_options, part_names=None):
     """Execute until step in the lifecycle for part_names or all parts.
@@ -79,6 +86,13 @@ def execute(step, project_options, part_names=None):
 
     _Executor(config, project_options).run(step, part_names)
 
+    max_cache_size = cache.get_max_size()
+    if max_cache_size is not None:
+        pruned = cache.CacheManager().prune(max_size=max_cache_size)
+        if pruned:
+            logger.info('Pruned {} cache entries to stay within {}'.format(
+                len(pruned), os.environ[cache.MAX_SIZE_ENVVAR]))
+
     return {'name': config.data['name'],
             'version': config.data.get('version'),
             'arch': config.data['architectures'],
@@ -135,6 +149,67 @@ def _should_get_core(confinement: str) -> bool:
     return is_classic and (is_env_var_set or is_docker_instance)
 
 
+def _get_pull_jobs():
+    jobs = os.environ.get(_PULL_JOBS_ENVVAR)
+    if not jobs:
+        return _DEFAULT_PULL_JOBS
+    try:
+        value = int(jobs)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise errors.InvalidPullJobsError(jobs)
+    return value
+
+
+class _LogCollator(logging.Handler):
+    """Hold back what parts pulled concurrently log until replayed.
+
+    Installed as the only handler of the root logger, records logged from
+    threads that are not capturing go straight to the original handlers.
+    """
+
+    def __init__(self, handlers):
+        super().__init__()
+        self._handlers = handlers
+        self._captured = dict()
+
+    def emit(self, record):
+        records = self._captured.get(threading.get_ident())
+        if records is None:
+            self.replay([record])
+        else:
+            records.append(record)
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Collect what the current thread logs in the yielded list."""
+        records = []
+        self._captured[threading.get_ident()] = records
+        try:
+            yield records
+        finally:
+            del self._captured[threading.get_ident()]
+
+    def replay(self, records):
+        for record in records:
+            for handler in self._handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+@contextlib.contextmanager
+def _collate_logs():
+    root_logger = logging.getLogger()
+    handlers = root_logger.handlers
+    collator = _LogCollator(handlers)
+    root_logger.handlers = [collator]
+    try:
+        yield collator
+    finally:
+        root_logger.handlers = handlers
+
+
 def _replace_in_part(part):
     for key, value in part.plugin.options.__dict__.items():
         value = replace_attr(value, [
@@ -162,6 +237,9 @@ class _Executor:
                 dirty_report = part.get_dirty_report(step)
                 if dirty_report:
                     self._handle_dirty(part, step, dirty_report)
+                elif step == 'pull' and self._handle_source_changes(part):
+                    # Pulled again to bring the source up to date.
+                    continue
                 elif not (part.should_step_run(step)):
                     steps_run[part.name].add(step)
                     part.notify_part_progress('Skipping {}'.format(step),
@@ -181,6 +259,8 @@ class _Executor:
 
         step_index = common.COMMAND_ORDER.index(step) + 1
 
+        self._prefetch(parts)
+
         for step in common.COMMAND_ORDER[0:step_index]:
             if step == 'stage':
                 # XXX check only for collisions on the parts that have already
@@ -193,6 +273,57 @@ class _Executor:
 
         self._create_meta(step, part_names)
 
+    def _prefetch(self, parts):
+        """Pull the parts that do not need others staged all at once.
+
+        Pulling is mostly waiting on the network, so doing it concurrently
+        makes it take as long as the slowest part instead of the sum of
+        them. What each part logs is shown once it is done, in order, and
+        all the failures are raised together.
+        """
+        parts = [p for p in parts if self._can_prefetch(p)]
+        jobs = min(_get_pull_jobs(), len(parts))
+        if jobs < 2:
+            return
+
+        failures = dict()
+        with _collate_logs() as collator:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(
+                    self._pull_part, part, collator,
+                    self.parts_config.build_env_for_part(part) +
+                    self.config.project_env()) for part in parts]
+                for part, future in zip(parts, futures):
+                    records, failure = future.result()
+                    collator.replay(records)
+                    if failure:
+                        failures[part.name] = failure
+                    else:
+                        self._steps_run[part.name].add('pull')
+
+        if len(failures) == 1:
+            raise next(iter(failures.values()))
+        elif failures:
+            raise errors.PartsPullError(failures)
+
+    def _can_prefetch(self, part):
+        return ('pull' not in self._steps_run[part.name] and
+                all('stage' in self._steps_run[p]
+                    for p in self.parts_config.get_prereqs(part.name)))
+
+    def _pull_part(self, part, collator, part_env):
+        with collator.capture() as records:
+            try:
+                # The repo serialises its own use of apt, which plugins
+                # pulling through it share with the stage packages.
+                with common.thread_env(part_env):
+                    with contextlib.suppress(AttributeError):
+                        part.prepare_pull()
+                    _replace_in_part(part).pull()
+            except Exception as e:
+                return records, e
+        return records, None
+
     def _run_step(self, step, part, part_names):
         common.reset_env()
         prereqs = self.parts_config.get_prereqs(part.name)
@@ -251,6 +382,23 @@ class _Executor:
                 dirty_properties=dirty_report.dirty_properties,
                 dirty_project_options=dirty_report.dirty_project_options)
 
+        self._clean_step(part, step, '(out of date)')
+
+    def _handle_source_changes(self, part):
+        """Clean what was built from a local source that changed since.
+
+        :returns: True if the source changed and needs to be pulled again.
+        """
+        changes = part.get_source_changes()
+        if not changes or not any(changes):
+            return False
+
+        # The build works on a copy of the source.
+        if not part.is_clean('build'):
+            self._clean_step(part, 'build', '(source changed)')
+        return True
+
+    def _clean_step(self, part, step, hint):
         staged_state = self.config.get_project_state('stage')
         primed_state = self.config.get_project_state('prime')
 
@@ -267,4 +415,4 @@ class _Executor:
                     raise errors.StepOutdatedError(step=step, part=part.name,
                                                    dependents=dependents)
 
-        part.clean(staged_state, primed_state, step, '(out of date)')
+        part.clean(staged_state, primed_state, step, hint)
@@ -74,6 +74,8 @@ def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
             'for the part.'.format('\n'.join(formatted_items)))
 
     for elf_file in elf_files_with_execstack:
+        # execstack edits the file in place.
+        file_utils.break_hard_link(elf_file.path)
         try:
             subprocess.check_call([execstack_path, '--clear-execstack',
                                    elf_file.path])
@@ -23,13 +23,21 @@ import os
 import shutil
 import sys
 from glob import glob, iglob
-from typing import Dict, Set, Sequence  # noqa: F401
+from typing import Dict, List, Set, Sequence  # noqa: F401
 
 import yaml
 
 import snapcraft.extractors
 from snapcraft import file_utils
-from snapcraft.internal import common, elf, errors, repo, sources, states
+from snapcraft.internal import (
+    cache,
+    common,
+    elf,
+    errors,
+    repo,
+    sources,
+    states,
+)
 from snapcraft.internal.mangling import clear_execstack
 
 from ._build_attributes import BuildAttributes
@@ -74,8 +82,14 @@ class PluginHandler:
         self._snap_type = snap_type
         self._soname_cache = soname_cache
         self._source = grammar_processor.get_source()
+        # Parts without a source get the whole project, which is not
+        # worth rebuilding for every change to it.
+        self._has_default_source = not self._source
         if not self._source:
             self._source = part_schema['source'].get('default')
+        self._has_pull_scriptlet = (
+            self._part_properties['override-pull'] !=
+            part_schema['override-pull'].get('default'))
 
         self._pull_state = None  # type: states.PullState
         self._build_state = None  # type: states.BuildState
@@ -98,6 +112,9 @@ class PluginHandler:
 
         self._build_attributes = BuildAttributes(
             self._part_properties['build-attributes'])
+        self._compiler_cache = None  # type: cache.CompilerCache
+        if self._build_attributes.ccache():
+            self._compiler_cache = cache.CompilerCache()
 
         # Scriptlet data is a dict of dicts for each step
         self._scriptlet_metadata = collections.defaultdict(
@@ -341,8 +358,12 @@ class PluginHandler:
         self._unpack_stage_packages()
 
     def pull(self, force=False):
-        # Ensure any previously-failed pull is cleared out before we try again
-        if (os.path.islink(self.plugin.sourcedir) or
+        # Ensure any previously-failed pull is cleared out before we try
+        # again, local sources know what they pulled and only update it.
+        if self._can_update_pull():
+            logger.debug('Updating the pulled source of {!r}'.format(
+                self.name))
+        elif (os.path.islink(self.plugin.sourcedir) or
                 os.path.isfile(self.plugin.sourcedir)):
             os.remove(self.plugin.sourcedir)
         elif os.path.isdir(self.plugin.sourcedir):
@@ -355,6 +376,29 @@ class PluginHandler:
 
         self.mark_pull_done()
 
+    def get_source_changes(self):
+        """Return what changed in a local source since it was pulled.
+
+        :returns: a LocalChanges, or None for other or default sources, or if
+                  there is no pull to compare with.
+        """
+        if (self.is_clean('pull') or self._has_default_source or
+                not self._is_local_source()):
+            return None
+        return self.source_handler.get_changes()
+
+    def _can_update_pull(self):
+        # What override-pull or the plugin did to the source on top of
+        # pulling it cannot be undone, so those parts start over.
+        return (self._is_local_source() and
+                not self._has_pull_scriptlet and
+                type(self.plugin).pull is snapcraft.BasePlugin.pull and
+                self.source_handler.is_pulled())
+
+    def _is_local_source(self):
+        return (self.source_handler is not None and
+                isinstance(self.source_handler, sources.Local))
+
     def _do_pull(self):
         if self.source_handler:
             self.source_handler.pull()
@@ -438,10 +482,16 @@ class PluginHandler:
         shutil.copytree(self.plugin.sourcedir, self.plugin.build_basedir,
                         symlinks=True, ignore=ignore)
 
+        if self._compiler_cache:
+            self._compiler_cache.zero_stats()
+
         self._runner.prepare()
         self._runner.build()
         self._runner.install()
 
+        if self._compiler_cache:
+            self._report_compiler_cache_stats()
+
         # Organize the installed files as requested. We do this in the build
         # step for two reasons:
         #
@@ -454,6 +504,19 @@ class PluginHandler:
 
         self.mark_build_done()
 
+    def _report_compiler_cache_stats(self):
+        stats = self._compiler_cache.get_stats()
+        if not stats:
+            return
+        hits, misses = stats
+        if hits + misses == 0:
+            logger.info('No compilations for {!r} went through ccache'.format(
+                self.name))
+            return
+        logger.info(
+            'ccache hit ratio for {!r}: {:.1%} ({} hits, {} misses)'.format(
+                self.name, hits / (hits + misses), hits, misses))
+
     def mark_build_done(self):
         build_properties = self.plugin.get_build_properties()
         plugin_manifest = self.plugin.get_manifest()
@@ -748,6 +811,16 @@ class PluginHandler:
     def env(self, root):
         return self.plugin.env(root)
 
+    @property
+    def uses_ccache(self) -> bool:
+        return self._compiler_cache is not None
+
+    def ccache_env(self) -> List[str]:
+        """Return the environment to compile through the compiler cache."""
+        if self._compiler_cache:
+            return self._compiler_cache.env()
+        return []
+
     def clean(self, project_staged_state=None, project_primed_state=None,
               step=None, hint=''):
         if not project_staged_state:
@@ -28,3 +28,6 @@ class BuildAttributes:
 
     def keep_execstack(self):
         return 'keep-execstack' in self._attributes
+
+    def ccache(self):
+        return 'ccache' in self._attributes
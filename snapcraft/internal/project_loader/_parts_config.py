@@ -13,6 +13,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import collections
 import logging
 from os import path
 
@@ -200,6 +201,8 @@ class PartsConfig:
 
         self.build_snaps |= grammar_processor.get_build_snaps()
         self.build_tools |= grammar_processor.get_build_packages()
+        if part.uses_ccache:
+            self.build_tools.add('ccache')
 
         # TODO: this should not pass in command but the required package,
         #       where the required package is to be determined by the
@@ -213,20 +216,35 @@ class PartsConfig:
         return part
 
     def build_env_for_part(self, part, root_part=True):
-        """Return a build env of all the part's dependencies."""
+        """Return a build env of all the part's dependencies.
 
+        Parts shared through the 'after' graph are only visited once and
+        duplicate entries are dropped, keeping the first occurrence.
+        """
+        env = self._build_env_for_part(
+            part, root_part=root_part, visited=set(), memo=dict())
+
+        return list(collections.OrderedDict.fromkeys(env))
+
+    def _runtime_env(self, root, memo):
+        key = ('runtime_env', root)
+        if key not in memo:
+            memo[key] = runtime_env(root, self._project_options.arch_triplet)
+        return memo[key]
+
+    def _build_env_for_part(self, part, *, root_part, visited, memo):
         env = []
         stagedir = self._project_options.stage_dir
         is_host_compat = self._project_options.is_host_compatible_with_base(
             self._base)
+        visited.add(part.name)
 
         if root_part:
             # this has to come before any {}/usr/bin
             env += part.env(part.installdir)
             env += runtime_env(
                 part.installdir, self._project_options.arch_triplet)
-            env += runtime_env(
-                stagedir, self._project_options.arch_triplet)
+            env += self._runtime_env(stagedir, memo)
             env += build_env(
                 part.installdir,
                 self._snap_name,
@@ -245,13 +263,19 @@ class PartsConfig:
                 self._project_options.arch_triplet))
             env.append('SNAPCRAFT_PARALLEL_BUILD_COUNT={}'.format(
                        self._project_options.parallel_build_count))
+            # Comes last so the ccache compiler wrappers are found first.
+            env += part.ccache_env()
         else:
             env += part.env(stagedir)
-            env += runtime_env(
-                stagedir, self._project_options.arch_triplet)
+            env += self._runtime_env(stagedir, memo)
 
         for dep_part in part.deps:
+            # A dependency reached through another path has already
+            # contributed all of its entries.
+            if dep_part.name in visited:
+                continue
             env += dep_part.env(stagedir)
-            env += self.build_env_for_part(dep_part, root_part=False)
+            env += self._build_env_for_part(
+                dep_part, root_part=False, visited=visited, memo=memo)
 
         return env
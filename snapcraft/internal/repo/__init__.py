@@ -34,6 +34,13 @@ def check_for_command(command):
         raise MissingCommandError(command)
 
 
+def reset_session():
+    """Forget the package information shared for the session."""
+    if _platform._is_deb_based():
+        from . import _deb
+        _deb.reset_session()
+
+
 def get_pkg_name_parts(pkg_name):
     """Break package name into base parts"""
 
@@ -14,19 +14,27 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import contextlib
+import functools
 import glob
 import hashlib
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 import shutil
 import stat
 import string
 import subprocess
 import sys
+import threading
+import time
 import urllib
+import urllib.parse
 import urllib.request
-from typing import Dict, Set, List, Tuple  # noqa: F401
+from typing import Dict, FrozenSet, Set, List, Tuple  # noqa: F401
 
 import apt
 from xml.etree import ElementTree
@@ -36,7 +44,7 @@ from snapcraft import file_utils
 from snapcraft.internal import cache, repo, common, os_release, sources
 from snapcraft.internal.indicators import is_dumb_terminal
 from ._base import BaseRepo
-from . import errors
+from . import _dpkg, _mirror, errors
 
 
 logger = logging.getLogger(__name__)
@@ -54,14 +62,144 @@ deb http://${security}.ubuntu.com/${suffix} ${release}-security multiverse
 '''
 _GEOIP_SERVER = "http://geoip.ubuntu.com/lookup"
 _library_list = dict()  # type: Dict[str, Set[str]]
+# Bump whenever Ubuntu._normalize_unpacked_tree changes to invalidate the
+# trees in the unpacked package cache.
+_UNPACK_NORMALIZATION_VERSION = 1
+# Seconds during which the package indexes are not updated again.
+_DEFAULT_UPDATE_TTL = 3600
+_UPDATE_TTL_ENVVAR = 'SNAPCRAFT_APT_UPDATE_TTL'
+# Records when the package indexes in an apt cache dir were last updated.
+_UPDATE_STAMP = 'update-stamp.json'
+# Records the build-packages requests the host is known to satisfy.
+_BUILD_PACKAGES_STAMP = 'build-packages.json'
+# Paths that change whenever packages are installed or indexes are updated.
+_HOST_PACKAGE_STATE_PATHS = ('/var/lib/dpkg/status', '/var/lib/apt/lists')
+
+
+class _AptSession:
+    """apt caches and answers shared for the lifetime of the process.
+
+    Opening an apt cache takes about a second, which adds up quickly when
+    checking every package mentioned in the grammar of the parts.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._archives = dict()  # type: Dict[str, apt.Cache]
+        self._archive_packages = dict()  # type: Dict[Tuple[str, str], bool]
+        self._manifest_packages = None  # type: FrozenSet[str]
+        self._dpkg_database = None  # type: _dpkg.DpkgDatabase
+        self.reset_host()
+
+    def reset_host(self):
+        """Forget about the host, e.g. after installing packages on it."""
+        self._host_cache = None
+        self._host_packages = dict()  # type: Dict[str, bool]
+        self._installed_packages = dict()  # type: Dict[str, bool]
+
+    def get_archive(self, cache_dir, setup):
+        """Return the opened apt cache for cache_dir, set up by setup."""
+        if cache_dir not in self._archives:
+            apt_cache = setup(cache_dir)
+            apt_cache.open()
+            self._archives[cache_dir] = apt_cache
+        return self._archives[cache_dir]
+
+    def archive_has_package(self, cache_dir, setup, package_name):
+        key = (cache_dir, package_name)
+        if key not in self._archive_packages:
+            self._archive_packages[key] = (
+                package_name in self.get_archive(cache_dir, setup))
+        return self._archive_packages[key]
+
+    def host_has_package(self, package_name):
+        if package_name not in self._host_packages:
+            self._host_packages[package_name] = (
+                package_name in self._get_host_cache())
+        return self._host_packages[package_name]
+
+    def host_has_package_installed(self, package_name):
+        if package_name not in self._installed_packages:
+            self._installed_packages[package_name] = bool(
+                self._get_host_cache()[package_name].installed)
+        return self._installed_packages[package_name]
+
+    def get_manifest_packages(self):
+        """Return the names of the packages in the base snap manifest."""
+        if self._manifest_packages is None:
+            manifest_file = os.path.join(
+                os.path.dirname(__file__), 'manifest.txt')
+            with open(manifest_file) as f:
+                self._manifest_packages = frozenset(
+                    line.strip() for line in f)
+        return self._manifest_packages
+
+    def get_dpkg_database(self):
+        if self._dpkg_database is None:
+            self._dpkg_database = _dpkg.DpkgDatabase(
+                native_arch=apt.apt_pkg.config.find('APT::Architecture'))
+        return self._dpkg_database
+
+    def _get_host_cache(self):
+        if self._host_cache is None:
+            self._host_cache = apt.Cache()
+        return self._host_cache
+
+
+_session = _AptSession()
+# Parts are pulled concurrently, but neither the session nor the caches on
+# disk can be used by more than one of them at a time.
+_apt_lock = threading.RLock()
+
+
+def _with_apt_lock(method):
+    @functools.wraps(method)
+    def locked(*args, **kwargs):
+        with _apt_lock:
+            return method(*args, **kwargs)
+    return locked
+
+
+def reset_session():
+    """Close the apt caches shared by the repo, mostly useful for tests."""
+    _session.reset()
+    _library_list.clear()
 
 
 class _AptCache:
 
-    def __init__(self, deb_arch, *, sources_list=None, use_geoip=False):
+    def __init__(self, deb_arch, *, sources_list=None, use_geoip=False,
+                 offline=False, update_ttl=None, local_mirror=None):
+        """Create a new _AptCache.
+
+        :param bool offline: only use the package indexes and packages
+                             already in the cache.
+        :param str local_mirror: directory of .deb files to use as the only
+                                 source of packages.
+        :param int update_ttl: seconds during which the package indexes are
+                               not updated again, defaults to
+                               $SNAPCRAFT_APT_UPDATE_TTL or one hour. Whether
+                               the archive changed meanwhile is not checked,
+                               set it to 0 to force an update.
+        """
         self._deb_arch = deb_arch
         self._sources_list = sources_list
         self._use_geoip = use_geoip
+        self._offline = offline
+        if update_ttl is None:
+            update_ttl = _get_update_ttl()
+        self._update_ttl = update_ttl
+        self._local_mirror = None
+        if local_mirror:
+            self._local_mirror = _mirror.LocalMirror(local_mirror)
+
+        self.progress = apt.progress.text.AcquireProgress()
+        if is_dumb_terminal():
+            # Make output more suitable for logging.
+            self.progress.pulse = lambda owner: True
+            self.progress._width = 0
 
     def _setup_apt(self, cache_dir):
         # Do not install recommends
@@ -95,12 +233,6 @@ class _AptCache:
         # on the system.
         apt.apt_pkg.config.clear('APT::Update::Post-Invoke-Success')
 
-        self.progress = apt.progress.text.AcquireProgress()
-        if is_dumb_terminal():
-            # Make output more suitable for logging.
-            self.progress.pulse = lambda owner: True
-            self.progress._width = 0
-
         sources_list_file = os.path.join(
             cache_dir, 'etc', 'apt', 'sources.list')
 
@@ -122,30 +254,69 @@ class _AptCache:
                 "Cannot find 'dpkg' command needed to support multiarch")
 
         apt_cache = apt.Cache(rootdir=cache_dir, memonly=True)
-        apt_cache.update(fetch_progress=self.progress,
-                         sources_list=sources_list_file)
+        if self._local_mirror:
+            # Updating from the mirror is cheap and picks up new packages.
+            self._local_mirror.update_index()
+            apt_cache.update(fetch_progress=self.progress,
+                             sources_list=sources_list_file)
+            self._write_update_stamp(cache_dir)
+        elif self._offline:
+            if not _has_package_indexes(cache_dir):
+                raise errors.PackageIndexNotCachedError()
+            logger.debug('Working offline, not updating package indexes')
+        elif self._indexes_are_fresh(cache_dir):
+            logger.debug('Package indexes are up to date')
+        else:
+            apt_cache.update(fetch_progress=self.progress,
+                             sources_list=sources_list_file)
+            self._write_update_stamp(cache_dir)
 
         return apt_cache
 
+    def _indexes_are_fresh(self, cache_dir):
+        # Only the age of the last update counts, as finding out whether
+        # the archive changed takes about as long as updating.
+        try:
+            with open(os.path.join(cache_dir, _UPDATE_STAMP)) as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if time.time() - stamp.get('time', 0) >= self._update_ttl:
+            return False
+        # The indexes could have been removed since.
+        return _has_package_indexes(cache_dir)
+
+    def _write_update_stamp(self, cache_dir):
+        stamp = {'time': time.time()}
+        with open(os.path.join(cache_dir, _UPDATE_STAMP), 'w') as f:
+            json.dump(stamp, f)
+
     @contextlib.contextmanager
     def archive(self, cache_dir):
         try:
-            apt_cache = self._setup_apt(cache_dir)
-            apt_cache.open()
-
+            apt_cache = _session.get_archive(cache_dir, self._setup_apt)
             try:
                 yield apt_cache
             finally:
-                apt_cache.close()
+                # The cache is shared, leave it as we found it.
+                apt_cache.clear()
         except Exception as e:
             logger.debug('Exception occurred: {!r}'.format(e))
             raise e
 
+    def has_package(self, cache_dir, package_name):
+        return _session.archive_has_package(
+            cache_dir, self._setup_apt, package_name)
+
     def sources_digest(self):
         return hashlib.sha384(self._collected_sources_list().encode(
             sys.getfilesystemencoding())).hexdigest()
 
     def _collected_sources_list(self):
+        if self._local_mirror:
+            return self._local_mirror.get_sources_list()
+
         if self._use_geoip or self._sources_list:
             release = os_release.OsRelease()
             return _format_sources_list(
@@ -154,47 +325,97 @@ class _AptCache:
 
         return _get_local_sources_list()
 
-    def fetch_binary(self, *, package_candidate, destination: str) -> None:
+    def fetch_binaries(self, *, package_candidates,
+                       destination: str) -> List[str]:
+        """Download the .deb files for package_candidates into destination.
+
+        All the files missing from destination are queued on a single
+        apt_pkg.Acquire so that apt can fetch them in parallel.
+
+        :returns: the absolute paths to the .deb files, in the order of
+                  package_candidates.
+        :raises apt.package.FetchError: if any of the files cannot be
+                                        fetched.
+        :raises snapcraft.repo.errors.PackagesNotCachedError:
+            if working offline and some of the files are not in destination.
+        """
         # This is a workaround for the overly verbose python-apt we use.
         # There is an unreleased patch which once released could replace
         # this code https://salsa.debian.org/apt-team/python-apt/commit/d122f9142df614dbb5f7644112280140dc155ecc  # noqa
         # What follows is almost a tit for tat implementation of upstream's
-        # fetch_binary logic.
-        base = os.path.basename(package_candidate._records.filename)
-        destfile = os.path.join(destination, base)
-        if apt.package._file_is_same(destfile, package_candidate.size,
-                                     package_candidate._records.md5_hash):
-            logging.debug('Ignoring already existing file: {}'.format(
-                destfile))
-            return os.path.abspath(destfile)
+        # fetch_binary logic, queueing every file on the same Acquire.
         acq = apt.apt_pkg.Acquire(self.progress)
-        acqfile = apt.apt_pkg.AcquireFile(
-            acq, package_candidate.uri, package_candidate._records.md5_hash,
-            package_candidate.size, base, destfile=destfile)
+        acqfiles = []
+        total_size = 0
+        destfiles = []
+        missing = []  # type: List[str]
+        for package_candidate in package_candidates:
+            base = os.path.basename(package_candidate._records.filename)
+            destfile = os.path.join(destination, base)
+            destfiles.append(os.path.abspath(destfile))
+            if apt.package._file_is_same(
+                    destfile, package_candidate.size,
+                    package_candidate._records.md5_hash):
+                logging.debug('Ignoring already existing file: {}'.format(
+                    destfile))
+                continue
+            if package_candidate.uri.startswith('file:'):
+                # Local sources need no fetching, such as a local mirror.
+                file_utils.link_or_copy(
+                    _get_file_uri_path(package_candidate.uri), destfile)
+                continue
+            if self._offline:
+                missing.append(base)
+                continue
+            acqfiles.append(apt.apt_pkg.AcquireFile(
+                acq, package_candidate.uri,
+                package_candidate._records.md5_hash,
+                package_candidate.size, base, destfile=destfile))
+            total_size += package_candidate.size
+
+        if missing:
+            raise errors.PackagesNotCachedError(packages=missing)
+        if not acqfiles:
+            return destfiles
+
+        logger.info('Downloading {} stage {} ({:.1f} MiB)'.format(
+            len(acqfiles), 'package' if len(acqfiles) == 1 else 'packages',
+            total_size / 2**20))
         acq.run()
 
-        if acqfile.status != acqfile.STAT_DONE:
-            raise apt.package.FetchError(
-                "The item %r could not be fetched: %s" %
-                (acqfile.destfile, acqfile.error_text))
+        for acqfile in acqfiles:
+            if acqfile.status != acqfile.STAT_DONE:
+                raise apt.package.FetchError(
+                    "The item %r could not be fetched: %s" %
+                    (acqfile.destfile, acqfile.error_text))
 
-        return os.path.abspath(destfile)
+        return destfiles
 
 
 class Ubuntu(BaseRepo):
 
     @classmethod
     def get_package_libraries(cls, package_name):
-        global _library_list
-        if package_name not in _library_list:
-            output = subprocess.check_output(
-                ['dpkg', '-L', package_name]).decode(
-                    sys.getfilesystemencoding()).strip().split()
-            _library_list[package_name] = {
-                i for i in output
-                if ('lib' in i and os.path.isfile(i))}
+        return cls.get_packages_libraries([package_name])[package_name]
 
-        return _library_list[package_name].copy()
+    @classmethod
+    @_with_apt_lock
+    def get_packages_libraries(
+            cls, package_names: List[str]) -> Dict[str, Set[str]]:
+        """Return the libraries installed on the host by package_names.
+
+        :param package_names: the installed packages to query.
+        :returns: the paths to the libraries of each package, by name.
+        """
+        missing = [name for name in package_names
+                   if name not in _library_list]
+        if missing:
+            dpkg_files = _session.get_dpkg_database().get_files(missing)
+            for name, files in dpkg_files.items():
+                _library_list[name] = {
+                    i for i in files if ('lib' in i and os.path.isfile(i))}
+
+        return {name: _library_list[name].copy() for name in package_names}
 
     @classmethod
     def get_packages_for_source_type(cls, source_type):
@@ -218,6 +439,7 @@ class Ubuntu(BaseRepo):
         return packages
 
     @classmethod
+    @_with_apt_lock
     def install_build_packages(cls, package_names: List[str]) -> List[str]:
         """Install packages on the host required to build.
 
@@ -232,6 +454,15 @@ class Ubuntu(BaseRepo):
         :raises snapcraft.repo.errors.BuildPackagesNotInstalledError:
             if installing the packages on the host failed.
         """
+        # Opening the host apt cache and marking the packages takes seconds,
+        # skip it when nothing changed on the host since the same request
+        # was last satisfied.
+        fingerprint = _get_build_packages_fingerprint(package_names)
+        if fingerprint in _load_satisfied_build_packages():
+            logger.debug('Build packages {!r} are already installed'.format(
+                package_names))
+            return []
+
         new_packages = []  # type: List[Tuple[str, str]]
         with apt.Cache() as apt_cache:
             try:
@@ -244,6 +475,8 @@ class Ubuntu(BaseRepo):
         if new_packages:
             cls._install_new_build_packages(
                [package[0] for package in new_packages])
+            _session.reset_host()
+        _record_satisfied_build_packages(fingerprint)
         return ['{}={}'.format(package[0], package[1])
                 for package in new_packages]
 
@@ -311,25 +544,22 @@ class Ubuntu(BaseRepo):
                 .format(e))
 
     @classmethod
+    @_with_apt_lock
     def build_package_is_valid(cls, package_name):
-        with apt.Cache() as apt_cache:
-            return package_name in apt_cache
+        return _session.host_has_package(package_name)
 
     @classmethod
+    @_with_apt_lock
     def is_package_installed(cls, package_name):
-        with apt.Cache() as apt_cache:
-            return apt_cache[package_name].installed
+        return _session.host_has_package_installed(package_name)
 
     @classmethod
+    @_with_apt_lock
     def get_installed_packages(cls):
-        installed_packages = []
-        with apt.Cache() as apt_cache:
-            for package in apt_cache:
-                if package.installed:
-                    installed_packages.append(
-                        '{}={}'.format(
-                            package.name, package.installed.version))
-        return installed_packages
+        dpkg_database = _session.get_dpkg_database()
+        installed_packages = dpkg_database.get_installed_packages()
+        return ['{}={}'.format(name, version)
+                for name, version in sorted(installed_packages.items())]
 
     def __init__(self, rootdir, sources=None, project_options=None) -> None:
         super().__init__(rootdir)
@@ -340,15 +570,20 @@ class Ubuntu(BaseRepo):
 
         self._apt = _AptCache(
             project_options.deb_arch, sources_list=sources,
-            use_geoip=project_options.use_geoip)
+            use_geoip=project_options.use_geoip,
+            offline=project_options.offline,
+            update_ttl=0 if project_options.refresh_package_indexes else None,
+            local_mirror=project_options.local_mirror)
 
         self._cache = cache.AptStagePackageCache(
             sources_digest=self._apt.sources_digest())
+        self._unpacked_cache = cache.AptUnpackedPackageCache()
 
+    @_with_apt_lock
     def is_valid(self, package_name):
-        with self._apt.archive(self._cache.base_dir) as apt_cache:
-            return package_name in apt_cache
+        return self._apt.has_package(self._cache.base_dir, package_name)
 
+    @_with_apt_lock
     def get(self, package_names) -> None:
         with self._apt.archive(self._cache.base_dir) as apt_cache:
             self._mark_install(apt_cache, package_names)
@@ -356,7 +591,7 @@ class Ubuntu(BaseRepo):
             return self._get(apt_cache)
 
     def _filter_base_packages(self, apt_cache, package_names):
-        manifest_dep_names = self._manifest_dep_names(apt_cache)
+        manifest_dep_names = _session.get_manifest_packages()
 
         skipped_essential = []
         skipped_blacklisted = []
@@ -366,19 +601,19 @@ class Ubuntu(BaseRepo):
         # (apt_cache.broken_count will be > 0)
         # but that is ok as it was consistent before we excluded
         # these base package
-        for pkg in apt_cache:
+        # Only the packages marked for installation can be affected, looking
+        # at those avoids walking the whole archive.
+        for pkg in apt_cache.get_changes():
+            if pkg.name in package_names:
+                continue
             # those should be already on each system, it also prevents
             # diving into downloading libc6
-            if (pkg.candidate.priority in 'essential' and
-               pkg.name not in package_names):
+            if pkg.candidate.priority in 'essential':
                 skipped_essential.append(pkg.name)
                 pkg.mark_keep()
-                continue
-            if (pkg.name in manifest_dep_names and
-                    pkg.name not in package_names):
+            elif pkg.name in manifest_dep_names:
                 skipped_blacklisted.append(pkg.name)
                 pkg.mark_keep()
-                continue
 
         if skipped_essential:
             logger.debug('Skipping priority essential packages: '
@@ -397,42 +632,188 @@ class Ubuntu(BaseRepo):
         # 2. Download packages in a different manner.
         #
         # In the end, (2) was chosen for minimal overhead and a simpler cache
-        # implementation. So we're using fetch_binary() here instead.
-        # Downloading each package individually has the drawback of witholding
-        # any clue of how long the whole pulling process will take, but that's
-        # something we'll have to live with.
-        pkg_list = []
-        for package in apt_cache.get_changes():
-            pkg_list.append(str(package.candidate))
-            source = self._apt.fetch_binary(
-                package_candidate=package.candidate,
-                destination=self._cache.packages_dir)
+        # implementation. So we're using fetch_binaries() here instead, which
+        # queues all the downloads at once so apt can run them in parallel
+        # and report the progress of the whole pull.
+        package_candidates = [
+            package.candidate for package in apt_cache.get_changes()]
+        sources = self._apt.fetch_binaries(
+            package_candidates=package_candidates,
+            destination=self._cache.packages_dir)
+        for source in sources:
             destination = os.path.join(
                 self._downloaddir, os.path.basename(source))
             with contextlib.suppress(FileNotFoundError):
                 os.remove(destination)
             file_utils.link_or_copy(source, destination)
 
-        return pkg_list
+        return [str(candidate) for candidate in package_candidates]
+
+    @_with_apt_lock
+    def unpack(self, unpackdir, *, jobs: int = None) -> None:
+        """Unpack the downloaded packages into unpackdir.
+
+        Packages are unpacked once into the shared unpacked package cache,
+        extracting up to jobs (defaults to the number of CPUs) packages
+        concurrently, and cloned from there into unpackdir. They are never
+        hard-linked, what is done to unpackdir must not reach the cache.
+        Files shipped by more than one package are resolved in package name
+        order, the last one wins.
+        """
+        pkgs_abs_path = sorted(
+            glob.glob(os.path.join(self._downloaddir, '*.deb')))
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+
+        os.makedirs(unpackdir, exist_ok=True)
+        for tree in self._get_unpacked_trees(pkgs_abs_path, jobs=jobs):
+            file_utils.link_or_copy_tree(
+                tree, unpackdir, copy_function=file_utils.clone_or_copy)
+
+        # Whatever depends on the location of unpackdir cannot be cached.
+        self._fix_artifacts(unpackdir)
+        self._fix_xml_tools(unpackdir)
+
+    def _get_unpacked_trees(self, deb_paths: List[str], *,
+                            jobs: int) -> List[str]:
+        keys = ['{}-{}'.format(
+            file_utils.calculate_hash(deb_path, algorithm='sha256'),
+            _UNPACK_NORMALIZATION_VERSION) for deb_path in deb_paths]
+
+        # Each key is looked up once, so that the cache statistics add up
+        # and a concurrent prune cannot take a tree away between lookups.
+        cached_trees = dict()  # type: Dict[str, str]
+        missing = collections.OrderedDict()  # type: Dict[str, str]
+        for deb_path, key in zip(deb_paths, keys):
+            if key in cached_trees or key in missing:
+                continue
+            tree = self._unpacked_cache.get(key=key)
+            if tree is None:
+                missing[key] = deb_path
+            else:
+                cached_trees[key] = tree
+                logger.debug('Using cached unpacked {!r}'.format(
+                    os.path.basename(deb_path)))
+
+        trees = [self._unpacked_cache.new_tree() for _ in missing]
+        try:
+            if jobs > 1 and len(missing) > 1:
+                # Other threads may be pulling parts, forking them while
+                # they hold a lock could deadlock the workers.
+                with multiprocessing.get_context('forkserver').Pool(
+                        jobs) as pool:
+                    timings = pool.starmap(
+                        _unpack_deb, zip(missing.values(), trees))
+            else:
+                timings = [_unpack_deb(deb_path, tree)
+                           for deb_path, tree in zip(missing.values(), trees)]
+
+            for deb_path, elapsed in zip(missing.values(), timings):
+                logger.debug('Unpacked {!r} in {:.3f}s'.format(
+                    os.path.basename(deb_path), elapsed))
+
+            for key, tree in zip(missing, trees):
+                self._normalize_unpacked_tree(tree)
+                cached_trees[key] = self._unpacked_cache.cache(
+                    key=key, tree=tree)
+        finally:
+            for tree in trees:
+                if os.path.exists(tree):
+                    shutil.rmtree(tree)
+
+        return [cached_trees[key] for key in keys]
+
+    def _normalize_unpacked_tree(self, tree: str) -> None:
+        # The part of normalize that does not depend on where the tree ends
+        # up, so that it can be done once for the cache.
+        for root, dirs, files in os.walk(tree):
+            for entry in itertools.chain(files, dirs):
+                path = os.path.join(root, entry)
+                if not os.path.islink(path):
+                    _fix_filemode(path)
+        self._fix_shebangs(tree)
+
+
+def _get_update_ttl() -> int:
+    ttl = os.environ.get(_UPDATE_TTL_ENVVAR)
+    if not ttl:
+        return _DEFAULT_UPDATE_TTL
+    try:
+        value = int(ttl)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise errors.InvalidAptUpdateTTLError(
+            envvar=_UPDATE_TTL_ENVVAR, ttl=ttl)
+    return value
+
+
+def _get_host_package_state() -> List[int]:
+    state = []  # type: List[int]
+    for path in _HOST_PACKAGE_STATE_PATHS:
+        try:
+            path_stat = os.stat(path)
+        except FileNotFoundError:
+            state.extend([0, 0])
+        else:
+            state.extend([path_stat.st_mtime_ns, path_stat.st_size])
+    return state
+
+
+def _get_build_packages_fingerprint(package_names: List[str]) -> str:
+    return hashlib.sha256(
+        '\n'.join(sorted(set(package_names))).encode()).hexdigest()
+
+
+def _get_build_packages_stamp_path() -> str:
+    return os.path.join(cache.SnapcraftCache().cache_root,
+                        _BUILD_PACKAGES_STAMP)
+
+
+def _load_satisfied_build_packages() -> Set[str]:
+    try:
+        with open(_get_build_packages_stamp_path()) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return set()
+
+    # Any package installed or removed, or an index update, may change
+    # what the requests resolve to.
+    if stamp.get('host-state') != _get_host_package_state():
+        return set()
+    return set(stamp.get('fingerprints', []))
+
+
+def _record_satisfied_build_packages(fingerprint: str) -> None:
+    fingerprints = _load_satisfied_build_packages()
+    fingerprints.add(fingerprint)
+    stamp_path = _get_build_packages_stamp_path()
+    try:
+        os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+        with open(stamp_path, 'w') as f:
+            json.dump({
+                'host-state': _get_host_package_state(),
+                'fingerprints': sorted(fingerprints),
+            }, f)
+    except OSError as e:
+        logger.debug('Unable to record the build packages: {}'.format(e))
+
+
+def _unpack_deb(deb_path: str, unpackdir: str) -> float:
+    # Runs in the worker processes of Ubuntu._get_unpacked_trees.
+    start = time.monotonic()
+    sources.Deb(None, None).provision(
+        unpackdir, src=deb_path, clean_target=False, keep_deb=True)
+    return time.monotonic() - start
 
-    def unpack(self, unpackdir) -> None:
-        pkgs_abs_path = glob.glob(os.path.join(self._downloaddir, '*.deb'))
-        for pkg in pkgs_abs_path:
-            sources.Deb(None, None).provision(
-                unpackdir, src=pkg, clean_target=False, keep_deb=True)
-        self.normalize(unpackdir)
 
-    def _manifest_dep_names(self, apt_cache):
-        manifest_dep_names = set()
+def _has_package_indexes(cache_dir):
+    lists_dir = os.path.join(cache_dir, 'var', 'lib', 'apt', 'lists')
+    return bool(glob.glob(os.path.join(lists_dir, '*Release')))
 
-        with open(os.path.abspath(os.path.join(__file__, '..',
-                                               'manifest.txt'))) as f:
-            for line in f:
-                pkg = line.strip()
-                if pkg in apt_cache:
-                    manifest_dep_names.add(pkg)
 
-        return manifest_dep_names
+def _get_file_uri_path(uri: str) -> str:
+    return urllib.parse.unquote(urllib.parse.urlparse(uri).path)
 
 
 def _get_local_sources_list():
@@ -0,0 +1,169 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional  # noqa: F401
+
+from snapcraft.internal import cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the format of the cached database changes.
+_CACHE_VERSION = 1
+
+
+class DpkgDatabase:
+    """Read what dpkg knows about the installed packages.
+
+    This reads the status file and the file lists in the dpkg admin
+    directory instead of running dpkg. What has been read is cached on
+    disk for as long as the status file does not change.
+    """
+
+    def __init__(self, *, admin_dir: str = '/var/lib/dpkg',
+                 native_arch: str = None) -> None:
+        self._admin_dir = admin_dir
+        self._native_arch = native_arch
+        self._status_file = os.path.join(admin_dir, 'status')
+        self._info_dir = os.path.join(admin_dir, 'info')
+        self._cache_file = os.path.join(
+            cache.SnapcraftCache().cache_root, 'dpkg', '{}.json'.format(
+                hashlib.sha1(admin_dir.encode()).hexdigest()))
+        self._data = None  # type: Dict
+        self._status_mtime = None  # type: int
+
+    def get_installed_packages(self) -> Dict[str, str]:
+        """Return the versions of the installed packages by name.
+
+        Packages not from the native architecture, or from any if it is
+        not known, are named <package>:<arch>.
+        """
+        data = self._load()
+        if 'packages' not in data:
+            data['packages'] = self._read_status()
+            self._save()
+        return data['packages']
+
+    def get_files(self, package_names: Iterable[str]) -> Dict[str, List[str]]:
+        """Return the paths dpkg installed for each one of package_names.
+
+        Packages that are not installed have no paths.
+        """
+        data = self._load()
+        files = data.setdefault('files', dict())
+        missing = [name for name in package_names if name not in files]
+        # Only listed when a package has no list of its own or for the
+        # native architecture, and then once for all of them.
+        info_lists = None  # type: List[str]
+        for name in missing:
+            paths = self._read_list(name)
+            if paths is None and ':' not in name:
+                if info_lists is None:
+                    info_lists = sorted(
+                        entry for entry in os.listdir(self._info_dir)
+                        if entry.endswith('.list'))
+                paths = self._read_foreign_list(name, info_lists)
+            if paths is None:
+                logger.debug('No files listed by dpkg for {!r}'.format(name))
+                paths = []
+            files[name] = paths
+        if missing:
+            self._save()
+        return {name: files[name] for name in package_names}
+
+    def _read_status(self) -> Dict[str, str]:
+        packages = dict()  # type: Dict[str, str]
+        with open(self._status_file, encoding='utf-8',
+                  errors='replace') as f:
+            for paragraph in f.read().split('\n\n'):
+                fields = _parse_paragraph(paragraph)
+                if not fields.get('Status', '').endswith(' installed'):
+                    continue
+                name = fields['Package']
+                arch = fields.get('Architecture', 'all')
+                if arch not in ('all', self._native_arch):
+                    name = '{}:{}'.format(name, arch)
+                packages[name] = fields.get('Version', '')
+        return packages
+
+    def _read_list(self, package_name: str) -> Optional[List[str]]:
+        candidates = ['{}.list'.format(package_name)]
+        if ':' not in package_name and self._native_arch:
+            candidates.append('{}:{}.list'.format(
+                package_name, self._native_arch))
+        return self._read_first_list(candidates)
+
+    def _read_foreign_list(self, package_name: str,
+                           info_lists: List[str]) -> Optional[List[str]]:
+        return self._read_first_list(
+            [entry for entry in info_lists
+             if entry.startswith(package_name + ':')])
+
+    def _read_first_list(self, candidates: List[str]) -> Optional[List[str]]:
+        for candidate in candidates:
+            try:
+                with open(os.path.join(self._info_dir, candidate),
+                          encoding='utf-8', errors='surrogateescape') as f:
+                    return [line.rstrip('\n') for line in f
+                            if line.rstrip('\n') not in ('', '/.')]
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _load(self) -> Dict:
+        status_mtime = os.stat(self._status_file).st_mtime_ns
+        if self._data is not None and self._status_mtime == status_mtime:
+            return self._data
+
+        self._status_mtime = status_mtime
+        self._data = dict()
+        try:
+            with open(self._cache_file) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return self._data
+        if (cached.get('version') == _CACHE_VERSION and
+                cached.get('status-mtime') == status_mtime and
+                cached.get('native-arch') == self._native_arch):
+            self._data = cached.get('data', dict())
+        return self._data
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+        temp_file = '{}.{}'.format(self._cache_file, os.getpid())
+        with open(temp_file, 'w') as f:
+            json.dump({
+                'version': _CACHE_VERSION,
+                'status-mtime': self._status_mtime,
+                'native-arch': self._native_arch,
+                'data': self._data,
+            }, f)
+        os.replace(temp_file, self._cache_file)
+
+
+def _parse_paragraph(paragraph: str) -> Dict[str, str]:
+    fields = dict()  # type: Dict[str, str]
+    for line in paragraph.splitlines():
+        # Continuation lines start with whitespace, none of the fields
+        # needed here span more than one line.
+        if not line or line[0].isspace() or ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        fields[key] = value.strip()
+    return fields
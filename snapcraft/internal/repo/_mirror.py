@@ -0,0 +1,145 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import tarfile
+from typing import Dict, List  # noqa: F401
+
+import debian.arfile
+
+from snapcraft import file_utils
+from snapcraft.internal import cache
+from . import errors
+
+logger = logging.getLogger(__name__)
+
+# Bump when the format of the generated index changes.
+_INDEX_VERSION = 1
+
+
+class LocalMirror:
+    """A directory of .deb files served to apt as a flat repository.
+
+    The Packages index for the .deb files found anywhere under the
+    directory, such as the archives of an AptStagePackageCache, is
+    generated in the snapcraft cache so the directory can be read-only.
+    The repository is rooted at / so that the index can refer to the .deb
+    files where they are.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(path)
+        self.index_dir = os.path.join(
+            cache.SnapcraftCache().cache_root, 'mirror-indexes',
+            hashlib.sha1(self.path.encode()).hexdigest())
+        self._stanzas_file = os.path.join(self.index_dir, 'stanzas.json')
+
+    def get_sources_list(self) -> str:
+        """Return the sources.list entry for the mirror."""
+        return 'deb [trusted=yes] file:/ {}/\n'.format(
+            os.path.relpath(self.index_dir, os.path.sep))
+
+    def update_index(self) -> None:
+        """Generate the Packages and Release files for the mirror.
+
+        Only the .deb files added or changed since the last update are
+        read.
+
+        :raises snapcraft.repo.errors.InvalidLocalMirrorError:
+            if the mirror is not a directory or contains broken .deb files.
+        """
+        if not os.path.isdir(self.path):
+            raise errors.InvalidLocalMirrorError(
+                path=self.path, message='it is not a directory')
+
+        previous = self._load_stanzas()
+        stanzas = dict()  # type: Dict[str, List]
+        for deb_path in sorted(glob.glob(
+                os.path.join(self.path, '**', '*.deb'), recursive=True)):
+            deb_stat = os.stat(deb_path)
+            key = [deb_stat.st_size, deb_stat.st_mtime_ns]
+            if deb_path in previous and previous[deb_path][:2] == key:
+                stanzas[deb_path] = previous[deb_path]
+            else:
+                stanzas[deb_path] = key + [self._get_stanza(deb_path)]
+
+        if stanzas == previous and os.path.exists(
+                os.path.join(self.index_dir, 'Release')):
+            return
+
+        logger.debug('Indexing {} packages in {!r}'.format(
+            len(stanzas), self.path))
+        os.makedirs(self.index_dir, exist_ok=True)
+        packages_file = os.path.join(self.index_dir, 'Packages')
+        with open(packages_file, 'w') as f:
+            f.write(''.join(stanza for _, _, stanza in stanzas.values()))
+        with open(os.path.join(self.index_dir, 'Release'), 'w') as f:
+            f.write(_get_release(packages_file))
+        with open(self._stanzas_file, 'w') as f:
+            json.dump(dict(version=_INDEX_VERSION, stanzas=stanzas), f)
+
+    def _load_stanzas(self) -> Dict[str, List]:
+        try:
+            with open(self._stanzas_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        if data.get('version') != _INDEX_VERSION:
+            return dict()
+        return data.get('stanzas', dict())
+
+    def _get_stanza(self, deb_path: str) -> str:
+        control = _read_control(deb_path)
+        if control is None:
+            raise errors.InvalidLocalMirrorError(
+                path=self.path,
+                message='{!r} is not a valid .deb file'.format(deb_path))
+        return '{}\nFilename: {}\nSize: {}\nMD5sum: {}\nSHA256: {}\n\n'.format(
+            control.strip(), os.path.relpath(deb_path, os.path.sep),
+            os.path.getsize(deb_path),
+            file_utils.calculate_hash(deb_path, algorithm='md5'),
+            file_utils.calculate_hash(deb_path, algorithm='sha256'))
+
+
+def _read_control(deb_path: str) -> str:
+    try:
+        deb_ar = debian.arfile.ArFile(deb_path)
+        control_members = [name for name in deb_ar.getnames()
+                           if name.startswith('control.tar')]
+        if not control_members:
+            return None
+        control_member = deb_ar.getmember(control_members[0])
+        with tarfile.open(fileobj=control_member, mode='r|*') as tar:
+            for member in tar:
+                if os.path.normpath(member.name) == 'control':
+                    return tar.extractfile(member).read().decode()
+    except (debian.arfile.ArError, tarfile.TarError, OSError) as e:
+        logger.debug('Unable to read {!r}: {}'.format(deb_path, e))
+    return None
+
+
+def _get_release(packages_file: str) -> str:
+    size = os.path.getsize(packages_file)
+    release = []
+    for field, algorithm in (('MD5Sum', 'md5'), ('SHA256', 'sha256')):
+        release.append('{}:\n {} {} Packages\n'.format(
+            field, file_utils.calculate_hash(
+                packages_file, algorithm=algorithm), size))
+    return ''.join(release)
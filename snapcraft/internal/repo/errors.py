@@ -85,6 +85,40 @@ class PackageNotFoundError(RepoError):
         return self.message
 
 
+class PackageIndexNotCachedError(RepoError):
+
+    fmt = ('Cannot work offline: the package indexes for the configured '
+           'sources have not been downloaded yet.\n'
+           'Run snapcraft once without --offline to download them.')
+
+
+class PackagesNotCachedError(RepoError):
+
+    fmt = ('Cannot work offline: the following packages have not been '
+           'downloaded yet: {packages}\n'
+           'Run snapcraft once without --offline to download them.')
+
+    def __init__(self, *, packages: List[str]) -> None:
+        super().__init__(packages=' '.join(packages))
+
+
+class InvalidLocalMirrorError(RepoError):
+
+    fmt = 'Cannot use {path!r} as a local package mirror: {message}.'
+
+    def __init__(self, *, path: str, message: str) -> None:
+        super().__init__(path=path, message=message)
+
+
+class InvalidAptUpdateTTLError(RepoError):
+
+    fmt = ('Invalid value {ttl!r} for {envvar}: set it to the number of '
+           'seconds during which the package indexes are not updated again.')
+
+    def __init__(self, *, envvar: str, ttl: str) -> None:
+        super().__init__(envvar=envvar, ttl=ttl)
+
+
 class UnpackError(RepoError):
 
     fmt = 'Error while provisioning {package!r}'
@@ -16,6 +16,7 @@
 import contextlib
 import logging
 import sys
+from concurrent import futures
 from subprocess import check_call, check_output, CalledProcessError
 from urllib import parse
 
@@ -26,6 +27,8 @@ from . import errors
 
 
 _CHANNEL_RISKS = ['stable', 'candidate', 'beta', 'edge']
+# snapd only serializes changes to the same snap, keep the load reasonable.
+_MAX_CONCURRENT_SNAP_CHANGES = 4
 logger = logging.getLogger(__name__)
 
 
@@ -52,9 +55,15 @@ class SnapPackage:
     def is_snap_installed(cls, snap):
         return cls(snap).installed
 
-    def __init__(self, snap):
-        """Lifecycle handler for a snap of the format <snap-name>/<channel>."""
+    def __init__(self, snap, *, session=None):
+        """Lifecycle handler for a snap of the format <snap-name>/<channel>.
+
+        :param session: a requests_unixsocket.Session to share across the
+                        queries to snapd, a new one is used for each query
+                        if not set.
+        """
         self.name, self.channel = _get_parsed_snap(snap)
+        self._session = session
         self._original_channel = self.channel
         if not self.channel or self.channel == 'stable':
             self.channel = 'latest/stable'
@@ -88,9 +97,18 @@ class SnapPackage:
         Validity of the results are determined by checking self.installed."""
         if self._is_installed is None:
             with contextlib.suppress(exceptions.HTTPError):
-                self._local_snap_info = _get_local_snap_info(self.name)
+                self._local_snap_info = _get_local_snap_info(
+                    self.name, session=self._session)
         return self._local_snap_info
 
+    def set_local_snap_info(self, local_snap_info):
+        """Use local_snap_info, as listed by snapd, instead of querying it.
+
+        :param local_snap_info: the local payload or None if not installed.
+        """
+        self._local_snap_info = local_snap_info
+        self._is_installed = local_snap_info is not None
+
     def get_store_snap_info(self):
         """Returns a store payload for the snap."""
         if self._is_in_store is None:
@@ -100,7 +118,8 @@ class SnapPackage:
             retry_count = 5
             while retry_count > 0:
                 try:
-                    self._store_snap_info = _get_store_snap_info(self.name)
+                    self._store_snap_info = _get_store_snap_info(
+                        self.name, session=self._session)
                     break
                 except exceptions.HTTPError as http_error:
                     logger.debug('The http error when checking the store for '
@@ -153,10 +172,16 @@ class SnapPackage:
         store_channels = self._get_store_channels()
         return self.channel in store_channels.keys()
 
-    def install(self):
-        """Installs the snap onto the system."""
+    def install(self, *, use_sudo=None):
+        """Installs the snap onto the system.
+
+        :param bool use_sudo: whether to run snap with sudo, determined from
+                              the snapd login state if not set.
+        """
         snap_install_cmd = []
-        if _snap_command_requires_sudo():
+        if use_sudo is None:
+            use_sudo = _snap_command_requires_sudo()
+        if use_sudo:
             snap_install_cmd = ['sudo']
         snap_install_cmd.extend(['snap', 'install', self.name])
         if self._original_channel:
@@ -170,10 +195,16 @@ class SnapPackage:
             raise errors.SnapInstallError(snap_name=self.name,
                                           snap_channel=self.channel)
 
-    def refresh(self):
-        """Refreshes a snap onto a channel on the system."""
+    def refresh(self, *, use_sudo=None):
+        """Refreshes a snap onto a channel on the system.
+
+        :param bool use_sudo: whether to run snap with sudo, determined from
+                              the snapd login state if not set.
+        """
         snap_refresh_cmd = []
-        if _snap_command_requires_sudo():
+        if use_sudo is None:
+            use_sudo = _snap_command_requires_sudo()
+        if use_sudo:
             snap_refresh_cmd = ['sudo']
         snap_refresh_cmd.extend(['snap', 'refresh', self.name,
                                  '--channel', self.channel])
@@ -190,24 +221,64 @@ class SnapPackage:
 def install_snaps(snaps_list):
     """Install snaps of the format <snap-name>/<channel>.
 
+    The local and store state of all the snaps is resolved upfront over a
+    single snapd session, the required installs and refreshes then run
+    concurrently.
+
     :return: a list of "name=revision" for the snaps installed.
     """
-    snaps_installed = []
-    for snap in snaps_list:
-        snap_pkg = SnapPackage(snap)
-        if not snap_pkg.is_valid():
-            raise errors.SnapUnavailableError(snap_name=snap_pkg.name,
-                                              snap_channel=snap_pkg.channel)
+    if not snaps_list:
+        return []
 
-        if not snap_pkg.installed:
-            snap_pkg.install()
-        elif snap_pkg.get_current_channel() != snap_pkg.channel:
-            snap_pkg.refresh()
-
-        snap_pkg = SnapPackage(snap)
-        snaps_installed.append('{}={}'.format(
-            snap_pkg.name, snap_pkg.get_local_snap_info()['revision']))
-    return snaps_installed
+    with requests_unixsocket.Session() as session:
+        snap_pkgs = [SnapPackage(snap, session=session)
+                     for snap in snaps_list]
+        local_snaps = {snap['name']: snap
+                       for snap in _get_local_snaps(session=session)}
+        for snap_pkg in snap_pkgs:
+            snap_pkg.set_local_snap_info(local_snaps.get(snap_pkg.name))
+            if not snap_pkg.is_valid():
+                raise errors.SnapUnavailableError(
+                    snap_name=snap_pkg.name, snap_channel=snap_pkg.channel)
+
+        changes = []
+        for snap_pkg in snap_pkgs:
+            if not snap_pkg.installed:
+                changes.append((snap_pkg, snap_pkg.install))
+            elif snap_pkg.get_current_channel() != snap_pkg.channel:
+                changes.append((snap_pkg, snap_pkg.refresh))
+
+        if changes:
+            _run_snap_changes([change for _, change in changes])
+            for snap_pkg, _ in changes:
+                snap_pkg.set_local_snap_info(_get_local_snap_info(
+                    snap_pkg.name, session=session))
+
+    return ['{}={}'.format(
+        snap_pkg.name, snap_pkg.get_local_snap_info()['revision'])
+        for snap_pkg in snap_pkgs]
+
+
+def _run_snap_changes(changes):
+    use_sudo = _snap_command_requires_sudo()
+    max_workers = min(len(changes), _MAX_CONCURRENT_SNAP_CHANGES)
+    if use_sudo and max_workers > 1 and not _authenticate_sudo():
+        # Otherwise the changes would all prompt at once on the same tty.
+        max_workers = 1
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = [executor.submit(change, use_sudo=use_sudo)
+                   for change in changes]
+    for future in pending:
+        future.result()
+
+
+def _authenticate_sudo():
+    # Prompts once, the concurrent sudo calls that follow then do not.
+    try:
+        check_call(['sudo', '-v'])
+    except CalledProcessError:
+        return False
+    return True
 
 
 def _snap_command_requires_sudo():
@@ -254,30 +325,39 @@ def get_snapd_socket_path_template():
     return 'http+unix://%2Frun%2Fsnapd.socket/v2/{}'
 
 
-def _get_local_snap_info(snap_name):
+@contextlib.contextmanager
+def _snapd_session(session=None):
+    if session is not None:
+        yield session
+    else:
+        with requests_unixsocket.Session() as session:
+            yield session
+
+
+def _get_local_snap_info(snap_name, *, session=None):
     slug = 'snaps/{}'.format(parse.quote(snap_name, safe=''))
     url = get_snapd_socket_path_template().format(slug)
-    with requests_unixsocket.Session() as session:
+    with _snapd_session(session) as session:
         snap_info = session.get(url)
     snap_info.raise_for_status()
     return snap_info.json()['result']
 
 
-def _get_store_snap_info(snap_name):
+def _get_store_snap_info(snap_name, *, session=None):
     # This logic uses /v2/find returns an array of results, given that
     # we do a strict search either 1 result or a 404 will be returned.
     slug = 'find?{}'.format(parse.urlencode(dict(name=snap_name)))
     url = get_snapd_socket_path_template().format(slug)
-    with requests_unixsocket.Session() as session:
+    with _snapd_session(session) as session:
         snap_info = session.get(url)
     snap_info.raise_for_status()
     return snap_info.json()['result'][0]
 
 
-def _get_local_snaps():
+def _get_local_snaps(*, session=None):
     slug = 'snaps'
     url = get_snapd_socket_path_template().format(slug)
-    with requests_unixsocket.Session() as session:
+    with _snapd_session(session) as session:
         snap_info = session.get(url)
     snap_info.raise_for_status()
     return snap_info.json()['result']
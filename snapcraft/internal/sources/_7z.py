@@ -16,12 +16,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import shutil
 import subprocess
-import tempfile
 
 from . import errors
-from ._base import FileBase
+from ._base import FileBase, extraction_dir
 
 
 class SevenZip(FileBase):
@@ -49,15 +47,7 @@ class SevenZip(FileBase):
                 self.source_dir, os.path.basename(self.source))
         seven_zip_file = os.path.realpath(seven_zip_file)
 
-        if clean_target:
-            tmp_7z = tempfile.NamedTemporaryFile().name
-            shutil.move(seven_zip_file, tmp_7z)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_7z, seven_zip_file)
-
-        extract_command = ['7z', 'x', seven_zip_file]
-        subprocess.check_output(extract_command, cwd=dst)
-
-        if not keep_7z:
-            os.remove(seven_zip_file)
+        with extraction_dir(dst, seven_zip_file, clean_target=clean_target,
+                            keep_archive=keep_7z) as target:
+            extract_command = ['7z', 'x', seven_zip_file]
+            subprocess.check_output(extract_command, cwd=target)
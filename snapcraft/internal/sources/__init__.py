@@ -163,7 +163,8 @@ def get_source_handler(source, *, source_type=''):
     return _source_handler[source_type]
 
 
-_tar_type_regex = re.compile(r'.*\.((tar(\.(xz|gz|bz2))?)|tgz)$')
+_tar_type_regex = re.compile(
+    r'.*\.((tar(\.(xz|gz|bz2|zst))?)|tgz|tzst)$')
 
 
 def _get_source_type_from_uri(source, ignore_errors=False):  # noqa: C901
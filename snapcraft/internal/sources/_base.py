@@ -13,17 +13,32 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import logging
 import os
+import re
 import requests
 import shutil
+import stat
+import tempfile
+import threading
+from typing import Iterator, Optional
 
 import snapcraft.internal.common
+from snapcraft.file_utils import calculate_hash, clone_or_link
 from snapcraft.internal.cache import FileCache
+from snapcraft.internal.errors import DownloadRangeNotSupportedError
 from snapcraft.internal.indicators import (
+    discard_segmented_download,
     download_requests_stream,
-    download_urllib_source
+    download_segmented,
+    download_urllib_source,
+    has_pending_segments,
+    supports_segmented_download,
 )
-from ._checksum import split_checksum, verify_checksum
+from ._checksum import split_checksum, verify_checksum, verify_digest
+
+logger = logging.getLogger(__name__)
 
 
 class Base:
@@ -51,6 +66,7 @@ class FileBase(Base):
 
         # If not, first check if it is a url and download and if not
         # it is probably locally referenced.
+        # Downloads are verified as they are written.
         if not source_file and is_source_url:
             source_file = self.download()
         elif not source_file:
@@ -60,9 +76,9 @@ class FileBase(Base):
             # this file and we don't want that.
             shutil.copy2(self.source, source_file)
 
-        # Verify before provisioning
-        if self.source_checksum:
-            verify_checksum(self.source_checksum, source_file)
+            # Verify before provisioning
+            if self.source_checksum:
+                verify_checksum(self.source_checksum, source_file)
 
         # We finally provision
         self.provision(self.source_dir, src=source_file)
@@ -70,15 +86,16 @@ class FileBase(Base):
     def download(self):
         # First check if we already have the source file cached.
         file_cache = FileCache()
+        algorithm = None
         if self.source_checksum:
-            algorithm, hash = split_checksum(self.source_checksum)
-            cache_file = file_cache.get(algorithm=algorithm, hash=hash)
+            algorithm, digest = split_checksum(self.source_checksum)
+            cache_file = self._get_cached_file()
             if cache_file:
                 self.file = os.path.join(self.source_dir,
                                          os.path.basename(cache_file))
-                # We make this copy as the provisioning logic can delete
-                # this file and we don't want that.
-                shutil.copy2(cache_file, self.file)
+                # The provisioning logic can delete this file so we need an
+                # entry of our own, but there is no need to copy the data.
+                clone_or_link(cache_file, self.file)
                 return self.file
 
         # If not we download and store
@@ -87,19 +104,132 @@ class FileBase(Base):
 
         if snapcraft.internal.common.get_url_scheme(self.source) == 'ftp':
             download_urllib_source(self.source, self.file)
+            if algorithm:
+                calculated_digest = calculate_hash(
+                    self.file, algorithm=algorithm)
         else:
-            request = requests.get(
-                self.source, stream=True, allow_redirects=True)
-            request.raise_for_status()
-
-            download_requests_stream(request, self.file)
+            calculated_digest = self._download_http(algorithm)
 
         # We verify the file if source_checksum is defined
         # and we cache the file for future reuse.
         if self.source_checksum:
-            algorithm, digest = verify_checksum(
-                self.source_checksum, self.file)
+            verify_digest(self.source_checksum, calculated_digest)
             file_cache.cache(filename=self.file,
                              algorithm=algorithm,
-                             hash=hash)
+                             hash=digest,
+                             verify=False)
         return self.file
+
+    def _download_http(self, algorithm):
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        request.raise_for_status()
+
+        if supports_segmented_download(request):
+            request.close()
+            try:
+                return download_segmented(
+                    request.url, self.file,
+                    int(request.headers['Content-Length']),
+                    algorithm=algorithm)
+            except DownloadRangeNotSupportedError as e:
+                logger.debug('{} Downloading in a single stream.'.format(e))
+            request = requests.get(
+                request.url, stream=True, allow_redirects=True)
+            request.raise_for_status()
+        elif has_pending_segments(self.file):
+            # The server stopped offering ranges, start over.
+            discard_segmented_download(self.file)
+        return download_requests_stream(
+            request, self.file, algorithm=algorithm)
+
+    def _get_cached_file(self):
+        """Return the cached copy of the source if source_checksum is set."""
+        if not self.source_checksum:
+            return None
+        algorithm, hash = split_checksum(self.source_checksum)
+        return FileCache().get(algorithm=algorithm, hash=hash)
+
+
+@contextlib.contextmanager
+def extraction_dir(dst: str, archive: Optional[str], *, clean_target: bool,
+                   keep_archive: bool) -> Iterator[str]:
+    """Yield the directory to extract archive into to provision dst.
+
+    With clean_target the extraction goes into a staging directory next
+    to dst which is renamed over it once complete, so a failed extraction
+    leaves the previous tree intact. The previous tree is removed in the
+    background. Otherwise the archive is extracted on top of dst.
+
+    The archive is removed once extracted unless keep_archive is set.
+    """
+    if not clean_target:
+        yield dst
+        if archive and not keep_archive:
+            os.remove(archive)
+        return
+
+    dst = os.path.abspath(dst)
+    _remove_stale_staging(dst)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(dst),
+                               prefix='.{}-'.format(os.path.basename(dst)))
+    try:
+        if os.path.isdir(dst):
+            os.chmod(staging, stat.S_IMODE(os.stat(dst).st_mode))
+        else:
+            os.chmod(staging, 0o755)
+        yield staging
+        if archive:
+            _move_archive(archive, dst, staging, keep_archive)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if os.path.isdir(dst) and not os.path.islink(dst):
+        old = staging + '.old'
+        os.rename(dst, old)
+        os.rename(staging, dst)
+        _remove_in_background(old)
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(dst)
+        os.rename(staging, dst)
+
+
+def _remove_stale_staging(dst: str) -> None:
+    # Left behind by extractions that were interrupted, along with the
+    # previous trees that were not fully removed yet.
+    stale = re.compile(r'\.{}-[a-z0-9_]{{8}}(\.old)?$'.format(
+        re.escape(os.path.basename(dst))))
+    parent = os.path.dirname(dst)
+    for name in os.listdir(parent):
+        if not stale.match(name):
+            continue
+        path = os.path.join(parent, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            _remove_in_background(path)
+        else:
+            os.unlink(path)
+
+
+def _move_archive(archive: str, dst: str, staging: str,
+                  keep_archive: bool) -> None:
+    relative_path = os.path.relpath(
+        os.path.realpath(archive), os.path.realpath(dst))
+    if (relative_path == os.pardir or
+            relative_path.startswith(os.pardir + os.sep)):
+        if not keep_archive:
+            os.remove(archive)
+    elif keep_archive:
+        # Otherwise it goes away with the rest of the previous tree.
+        target = os.path.join(staging, relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(archive, target)
+
+
+def _remove_in_background(path: str) -> threading.Thread:
+    # Not a daemon thread so the removal completes before snapcraft exits.
+    thread = threading.Thread(
+        target=shutil.rmtree, args=(path,), kwargs={'ignore_errors': True},
+        name='remove {}'.format(path))
+    thread.start()
+    return thread
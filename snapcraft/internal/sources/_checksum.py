@@ -47,6 +47,21 @@ def verify_checksum(source_checksum: str, checkfile: str) -> Tuple:
     algorithm, digest = split_checksum(source_checksum)
 
     calculated_digest = calculate_hash(checkfile, algorithm=algorithm)
+    return verify_digest(source_checksum, calculated_digest)
+
+
+def verify_digest(source_checksum: str, calculated_digest: str) -> Tuple:
+    """Verifies that calculated_digest corresponds to source_checksum.
+    :param str source_checksum: algorithm/hash expected.
+    :param str calculated_digest: the hash calculated with the algorithm
+                                  defined in source_checksum.
+    :raises ValueError: if source_checksum is not of the form algorightm/hash.
+    :raises DigestDoesNotMatchError: if calculated_digest does not match the
+                                     expected hash.
+    :returns: a tuple consisting of the algorithm and the hash.
+    """
+    algorithm, digest = split_checksum(source_checksum)
+
     if digest != calculated_digest:
         raise errors.DigestDoesNotMatchError(digest, calculated_digest)
 
@@ -14,14 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
-import shutil
 import tarfile
-import tempfile
 
 import debian.arfile
 
 from . import errors
-from ._base import FileBase
+from ._base import FileBase, extraction_dir
+from ._decompress import decompress
 
 
 class Deb(FileBase):
@@ -47,13 +46,6 @@ class Deb(FileBase):
             deb_file = os.path.join(
                 self.source_dir, os.path.basename(self.source))
 
-        if clean_target:
-            tmp_deb = tempfile.NamedTemporaryFile().name
-            shutil.move(deb_file, tmp_deb)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_deb, deb_file)
-
         # Importing DebFile causes LP: #1731478 when snapcraft is
         # run as a snap.
         deb_ar = debian.arfile.ArFile(deb_file)
@@ -63,8 +55,10 @@ class Deb(FileBase):
         except IndexError:
             raise errors.InvalidDebError(deb_file=deb_file)
         data_member = deb_ar.getmember(data_member_name)
-        with tarfile.open(fileobj=data_member) as tar:
-            tar.extractall(dst)
-
-        if not keep_deb:
-            os.remove(deb_file)
+        with extraction_dir(dst, deb_file, clean_target=clean_target,
+                            keep_archive=keep_deb) as target:
+            # Stream the member, there is no need to seek around the
+            # archive.
+            with decompress(data_member) as data, tarfile.open(
+                    fileobj=data, mode='r|*') as tar:
+                tar.extractall(target)
@@ -0,0 +1,200 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import contextlib
+import io
+import os
+import shutil
+import stat
+import subprocess
+import threading
+from typing import List, Optional  # noqa: F401
+
+from snapcraft.internal.errors import MissingCommandError
+from . import errors
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Enough to tell the supported formats apart.
+_MAGIC_SIZE = 6
+# Feed the decompressors in large chunks.
+_CHUNK_SIZE = 2**20
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_BZIP2_MAGIC = b'BZh'
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Commands that decompress to stdout using several threads.
+_DECOMPRESSORS = (
+    (_GZIP_MAGIC, ['pigz', '-dc']),
+    (_BZIP2_MAGIC, ['lbzip2', '-dc']),
+    (_XZ_MAGIC, ['xz', '-dc', '-T0']),
+    (_ZSTD_MAGIC, ['zstd', '-dc', '-T0']),
+)
+
+
+@contextlib.contextmanager
+def decompress(fileobj):
+    """Yield a file object reading the decompressed contents of fileobj.
+
+    gzip, bzip2, xz and zstd data is piped through pigz, lbzip2, xz or zstd
+    when installed. Otherwise what is read is yielded as is for tarfile to
+    decompress, except for zstd which tarfile does not support and is
+    decompressed with the zstandard module.
+
+    :raises snapcraft.internal.errors.MissingCommandError: if the data is
+        zstd compressed and there is no way to decompress it.
+    :raises errors.DecompressionError: if the decompressor fails.
+    """
+    fd = _get_regular_file_fd(fileobj)
+    if fd is None:
+        magic = _read_magic(fileobj)
+    else:
+        # Leave the file where it is, the decompressor reads it directly.
+        magic = os.pread(fd, _MAGIC_SIZE, fileobj.tell())
+
+    command = _get_decompressor(magic)
+    if command:
+        with _pipe(command, fileobj, fd, magic) as pipe:
+            yield pipe
+        return
+
+    if fd is None:
+        fileobj = _PrefixedReader(magic, fileobj)
+    if not magic.startswith(_ZSTD_MAGIC):
+        yield fileobj
+    elif zstandard:
+        yield zstandard.ZstdDecompressor().stream_reader(fileobj)
+    else:
+        raise MissingCommandError(['zstd'])
+
+
+def _get_decompressor(magic: bytes) -> Optional[List[str]]:
+    for format_magic, command in _DECOMPRESSORS:
+        if magic.startswith(format_magic) and shutil.which(command[0]):
+            return command
+    return None
+
+
+def _get_regular_file_fd(fileobj) -> Optional[int]:
+    try:
+        fd = fileobj.fileno()
+        if stat.S_ISREG(os.fstat(fd).st_mode):
+            return fd
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    return None
+
+
+def _read_magic(fileobj) -> bytes:
+    magic = b''
+    while len(magic) < _MAGIC_SIZE:
+        data = fileobj.read(_MAGIC_SIZE - len(magic))
+        if not data:
+            break
+        magic += data
+    return magic
+
+
+@contextlib.contextmanager
+def _pipe(command, fileobj, fd, magic):
+    """Yield the output of command decompressing fileobj.
+
+    Regular files are handed to the command as they are, anything else is
+    fed to it from a thread, starting with the magic already read.
+    """
+    if fd is not None:
+        os.lseek(fd, fileobj.tell(), os.SEEK_SET)
+        process = subprocess.Popen(command, stdin=fd, stdout=subprocess.PIPE)
+        feeder = None
+    else:
+        process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        feeder = _Feeder(magic, fileobj, process.stdin)
+        feeder.start()
+
+    try:
+        yield process.stdout
+        # Let the decompressor finish, readers may stop short of the end
+        # (e.g. tarfile leaves the trailing padding).
+        while process.stdout.read(_CHUNK_SIZE):
+            pass
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+        if feeder:
+            feeder.join()
+            # Failing to read the source is what matters, not the errors
+            # caused by cutting the decompressor short.
+            if feeder.error:
+                raise feeder.error
+
+    if process.returncode != 0:
+        raise errors.DecompressionError(command, process.returncode)
+
+
+class _Feeder(threading.Thread):
+
+    def __init__(self, magic, fileobj, pipe):
+        super().__init__(daemon=True)
+        self._data = magic
+        self._fileobj = fileobj
+        self._pipe = pipe
+        self.error = None  # type: Exception
+
+    def run(self):
+        try:
+            data = self._data
+            while data:
+                self._pipe.write(data)
+                data = self._fileobj.read(_CHUNK_SIZE)
+        except BrokenPipeError:
+            # The decompressor is gone, its exit code tells why.
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            with contextlib.suppress(BrokenPipeError):
+                self._pipe.close()
+
+
+class _PrefixedReader:
+    """Read what was taken from fileobj to tell its format, then the rest."""
+
+    def __init__(self, prefix, fileobj):
+        self._prefix = prefix
+        self._fileobj = fileobj
+
+    def read(self, size=-1):
+        if not self._prefix:
+            return self._fileobj.read(size)
+        if size is None or size < 0:
+            data = self._prefix + self._fileobj.read()
+            self._prefix = b''
+            return data
+        data = self._prefix[:size]
+        self._prefix = self._prefix[size:]
+        if len(data) < size:
+            data += self._fileobj.read(size - len(data))
+        return data
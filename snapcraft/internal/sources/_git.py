@@ -14,15 +14,44 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
+import logging
 import os
 import re
+import shutil
 import subprocess
 import sys
 
+import snapcraft.internal.common
+from snapcraft.internal.cache import GitMirrorCache
 from . import errors
 from ._base import Base
 
 
+logger = logging.getLogger(__name__)
+
+# Set to clone without the blobs, which are fetched as needed.
+_PARTIAL_CLONE_ENVVAR = 'SNAPCRAFT_GIT_PARTIAL_CLONE'
+# Set to the number of submodules to fetch in parallel.
+_SUBMODULE_JOBS_ENVVAR = 'SNAPCRAFT_GIT_SUBMODULE_JOBS'
+
+_FULL_HASH = re.compile(r'^([0-9a-fA-F]{40}|[0-9a-fA-F]{64})$')
+
+
+def _get_submodule_jobs():
+    jobs = os.environ.get(_SUBMODULE_JOBS_ENVVAR)
+    if not jobs:
+        return None
+    try:
+        value = int(jobs)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise errors.InvalidGitSubmoduleJobsError(
+            _SUBMODULE_JOBS_ENVVAR, jobs)
+    return value
+
+
 class Git(Base):
 
     @classmethod
@@ -99,7 +128,17 @@ class Git(Base):
             self._call_kwargs['stdout'] = subprocess.DEVNULL
             self._call_kwargs['stderr'] = subprocess.DEVNULL
 
+        self._partial_clone = os.environ.get(
+            _PARTIAL_CLONE_ENVVAR, 'n').lower() in ('y', 'yes', '1', 'true')
+        self._submodule_jobs = _get_submodule_jobs()
+
     def _pull_existing(self):
+        if self._is_pinned() and os.path.isfile(
+                os.path.join(self.source_dir, '.git', 'shallow')):
+            # Fetched on its own before, keep it that way.
+            self._fetch_commit(['reset', '--hard', self.source_commit])
+            return
+
         refspec = 'HEAD'
         if self.source_branch:
             refspec = 'refs/heads/' + self.source_branch
@@ -110,10 +149,17 @@ class Git(Base):
 
         reset_spec = refspec if refspec != 'HEAD' else 'origin/master'
 
-        subprocess.check_call([self.command, '-C', self.source_dir,
-                               'fetch', '--prune',
-                               '--recurse-submodules=yes'],
-                              **self._call_kwargs)
+        with self._update_mirror() as mirror:
+            # With a mirror at hand what is new was just fetched into it,
+            # so this fetch is a local one.
+            fetch_from = []
+            if mirror:
+                fetch_from = [mirror, '+refs/heads/*:refs/remotes/origin/*',
+                              '+refs/tags/*:refs/tags/*']
+            subprocess.check_call([self.command, '-C', self.source_dir,
+                                   'fetch', '--prune',
+                                   '--recurse-submodules=yes'] + fetch_from,
+                                  **self._call_kwargs)
         subprocess.check_call([self.command, '-C', self.source_dir,
                                'reset', '--hard', reset_spec],
                               **self._call_kwargs)
@@ -121,23 +167,103 @@ class Git(Base):
         # Merge any updates for the submodules (if any).
         subprocess.check_call([self.command, '-C', self.source_dir,
                               'submodule', 'update', '--recursive',
-                               '--force'], **self._call_kwargs)
+                               '--force'] + self._get_jobs_args(),
+                              **self._call_kwargs)
 
     def _clone_new(self):
+        if (self._is_pinned() and
+                not os.path.isdir(GitMirrorCache().get_mirror_path(
+                    self.source)) and
+                self._init_and_fetch_commit()):
+            return
+
         command = [self.command, 'clone', '--recursive']
+        command.extend(self._get_jobs_args())
         if self.source_tag or self.source_branch:
             command.extend([
                 '--branch', self.source_tag or self.source_branch])
         if self.source_depth:
             command.extend(['--depth', str(self.source_depth)])
-        subprocess.check_call(command + [self.source, self.source_dir],
-                              **self._call_kwargs)
+        if self._partial_clone:
+            command.append('--filter=blob:none')
+        with self._update_mirror() as mirror:
+            if mirror:
+                # Borrow the objects from the mirror for the clone only, so
+                # the clone outlives the mirror being pruned.
+                command.extend(['--reference', mirror, '--dissociate'])
+            subprocess.check_call(command + [self.source, self.source_dir],
+                                  **self._call_kwargs)
 
         if self.source_commit:
             subprocess.check_call([self.command, '-C', self.source_dir,
                                   'checkout', self.source_commit],
                                   **self._call_kwargs)
 
+    def _is_pinned(self):
+        # Servers only hand out commits asked for by their full hash.
+        return bool(self.source_commit and
+                    _FULL_HASH.match(self.source_commit) and
+                    snapcraft.internal.common.isurl(self.source))
+
+    def _init_and_fetch_commit(self):
+        """Fetch nothing but source_commit into a new repository.
+
+        :returns: False if the remote refused to serve the commit on its
+                  own, in which case nothing is left behind.
+        """
+        os.makedirs(self.source_dir, exist_ok=True)
+        subprocess.check_call([self.command, '-C', self.source_dir, 'init'],
+                              **self._call_kwargs)
+        subprocess.check_call([self.command, '-C', self.source_dir, 'remote',
+                               'add', 'origin', self.source],
+                              **self._call_kwargs)
+        try:
+            self._fetch_commit(['checkout', self.source_commit])
+        except subprocess.CalledProcessError:
+            logger.info('Could not fetch commit {} on its own, cloning {} '
+                        'instead.'.format(self.source_commit, self.source))
+            shutil.rmtree(self.source_dir)
+            return False
+        return True
+
+    def _fetch_commit(self, checkout_args):
+        command = [self.command, '-C', self.source_dir, 'fetch',
+                   '--depth', '1']
+        if self._partial_clone:
+            command.append('--filter=blob:none')
+        subprocess.check_call(command + ['origin', self.source_commit],
+                              **self._call_kwargs)
+        subprocess.check_call(
+            [self.command, '-C', self.source_dir] + checkout_args,
+            **self._call_kwargs)
+        subprocess.check_call([self.command, '-C', self.source_dir,
+                               'submodule', 'update', '--init',
+                               '--recursive', '--force'] +
+                              self._get_jobs_args(), **self._call_kwargs)
+
+    def _get_jobs_args(self):
+        if not self._submodule_jobs:
+            return []
+        return ['--jobs', str(self._submodule_jobs)]
+
+    @contextlib.contextmanager
+    def _update_mirror(self):
+        """Update the cached mirror of a remote source and yield its path.
+
+        None is yielded for local sources, which are cloned efficiently as
+        is, and for shallow and partial clones, which would gain little
+        from it.
+        """
+        if (self.source_depth or self._partial_clone or
+                not snapcraft.internal.common.isurl(self.source)):
+            yield None
+            return
+
+        with GitMirrorCache().update(
+                self.source, command=self.command,
+                **self._call_kwargs) as mirror:
+            yield mirror
+
     def pull(self):
         if os.path.exists(os.path.join(self.source_dir, '.git')):
             self._pull_existing()
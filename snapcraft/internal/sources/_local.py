@@ -14,32 +14,217 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import copy
+import collections
+import contextlib
+import fnmatch
 import glob
+import json
+import logging
 import os
+import shutil
+from typing import Dict, List, Optional, Set  # noqa: F401
 
 from snapcraft import file_utils
 from snapcraft.internal import common
 from ._base import Base
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever the manifest changes so older ones are not trusted.
+_MANIFEST_VERSION = 1
+
+# What packing writes into the project, never part of its source.
+_PACK_ARTEFACTS = ('*.snap', '*.snap.digest')
+
+_DIRECTORY = 'd'
+_FILE = 'f'
+_SYMLINK = 'l'
+
+# Sets of paths relative to the source.
+LocalChanges = collections.namedtuple(
+    'LocalChanges', ['added', 'updated', 'removed'])
+
 
 class Local(Base):
+    """Link a local directory into the source dir.
+
+    What is linked is recorded, by inode and modification time, in a
+    manifest next to the source dir so pulling again only has to touch
+    what changed since.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # What the last pull changed.
+        self.changes = None  # type: LocalChanges
 
     def pull(self):
-        current_dir = os.getcwd()
         source_abspath = os.path.abspath(self.source)
+        if not os.path.isdir(source_abspath):
+            raise NotADirectoryError(
+                '{!r} is not a directory'.format(source_abspath))
+        if (not os.path.isdir(self.source_dir) and
+                os.path.lexists(self.source_dir)):
+            raise NotADirectoryError(
+                'Cannot overwrite non-directory {!r} with directory '
+                '{!r}'.format(self.source_dir, source_abspath))
+
+        entries = self._scan(source_abspath)
+        previous = self._load_manifest()
+        if previous is None:
+            previous = dict()
+        self.changes = _diff(previous, entries)
+        logger.debug('Pulling {} added, {} updated and {} removed entries '
+                     'from {!r}'.format(len(self.changes.added),
+                                        len(self.changes.updated),
+                                        len(self.changes.removed),
+                                        source_abspath))
+
+        file_utils.create_similar_directory(source_abspath, self.source_dir)
+        self._apply(source_abspath, entries)
+        self._save_manifest(entries)
+
+    def is_pulled(self) -> bool:
+        """Return True if the source dir holds a pull that can be updated."""
+        return self._load_manifest() is not None
+
+    def get_changes(self) -> Optional[LocalChanges]:
+        """Return what changed in the source since it was last pulled.
+
+        :returns: the changes, or None if there is no pull to compare with.
+        """
+        previous = self._load_manifest()
+        if previous is None:
+            return None
+        # Older pulls recorded pack artefacts, those are no reason to pull
+        # again.
+        previous = {path: entry for path, entry in previous.items()
+                    if not _is_pack_artefact(path)}
+        return _diff(previous, self._scan(os.path.abspath(self.source)))
+
+    def _scan(self, source: str) -> Dict[str, List]:
+        """Return the kind, inode and modification time of every entry."""
+        entries = dict()  # type: Dict[str, List]
+        destination = os.path.abspath(self.source_dir)
+        directories = ['']
+        while directories:
+            relative_dir = directories.pop()
+            directory = os.path.join(source, relative_dir)
+            ignored = _get_ignored(source, directory)
+            with os.scandir(directory) as it:
+                for entry in it:
+                    # Don't recurse into the source dir if it is in the
+                    # source.
+                    if entry.name in ignored or entry.path == destination:
+                        continue
+                    path = os.path.join(relative_dir, entry.name)
+                    stat = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        kind = _DIRECTORY
+                        directories.append(path)
+                    elif entry.is_symlink():
+                        kind = _SYMLINK
+                    else:
+                        kind = _FILE
+                    entries[path] = [kind, stat.st_ino, stat.st_mtime_ns]
+        return entries
 
-        def ignore(directory, files):
-            if directory == source_abspath or \
-               directory == current_dir:
-                ignored = copy.copy(common.SNAPCRAFT_FILES)
-                snaps = glob.glob(os.path.join(directory, '*.snap'))
-                if snaps:
-                    snaps = [os.path.basename(s) for s in snaps]
-                    ignored += snaps
-                return ignored
+    def _apply(self, source: str, entries: Dict[str, List]) -> None:
+        # Deepest first, so directories are empty by the time they go.
+        for path in sorted(self.changes.removed, reverse=True):
+            _remove(os.path.join(self.source_dir, path))
+
+        # Directories sort before what they contain.
+        for path in sorted(self.changes.added | self.changes.updated):
+            source_path = os.path.join(source, path)
+            destination = os.path.join(self.source_dir, path)
+            is_directory = (os.path.isdir(destination) and
+                            not os.path.islink(destination))
+            if entries[path][0] == _DIRECTORY:
+                if not is_directory:
+                    _remove(destination)
+                file_utils.create_similar_directory(source_path, destination)
             else:
-                return []
+                if is_directory:
+                    shutil.rmtree(destination)
+                file_utils.link_or_copy(source_path, destination)
+
+    def _get_manifest_path(self) -> str:
+        source_dir = os.path.abspath(self.source_dir)
+        return os.path.join(
+            os.path.dirname(source_dir),
+            '.{}.manifest'.format(os.path.basename(source_dir)))
+
+    def _get_source_dir_id(self) -> Optional[List[int]]:
+        # A source dir that was removed and created again, or changed by
+        # someone else, does not hold what the manifest says.
+        try:
+            stat = os.stat(self.source_dir)
+        except FileNotFoundError:
+            return None
+        return [stat.st_ino, stat.st_ctime_ns]
+
+    def _load_manifest(self) -> Optional[Dict[str, List]]:
+        try:
+            with open(self._get_manifest_path()) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+        if (manifest.get('version') != _MANIFEST_VERSION or
+                manifest.get('source') != os.path.abspath(self.source) or
+                manifest.get('source-dir') != self._get_source_dir_id()):
+            return None
+        return manifest['entries']
+
+    def _save_manifest(self, entries: Dict[str, List]) -> None:
+        manifest_path = self._get_manifest_path()
+        temp_path = manifest_path + '.partial'
+        with open(temp_path, 'w') as manifest_file:
+            json.dump({
+                'version': _MANIFEST_VERSION,
+                'source': os.path.abspath(self.source),
+                'source-dir': self._get_source_dir_id(),
+                'entries': entries,
+            }, manifest_file)
+        os.replace(temp_path, manifest_path)
+
+
+def _get_ignored(source: str, directory: str) -> Set[str]:
+    if directory.rstrip('/') not in (source, os.getcwd()):
+        return set()
+    ignored = set(common.SNAPCRAFT_FILES)
+    for pattern in _PACK_ARTEFACTS:
+        ignored.update(os.path.basename(s)
+                       for s in glob.glob(os.path.join(directory, pattern)))
+    return ignored
+
+
+def _is_pack_artefact(path: str) -> bool:
+    return (not os.path.dirname(path) and
+            any(fnmatch.fnmatch(path, p) for p in _PACK_ARTEFACTS))
+
+
+def _diff(previous: Dict[str, List], current: Dict[str, List]) -> LocalChanges:
+    added = set(current) - set(previous)
+    removed = set(previous) - set(current)
+    updated = set()
+    for path in set(current) & set(previous):
+        kind, inode, mtime = current[path]
+        previous_kind, previous_inode, previous_mtime = previous[path]
+        # Directories change along with their contents, which are tracked
+        # on their own.
+        if (kind != previous_kind or inode != previous_inode or
+                (kind != _DIRECTORY and mtime != previous_mtime)):
+            updated.add(path)
+    return LocalChanges(added=added, updated=updated, removed=removed)
+
 
-        file_utils.link_or_copy_tree(
-            source_abspath, self.source_dir, ignore=ignore)
+def _remove(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Leave directories with content that did not come from the source.
+        with contextlib.suppress(OSError):
+            os.rmdir(path)
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
@@ -16,12 +16,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
 import shlex
-import shutil
 import subprocess
-import tempfile
 
 from . import errors
-from ._base import FileBase
+from ._base import FileBase, extraction_dir
 
 
 class Rpm(FileBase):
@@ -49,16 +47,8 @@ class Rpm(FileBase):
                 self.source_dir, os.path.basename(self.source))
         rpm_file = os.path.realpath(rpm_file)
 
-        if clean_target:
-            tmp_rpm = tempfile.NamedTemporaryFile().name
-            shutil.move(rpm_file, tmp_rpm)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_rpm, rpm_file)
-
-        extract_command = 'rpm2cpio {} | cpio -idmv'.format(
-            shlex.quote(rpm_file))
-        subprocess.check_output(extract_command, shell=True, cwd=dst)
-
-        if not keep_rpm:
-            os.remove(rpm_file)
+        with extraction_dir(dst, rpm_file, clean_target=clean_target,
+                            keep_archive=keep_rpm) as target:
+            extract_command = 'rpm2cpio {} | cpio -idmv'.format(
+                shlex.quote(rpm_file))
+            subprocess.check_output(extract_command, shell=True, cwd=target)
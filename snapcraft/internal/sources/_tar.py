@@ -14,14 +14,26 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import os
 import re
-import shutil
 import tarfile
 import tempfile
+from typing import Set  # noqa: F401
 
+import requests
+
+import snapcraft.internal.common
+from snapcraft.file_utils import HashingWriter
+from snapcraft.internal import indicators
+from snapcraft.internal.cache import FileCache
 from . import errors
-from ._base import FileBase
+from ._base import FileBase, extraction_dir
+from ._checksum import split_checksum, verify_digest
+from ._decompress import decompress
+
+# Read the tarball in large chunks when extracting it as a stream.
+_STREAM_BUFSIZE = 2**20
 
 
 class Tar(FileBase):
@@ -51,48 +63,96 @@ class Tar(FileBase):
             tarball = os.path.join(
                 self.source_dir, os.path.basename(self.source))
 
-        if clean_target:
-            tmp_tarball = tempfile.NamedTemporaryFile().name
-            shutil.move(tarball, tmp_tarball)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_tarball, tarball)
+        with extraction_dir(dst, tarball, clean_target=clean_target,
+                            keep_archive=keep_tarball) as target:
+            self._extract(tarball, target)
+
+    def pull(self):
+        scheme = snapcraft.internal.common.get_url_scheme(self.source)
+        if scheme not in ('http', 'https'):
+            super().pull()
+            return
+
+        with extraction_dir(self.source_dir, None, clean_target=True,
+                            keep_archive=False) as target:
+            cache_file = self._get_cached_file()
+            if cache_file:
+                # Extract straight from the cache, there is no need for a
+                # copy.
+                self._extract(cache_file, target)
+            else:
+                self._pull_stream(target)
 
-        self._extract(tarball, dst)
+    def _pull_stream(self, dst):
+        """Download and extract the tarball in a single pass.
 
-        if not keep_tarball:
-            os.remove(tarball)
+        If source_checksum is set the stream is hashed and written to a
+        temporary file alongside the file cache as it is extracted so it can
+        be verified and linked into the cache once the download completes.
+        """
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        request.raise_for_status()
+
+        with contextlib.ExitStack() as stack:
+            observers = []
+            if self.source_checksum:
+                algorithm, digest = split_checksum(self.source_checksum)
+                file_cache = FileCache()
+                os.makedirs(file_cache.file_cache, exist_ok=True)
+                tee = stack.enter_context(tempfile.NamedTemporaryFile(
+                    dir=file_cache.file_cache, prefix='.download-'))
+                writer = HashingWriter(tee, algorithm=algorithm)
+                observers.append(writer.write)
+
+            stream = indicators.RequestsStreamReader(
+                request, self.source, observers=observers)
+            stack.callback(stream.close)
+            self._extract_stream(stream, dst)
+            # Trailing padding is not read by tarfile but is hashed.
+            stream.drain()
+
+            if self.source_checksum:
+                verify_digest(self.source_checksum, writer.hexdigest())
+                tee.flush()
+                file_cache.cache(filename=tee.name, algorithm=algorithm,
+                                 hash=digest, verify=False)
 
     def _extract(self, tarball, dst):
-        with tarfile.open(tarball) as tar:
-            def filter_members(tar):
-                """Filters members and member names:
-                    - strips common prefix
-                    - bans dangerous names"""
-                members = tar.getmembers()
-                common = os.path.commonprefix([m.name for m in members])
-
-                # commonprefix() works a character at a time and will
-                # consider "d/ab" and "d/abc" to have common prefix "d/ab";
-                # check all members either start with common dir
-                for m in members:
-                    if not (m.name.startswith(common + '/') or
-                            m.isdir() and m.name == common):
-                        # commonprefix() didn't return a dir name; go up one
-                        # level
-                        common = os.path.dirname(common)
-                        break
-
-                for m in members:
-                    if m.name == common:
-                        continue
-                    self._strip_prefix(common, m)
-                    # We mask all files to be writable to be able to easily
-                    # extract on top.
-                    m.mode = m.mode | 0o200
-                    yield m
-
-            tar.extractall(members=filter_members(tar), path=dst)
+        with open(tarball, 'rb') as f:
+            self._extract_stream(f, dst)
+
+    def _extract_stream(self, fileobj, dst):
+        """Extract the tarball read sequentially from fileobj into dst.
+
+        The common prefix of the members is stripped as the members come
+        along; if a member shows up that does not share the prefix assumed
+        so far, what was already extracted is moved back down under the
+        part of the prefix that no longer applies.
+        """
+        extracted = set()  # type: Set[str]
+        common = None
+        with decompress(fileobj) as data, tarfile.open(
+                fileobj=data, mode='r|*', bufsize=_STREAM_BUFSIZE) as tar:
+            for m in tar:
+                if common is None:
+                    common = m.name if m.isdir() else os.path.dirname(m.name)
+                elif not _is_under(common, m):
+                    member_dir = (
+                        m.name if m.isdir() else os.path.dirname(m.name))
+                    new_common = _get_common_dir(common, member_dir)
+                    _unstrip(dst, extracted,
+                             common[len(new_common):].lstrip('/'))
+                    common = new_common
+
+                if m.name == common:
+                    continue
+                self._strip_prefix(common, m)
+                # We mask all files to be writable to be able to easily
+                # extract on top.
+                m.mode = m.mode | 0o200
+                if m.name:
+                    extracted.add(m.name.split('/')[0])
+                tar.extract(m, path=dst)
 
     def _strip_prefix(self, common, member):
         if member.name.startswith(common + '/'):
@@ -104,3 +164,32 @@ class Tar(FileBase):
             if member.linkname.startswith(common + '/'):
                 member.linkname = member.linkname[len(common + '/'):]
             member.linkname = re.sub(r'^(\.{0,2}/)*', r'', member.linkname)
+
+
+def _is_under(common, member):
+    return (common == '' or member.name == common or
+            member.name.startswith(common + '/'))
+
+
+def _get_common_dir(a, b):
+    common = []
+    for a_part, b_part in zip(a.split('/'), b.split('/')):
+        if a_part != b_part:
+            break
+        common.append(a_part)
+    return '/'.join(common)
+
+
+def _unstrip(dst, extracted, subdir):
+    """Move the extracted top level entries of dst into dst/subdir."""
+    if not subdir:
+        return
+    staging = tempfile.mkdtemp(dir=dst, prefix='.unstrip-')
+    os.chmod(staging, 0o755)
+    for name in extracted:
+        os.rename(os.path.join(dst, name), os.path.join(staging, name))
+    target = os.path.join(dst, subdir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.rename(staging, target)
+    extracted.clear()
+    extracted.add(subdir.split('/')[0])
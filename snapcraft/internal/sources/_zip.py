@@ -14,12 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
-import shutil
-import tempfile
 import zipfile
 
 from . import errors
-from ._base import FileBase
+from ._base import FileBase, extraction_dir
 
 
 class Zip(FileBase):
@@ -45,13 +43,11 @@ class Zip(FileBase):
             zip = os.path.join(
                 self.source_dir, os.path.basename(self.source))
 
-        if clean_target:
-            tmp_zip = tempfile.NamedTemporaryFile().name
-            shutil.move(zip, tmp_zip)
-            shutil.rmtree(dst)
-            os.makedirs(dst)
-            shutil.move(tmp_zip, zip)
+        with extraction_dir(dst, zip, clean_target=clean_target,
+                            keep_archive=keep_zip) as target:
+            self._extract(zip, target)
 
+    def _extract(self, zip, dst):
         # Workaround for: https://bugs.python.org/issue15795
         with zipfile.ZipFile(zip, 'r') as f:
             for info in f.infolist():
@@ -69,6 +65,3 @@ class Zip(FileBase):
                 # pretty useless, so ignore it if so.
                 if mode:
                     os.chmod(extracted_file, mode)
-
-        if not keep_zip:
-            os.remove(zip)
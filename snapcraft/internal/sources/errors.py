@@ -41,6 +41,15 @@ class IncompatibleOptionsError(errors.SnapcraftError):
         super().__init__(message=message)
 
 
+class InvalidGitSubmoduleJobsError(errors.SnapcraftError):
+
+    fmt = ('Invalid value {jobs!r} for {envvar}: '
+           'set it to the number of submodules to fetch in parallel.')
+
+    def __init__(self, envvar, jobs):
+        super().__init__(envvar=envvar, jobs=jobs)
+
+
 class DigestDoesNotMatchError(errors.SnapcraftError):
 
     fmt = ('Expected the digest for source to be {expected}, '
@@ -55,3 +64,12 @@ class InvalidDebError(errors.SnapcraftError):
     fmt = ('The {deb_file} used does not contain valid data. '
            'Ensure a proper deb file is passed for .deb files '
            'as sources.')
+
+
+class DecompressionError(errors.SnapcraftError):
+
+    fmt = ('Failed to decompress the source: '
+           '{command!r} exited with code {exit_code}.')
+
+    def __init__(self, command, exit_code):
+        super().__init__(command=' '.join(command), exit_code=exit_code)
@@ -64,6 +64,7 @@ import logging
 import os
 import subprocess
 import re
+import shlex
 
 from snapcraft import BasePlugin
 
@@ -121,6 +122,7 @@ class KBuildPlugin(BasePlugin):
             'make', '-j{}'.format(self.parallel_build_count)]
         if logger.isEnabledFor(logging.DEBUG):
             self.make_cmd.append('V=1')
+        self._set_ccache_compiler()
 
     def enable_cross_compilation(self):
         self.make_cmd.append('ARCH={}'.format(
@@ -130,11 +132,20 @@ class KBuildPlugin(BasePlugin):
         else:
             toolchain = self.project.cross_compiler_prefix
         self.make_cmd.append('CROSS_COMPILE={}'.format(toolchain))
+        self._set_ccache_compiler(toolchain)
 
         env = os.environ.copy()
         self.make_cmd.append('PATH={}:/usr/{}/bin'.format(
             env.get('PATH', ''), self.project.arch_triplet))
 
+    def _set_ccache_compiler(self, toolchain=''):
+        # PATH is overridden in make_cmd when cross compiling, which hides
+        # the ccache compiler wrappers, so the compiler is wrapped explicitly.
+        if 'ccache' not in self.options.build_attributes:
+            return
+        self.make_cmd = [c for c in self.make_cmd if not c.startswith('CC=')]
+        self.make_cmd.append('CC=ccache {}gcc'.format(toolchain))
+
     def assemble_ubuntu_config(self, config_path):
         try:
             with open(os.path.join('debian', 'debian.env'), 'r') as f:
@@ -222,7 +233,8 @@ class KBuildPlugin(BasePlugin):
 
     def do_remake_config(self):
         # update config to include kconfig amendments using oldconfig
-        cmd = 'yes "" | {} oldconfig'.format(' '.join(self.make_cmd))
+        cmd = 'yes "" | {} oldconfig'.format(
+            ' '.join(shlex.quote(c) for c in self.make_cmd))
         subprocess.check_call(cmd, shell=True, cwd=self.builddir)
 
     def do_configure(self):
@@ -23,7 +23,10 @@ class Project(ProjectOptions):
     and the snap being built."""
 
     def __init__(self, *, use_geoip=False, parallel_builds=True,
-                 target_deb_arch: str=None, debug=False) -> None:
+                 target_deb_arch: str=None, debug=False,
+                 offline=False, local_mirror: str=None,
+                 refresh_package_indexes=False) -> None:
         self.info = None  # type: ProjectInfo
 
-        super().__init__(use_geoip, parallel_builds, target_deb_arch, debug)
+        super().__init__(use_geoip, parallel_builds, target_deb_arch, debug,
+                         offline, local_mirror, refresh_package_indexes)
@@ -151,6 +151,18 @@ class ProjectOptions:
     def parallel_builds(self):
         return self.__parallel_builds
 
+    @property
+    def offline(self):
+        return self.__offline
+
+    @property
+    def local_mirror(self):
+        return self.__local_mirror
+
+    @property
+    def refresh_package_indexes(self):
+        return self.__refresh_package_indexes
+
     @property
     def parallel_build_count(self):
         build_count = 1
@@ -232,7 +244,8 @@ class ProjectOptions:
         return self.__debug
 
     def __init__(self, use_geoip=False, parallel_builds=True,
-                 target_deb_arch=None, debug=False):
+                 target_deb_arch=None, debug=False, offline=False,
+                 local_mirror=None, refresh_package_indexes=False):
         # TODO: allow setting a different project dir and check for
         #       snapcraft.yaml
         self.__project_dir = os.getcwd()
@@ -240,6 +253,9 @@ class ProjectOptions:
         self.__parallel_builds = parallel_builds
         self._set_machine(target_deb_arch)
         self.__debug = debug
+        self.__offline = offline
+        self.__local_mirror = local_mirror
+        self.__refresh_package_indexes = refresh_package_indexes
 
     def is_host_compatible_with_base(self, base: str) -> bool:
         """Determines if the host is compatible with the GLIBC of the base.
@@ -9,7 +9,14 @@ import requests
 
 import snapcraft
 from snapcraft import config
-from snapcraft.internal.indicators import download_requests_stream
+from snapcraft.internal.errors import DownloadRangeNotSupportedError
+from snapcraft.internal.indicators import (
+    discard_segmented_download,
+    download_requests_stream,
+    download_segmented,
+    has_pending_segments,
+    supports_segmented_download,
+)
 
 from . import logger
 from . import _upload
@@ -226,7 +233,6 @@ class StoreClient():
         # we only resume when redirected to our CDN since we use internap's
         # special sauce.
         resume_possible = False
-        total_read = 0
         probe_url = requests.head(download_url)
         if (probe_url.is_redirect and
                 'internap' in probe_url.headers['Location']):
@@ -239,7 +245,11 @@ class StoreClient():
         retry_count = 5
         while not_downloaded and retry_count:
             headers = {}
-            if resume_possible and os.path.exists(download_path):
+            total_read = 0
+            # A failed segmented download is preallocated to its full size,
+            # it is resumed by downloading in segments again.
+            if (resume_possible and os.path.exists(download_path) and
+                    not has_pending_segments(download_path)):
                 total_read = os.path.getsize(download_path)
                 headers['Range'] = 'bytes={}-'.format(total_read)
             request = self.cpi.get(download_url, headers=headers, stream=True)
@@ -249,8 +259,9 @@ class StoreClient():
                 logger.debug('Redirections for {!r}: {}'.format(
                     download_url, ', '.join(redirections)))
             try:
-                download_requests_stream(request, download_path,
-                                         total_read=total_read)
+                self._download_request(request, download_path,
+                                       total_read=total_read,
+                                       resume=bool(headers))
                 not_downloaded = False
             except requests.exceptions.ChunkedEncodingError as e:
                 logger.debug('Error while downloading: {!r}. '
@@ -267,6 +278,27 @@ class StoreClient():
         else:
             raise errors.SHAMismatchError(download_path, expected_sha512)
 
+    def _download_request(self, request, download_path, *, total_read,
+                          resume):
+        """Download the body of request, in segments if possible."""
+        if not resume and supports_segmented_download(request):
+            request.close()
+            try:
+                download_segmented(
+                    request.url, download_path,
+                    int(request.headers['Content-Length']),
+                    session=self.cpi.session)
+                return
+            except DownloadRangeNotSupportedError as e:
+                logger.debug('{} Downloading in a single stream.'.format(e))
+            request = self.cpi.get(request.url, stream=True)
+            request.raise_for_status()
+        elif has_pending_segments(download_path):
+            # The server stopped offering ranges, start over.
+            discard_segmented_download(download_path)
+        download_requests_stream(request, download_path,
+                                 total_read=total_read)
+
     def _is_downloaded(self, path, expected_sha512):
         if not os.path.exists(path):
             return False
@@ -20,7 +20,9 @@ import json
 import logging
 import http.server
 import os
+import re
 import urllib.parse
+from typing import List, Set  # noqa: F401
 
 
 import pymacaroons
@@ -53,6 +55,57 @@ class FakeFileHTTPRequestHandler(BaseHTTPRequestHandler):
         self.wfile.write(data.encode())
 
 
+class FakeDirectoryHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve the files in the current working directory."""
+
+    def log_message(*args):
+        logger.debug(args)
+
+
+class FakeRangeHTTPRequestHandler(FakeDirectoryHTTPRequestHandler):
+    """Serve the files in the current working directory in byte ranges.
+
+    The Range headers received are recorded in ranges, the first answer
+    for a range starting at an offset in short_offsets is cut short and if
+    ignore_ranges is set whole files are served instead.
+    Subclass to get fresh class attributes.
+    """
+
+    ranges = []  # type: List[str]
+    short_offsets = set()  # type: Set[int]
+    ignore_ranges = False
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if not match or self.ignore_ranges:
+            self.send_response(200)
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.ranges.append(self.headers['Range'])
+        start = int(match.group(1))
+        end = int(match.group(2) or len(data) - 1)
+        self.send_response(206)
+        self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+            start, end, len(data)))
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if start in self.short_offsets:
+            self.short_offsets.remove(start)
+            end = start + (end - start) // 2
+        self.wfile.write(data[start:end + 1])
+
+
 class FakePartsServer(http.server.HTTPServer):
 
     def __init__(self, server_address):
@@ -858,6 +858,10 @@ class FakeAptCache(fixtures.Fixture):
         def close(self):
             pass
 
+        def clear(self):
+            for package in self.packages.values():
+                package.marked_install = False
+
         def update(self, *args, **kwargs):
             pass
 
@@ -898,14 +902,28 @@ class FakeAptCache(fixtures.Fixture):
         for package, version in self.packages:
             self.add_package(FakeAptCachePackage(package, version))
 
-        def fetch_binary(package_candidate, destination):
-            path = os.path.join(self.path, package_candidate.name)
-            open(path, 'w').close()
-            return path
+        def fetch_binaries(package_candidates, destination):
+            paths = []
+            for package_candidate in package_candidates:
+                path = os.path.join(self.path, package_candidate.name)
+                open(path, 'w').close()
+                paths.append(path)
+            return paths
+
+        patcher = mock.patch('snapcraft.repo._deb._AptCache.fetch_binaries')
+        mock_fetch_binaries = patcher.start()
+        mock_fetch_binaries.side_effect = fetch_binaries
+        self.addCleanup(patcher.stop)
+
+        # The installed packages come from the dpkg database.
+        def get_installed_packages():
+            return {package.name: package.version
+                    for package in self.cache if package.installed}
 
-        patcher = mock.patch('snapcraft.repo._deb._AptCache.fetch_binary')
-        mock_fetch_binary = patcher.start()
-        mock_fetch_binary.side_effect = fetch_binary
+        patcher = mock.patch(
+            'snapcraft.repo._dpkg.DpkgDatabase.get_installed_packages')
+        mock_get_installed_packages = patcher.start()
+        mock_get_installed_packages.side_effect = get_installed_packages
         self.addCleanup(patcher.stop)
 
         # Add all the packages in the manifest.
@@ -972,7 +990,7 @@ class FakeAptCachePackage():
             self.marked_install = True
 
     def mark_keep(self):
-        pass
+        self.marked_install = False
 
     def get_dependencies(self, _):
         return []
@@ -117,6 +117,7 @@ class TestCase(testscenarios.WithScenarios, testtools.TestCase):
         self.addCleanup(common.set_schemadir, common.get_schemadir())
         self.addCleanup(common.set_librariesdir, common.get_librariesdir())
         self.addCleanup(common.reset_env)
+        self.addCleanup(snapcraft.internal.repo.reset_session)
         common.set_schemadir(
                 os.path.join(__file__, '..', '..', '..', 'schema'))
         self.fake_logger = fixtures.FakeLogger(level=logging.ERROR)
@@ -225,13 +226,15 @@ class TestWithFakeRemoteParts(TestCase):
 
 class FakeFileHTTPServerBasedTestCase(TestCase):
 
+    request_handler = fake_servers.FakeFileHTTPRequestHandler
+
     def setUp(self):
         super().setUp()
 
         self.useFixture(fixtures.EnvironmentVariable(
             'no_proxy', 'localhost,127.0.0.1'))
         self.server = http.server.HTTPServer(
-            ('127.0.0.1', 0), fake_servers.FakeFileHTTPRequestHandler)
+            ('127.0.0.1', 0), self.request_handler)
         server_thread = threading.Thread(target=self.server.serve_forever)
         self.addCleanup(server_thread.join)
         self.addCleanup(self.server.server_close)
@@ -239,6 +242,12 @@ class FakeFileHTTPServerBasedTestCase(TestCase):
         server_thread.start()
 
 
+class FakeDirectoryHTTPServerBasedTestCase(FakeFileHTTPServerBasedTestCase):
+    """Serve the files in the working directory of the test."""
+
+    request_handler = fake_servers.FakeDirectoryHTTPRequestHandler
+
+
 class SilentProgressBar(progressbar.ProgressBar):
     """A progress bar causing no spurious output during tests."""
 
@@ -0,0 +1,60 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import DirExists, Equals, FileContains, Is
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+class AptUnpackedPackageCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.unpacked_cache = cache.AptUnpackedPackageCache()
+
+    def test_get_nothing_cached(self):
+        self.assertThat(self.unpacked_cache.get(key='1'), Is(None))
+
+    def test_cache_and_retrieve(self):
+        tree = self.unpacked_cache.new_tree()
+        with open(os.path.join(tree, 'file'), 'w') as f:
+            f.write('content')
+
+        cached_tree = self.unpacked_cache.cache(key='1', tree=tree)
+
+        self.assertThat(self.unpacked_cache.get(key='1'), Equals(cached_tree))
+        self.assertThat(
+            os.path.join(cached_tree, 'file'), FileContains('content'))
+        self.assertFalse(os.path.exists(tree))
+
+    def test_cache_already_cached(self):
+        first_tree = self.unpacked_cache.new_tree()
+        with open(os.path.join(first_tree, 'file'), 'w') as f:
+            f.write('first')
+        self.unpacked_cache.cache(key='1', tree=first_tree)
+
+        second_tree = self.unpacked_cache.new_tree()
+        with open(os.path.join(second_tree, 'file'), 'w') as f:
+            f.write('second')
+        cached_tree = self.unpacked_cache.cache(key='1', tree=second_tree)
+
+        self.assertThat(
+            os.path.join(cached_tree, 'file'), FileContains('first'))
+        self.assertFalse(os.path.exists(second_tree))
+        self.assertThat(self.unpacked_cache.unpacked_dir, DirExists())
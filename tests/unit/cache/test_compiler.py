@@ -0,0 +1,89 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+from textwrap import dedent
+from unittest import mock
+
+from testtools.matchers import Equals, Is
+
+from snapcraft.internal import cache
+from tests import unit
+
+
+class CompilerCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.compiler_cache = cache.CompilerCache()
+
+        patcher = mock.patch('subprocess.check_output')
+        self.check_output_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_env(self):
+        self.assertThat(self.compiler_cache.env(), Equals([
+            'CCACHE_DIR="{}"'.format(os.path.join(
+                self.compiler_cache.cache_root, 'ccache')),
+            'PATH="/usr/lib/ccache:$PATH"']))
+
+    def test_zero_stats(self):
+        self.compiler_cache.zero_stats()
+
+        self.check_output_mock.assert_called_once_with(
+            ['ccache', '--zero-stats'], env=mock.ANY,
+            stderr=subprocess.STDOUT)
+        env = self.check_output_mock.call_args[1]['env']
+        self.assertThat(
+            env['CCACHE_DIR'], Equals(self.compiler_cache.ccache_dir))
+
+    def test_get_stats_ccache3(self):
+        self.check_output_mock.return_value = dedent("""\
+            cache directory                     /root/.cache/snapcraft/ccache
+            primary config                      /root/.cache/ccache.conf
+            cache hit (direct)                    10
+            cache hit (preprocessed)               2
+            cache miss                             4
+            cache hit rate                     75.00 %
+            """).encode()
+
+        self.assertThat(self.compiler_cache.get_stats(), Equals((12, 4)))
+
+    def test_get_stats_ccache4(self):
+        self.check_output_mock.return_value = dedent("""\
+            Cacheable calls:   16 / 16 (100.0%)
+              Hits:            12 / 16 (75.00%)
+                Direct:        10 / 12 (83.33%)
+                Preprocessed:   2 / 12 (16.67%)
+              Misses:           4 / 16 (25.00%)
+            Local storage:
+              Cache size (GB): 0.1 / 5.0 ( 2.00%)
+              Hits:            12 / 16 (75.00%)
+              Misses:           4 / 16 (25.00%)
+            """).encode()
+
+        self.assertThat(self.compiler_cache.get_stats(), Equals((12, 4)))
+
+    def test_get_stats_unparseable(self):
+        self.check_output_mock.return_value = b'unexpected'
+
+        self.assertThat(self.compiler_cache.get_stats(), Is(None))
+
+    def test_get_stats_ccache_missing(self):
+        self.check_output_mock.side_effect = FileNotFoundError()
+
+        self.assertThat(self.compiler_cache.get_stats(), Is(None))
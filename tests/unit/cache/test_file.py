@@ -16,7 +16,7 @@
 import os
 from unittest.mock import patch
 
-from testtools.matchers import EndsWith, Is
+from testtools.matchers import EndsWith, Equals, Is
 
 from snapcraft.file_utils import calculate_hash
 from snapcraft.internal import cache
@@ -76,9 +76,38 @@ class FileCacheTestCase(unit.TestCase):
             f.write('random stub data')
 
         calculated_hash = calculate_hash('hash_file', algorithm=self.algo)
-        with patch('shutil.copyfile') as mock_copyfile:
-            mock_copyfile.side_effect = OSError()
+        with patch('snapcraft.internal.cache._file.clone_or_link') as \
+                mock_clone:
+            mock_clone.side_effect = OSError()
             file = self.file_cache.cache(filename='hash_file',
                                          algorithm=self.algo,
                                          hash=calculated_hash)
         self.assertThat(file, Is(None))
+
+    def test_cache_is_read_only(self):
+        with open('hash_file', 'w') as f:
+            f.write('random stub data')
+
+        calculated_hash = calculate_hash('hash_file', algorithm=self.algo)
+        file = self.file_cache.cache(filename='hash_file',
+                                     algorithm=self.algo,
+                                     hash=calculated_hash)
+
+        self.assertThat(os.stat(file).st_mode & 0o777, Equals(0o444))
+        with open(file) as f:
+            self.assertThat(f.read(), Equals('random stub data'))
+
+    def test_cache_without_verify(self):
+        with open('hash_file', 'w') as f:
+            f.write('random stub data')
+
+        calculated_hash = calculate_hash('hash_file', algorithm=self.algo)
+        with patch('snapcraft.internal.cache._file.calculate_hash') as \
+                mock_calculate_hash:
+            file = self.file_cache.cache(filename='hash_file',
+                                         algorithm=self.algo,
+                                         hash=calculated_hash,
+                                         verify=False)
+
+        mock_calculate_hash.assert_not_called()
+        self.assertThat(file, EndsWith(calculated_hash))
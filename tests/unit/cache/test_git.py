@@ -0,0 +1,80 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+from unittest import mock
+
+from testtools.matchers import DirExists, Equals, Not
+
+from snapcraft.internal import cache
+from tests import unit
+from tests.subprocess_utils import call, call_with_output
+
+
+class GitMirrorCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.remote = os.path.join(self.path, 'remote')
+        call(['git', 'init', self.remote])
+        call(['git', '-C', self.remote, '-c', 'user.name=Example Dev',
+              '-c', 'user.email=dev@example.com', 'commit',
+              '--allow-empty', '-m', 'first'])
+        self.url = 'file://' + self.remote
+        self.git_cache = cache.GitMirrorCache()
+
+    def test_mirror_path_is_keyed_by_url(self):
+        self.assertThat(self.git_cache.get_mirror_path(self.url),
+                        Equals(self.git_cache.get_mirror_path(self.url)))
+        self.assertThat(self.git_cache.get_mirror_path(self.url),
+                        Not(Equals(self.git_cache.get_mirror_path(
+                            self.url + '.git'))))
+
+    def test_update_creates_then_fetches(self):
+        with self.git_cache.update(self.url, **_silent()) as mirror:
+            self.assertThat(mirror, DirExists())
+        call(['git', '-C', self.remote, '-c', 'user.name=Example Dev',
+              '-c', 'user.email=dev@example.com', 'commit',
+              '--allow-empty', '-m', 'second'])
+
+        with self.git_cache.update(self.url, **_silent()) as mirror:
+            self.assertThat(
+                call_with_output(['git', '-C', mirror, 'rev-parse', 'HEAD']),
+                Equals(call_with_output(
+                    ['git', '-C', self.remote, 'rev-parse', 'HEAD'])))
+
+        stats = self.git_cache._load_stats()['git-mirrors']
+        self.assertThat(stats, Equals(dict(hits=1, misses=1)))
+
+    def test_partial_mirror_is_replaced(self):
+        partial_path = self.git_cache.get_mirror_path(self.url) + '.partial'
+        os.makedirs(os.path.join(partial_path, 'leftover'))
+
+        with self.git_cache.update(self.url, **_silent()) as mirror:
+            self.assertThat(mirror, DirExists())
+        self.assertThat(partial_path, Not(DirExists()))
+
+    def test_update_without_fcntl(self):
+        # As on Windows.
+        with mock.patch('snapcraft.internal.cache._git.fcntl', None):
+            with self.git_cache.update(self.url, **_silent()) as mirror:
+                self.assertThat(mirror, DirExists())
+
+
+def _silent():
+    return dict(stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -0,0 +1,137 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import fixtures
+from testtools.matchers import Equals, FileExists, Is, Not
+
+from snapcraft.internal import cache, errors
+from tests import unit
+
+
+def _write(path, size, *, last_used):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (last_used, last_used))
+    return path
+
+
+class CacheManagerTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manager = cache.CacheManager()
+        root = self.manager.cache_root
+        self.old_file = _write(
+            os.path.join(root, 'files', 'sha256', 'old'), 100, last_used=10)
+        self.new_file = _write(
+            os.path.join(root, 'files', 'sha256', 'new'), 100, last_used=30)
+        self.stage_packages = os.path.join(
+            root, 'stage-packages', 'apt', 'digest')
+        _write(os.path.join(self.stage_packages, 'var', 'foo.deb'), 50,
+               last_used=20)
+        os.utime(self.stage_packages, (20, 20))
+        # Trees being unpacked are not entries.
+        _write(os.path.join(
+            root, 'stage-packages', 'apt-unpacked', '.tmp-1', 'file'), 10,
+            last_used=0)
+
+    def test_get_stats(self):
+        cache.FileCache().get(algorithm='sha256', hash='new')
+        cache.FileCache().get(algorithm='sha256', hash='missing')
+        cache.FileCache().get(algorithm='sha256', hash='old')
+
+        stats = {s.namespace: s for s in self.manager.get_stats()}
+
+        self.assertThat(stats['files'].entries, Equals(2))
+        self.assertThat(stats['files'].size, Equals(200))
+        self.assertThat(stats['files'].hits, Equals(2))
+        self.assertThat(stats['files'].misses, Equals(1))
+        self.assertThat(stats['stage-packages'].entries, Equals(1))
+        self.assertThat(stats['stage-packages'].oldest, Equals(20))
+        self.assertThat(stats['unpacked-stage-packages'].entries, Equals(0))
+        self.assertThat(stats['unpacked-stage-packages'].oldest, Is(None))
+        self.assertThat(stats['snaps'].hits, Equals(0))
+
+    def test_prune_evicts_least_recently_used(self):
+        pruned = self.manager.prune(max_size=200)
+
+        self.assertThat([e.path for e in pruned], Equals([self.old_file]))
+        self.assertThat(self.old_file, Not(FileExists()))
+        self.assertThat(self.new_file, FileExists())
+        self.assertTrue(os.path.isdir(self.stage_packages))
+
+    def test_prune_uses_use_stamps(self):
+        cache.FileCache().get(algorithm='sha256', hash='old')
+
+        pruned = self.manager.prune(max_size=200)
+
+        self.assertThat(
+            [e.path for e in pruned], Equals([self.stage_packages]))
+        self.assertFalse(os.path.exists(self.stage_packages))
+        self.assertThat(self.old_file, FileExists())
+
+    def test_prune_ignores_access_time(self):
+        # As reading the cache could do.
+        os.utime(self.old_file, (40, 10))
+
+        pruned = self.manager.prune(max_size=200)
+
+        self.assertThat([e.path for e in pruned], Equals([self.old_file]))
+
+    def test_prune_within_budget(self):
+        self.assertThat(self.manager.prune(max_size=1000), Equals([]))
+
+    def test_apt_stage_package_cache_marks_digest_used(self):
+        cache.AptStagePackageCache(sources_digest='digest')
+
+        self.assertThat(
+            os.stat(self.stage_packages).st_mtime, Not(Equals(20)))
+        stats = {s.namespace: s for s in self.manager.get_stats()}
+        self.assertThat(stats['stage-packages'].hits, Equals(1))
+
+
+class ParseSizeTestCase(unit.TestCase):
+
+    scenarios = [
+        ('bytes', dict(size='100', expected=100)),
+        ('kilobytes', dict(size='2K', expected=2048)),
+        ('megabytes', dict(size='500MiB', expected=500 * 1024 ** 2)),
+        ('gigabytes', dict(size='10g', expected=10 * 1024 ** 3)),
+    ]
+
+    def test_parse_size(self):
+        self.assertThat(cache.parse_size(self.size), Equals(self.expected))
+
+
+class MaxSizeTestCase(unit.TestCase):
+
+    def test_unset(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_CACHE_MAX_SIZE', None))
+        self.assertThat(cache.get_max_size(), Is(None))
+
+    def test_set(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_CACHE_MAX_SIZE', '1M'))
+        self.assertThat(cache.get_max_size(), Equals(1024 ** 2))
+
+    def test_invalid(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_CACHE_MAX_SIZE', 'lots'))
+        self.assertRaises(errors.InvalidCacheSizeError, cache.get_max_size)
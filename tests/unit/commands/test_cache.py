@@ -0,0 +1,66 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2017 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from testtools.matchers import Contains, Equals, FileExists, Not
+
+from snapcraft.internal import cache
+from . import CommandBaseTestCase
+
+
+class CacheCommandTestCase(CommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        file_cache = cache.FileCache()
+        self.cached_files = []
+        for name, last_used in (('old', 10), ('new', 20)):
+            path = os.path.join(file_cache.file_cache, 'sha256', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1024)
+            os.utime(path, (last_used, last_used))
+            self.cached_files.append(path)
+        file_cache.get(algorithm='sha256', hash='new')
+        file_cache.get(algorithm='sha256', hash='missing')
+
+    def test_stats(self):
+        result = self.run_command(['cache', 'stats'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains('Hit rate'))
+        files_row = [line for line in result.output.splitlines()
+                     if line.startswith('files')]
+        self.assertThat(files_row[0].split(), Equals([
+            'files', '2', '2.0', 'KiB', files_row[0].split()[4], '0s',
+            '50%']))
+
+    def test_prune(self):
+        result = self.run_command(['cache', 'prune', '--max-size', '1K'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Equals(
+            'Pruned 1 entries, freeing 1.0 KiB.\n'))
+        self.assertThat(self.cached_files[0], Not(FileExists()))
+        self.assertThat(self.cached_files[1], FileExists())
+
+    def test_prune_max_size_from_environment(self):
+        result = self.run_command(
+            ['cache', 'prune'], env={'SNAPCRAFT_CACHE_MAX_SIZE': '0'})
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(self.cached_files[1], Not(FileExists()))
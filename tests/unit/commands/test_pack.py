@@ -13,13 +13,20 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import multiprocessing
 import os
 import os.path
 import subprocess
 from textwrap import dedent
 from unittest import mock
 
-from testtools.matchers import Contains, Equals, FileExists
+import fixtures
+from testtools.matchers import Contains, Equals, FileExists, Not
+
+from snapcraft.internal import errors, lifecycle
+from snapcraft.internal.lifecycle import _packer
+from tests import unit
 from . import CommandBaseTestCase
 
 
@@ -111,3 +118,170 @@ class PackCommandTestCase(PackCommandBaseTestCase):
             stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
 
         self.assertThat('my_snap_99_multi.snap', FileExists())
+
+    def test_snap_from_dir_with_dev_profile(self):
+        with open(self.snap_yaml, 'w') as f:
+            f.write(dedent("""\
+                name: my_snap
+                version: 99
+                architectures: [amd64]
+            """))
+
+        result = self.run_command(
+            [self.command, self.snap_dir, '--profile', 'dev'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.popen_spy.assert_called_once_with([
+            'mksquashfs', 'mysnap', 'my_snap_99_amd64.snap',
+            '-noappend', '-comp', 'gzip', '-Xcompression-level', '1',
+            '-b', '1M', '-no-xattrs',
+            '-processors', str(multiprocessing.cpu_count()), '-all-root'],
+            stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
+
+        self.assertThat('my_snap_99_amd64.snap', FileExists())
+
+    def test_snap_from_dir_with_invalid_profile(self):
+        result = self.run_command(
+            [self.command, self.snap_dir, '--profile', 'invalid'])
+
+        self.assertThat(result.exit_code, Equals(2))
+        self.popen_spy.assert_not_called()
+
+
+class PackDigestTestCase(PackCommandBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.meta_dir = os.path.join('mysnap', 'meta')
+        os.makedirs(self.meta_dir)
+        with open(os.path.join(self.meta_dir, 'snap.yaml'), 'w') as f:
+            f.write(dedent("""\
+                name: my_snap
+                version: 99
+                architectures: [amd64]
+            """))
+
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+    def test_pack_unchanged_reuses_snap(self):
+        self.run_command(['pack', 'mysnap'])
+        result = self.run_command(['pack', 'mysnap'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains(
+            'Snapped my_snap_99_amd64.snap\n'))
+        self.assertThat(self.fake_logger.output, Contains(
+            "Reusing 'my_snap_99_amd64.snap' as 'mysnap' did not change"))
+        self.assertThat(self.popen_spy.call_count, Equals(1))
+        self.assertThat(
+            _packer._get_digest_path('my_snap_99_amd64.snap'), FileExists())
+        # Nothing that a part with the project as source would pull.
+        self.assertThat('my_snap_99_amd64.snap.digest', Not(FileExists()))
+
+    def test_pack_changed_content(self):
+        self.run_command(['pack', 'mysnap'])
+        with open(os.path.join('mysnap', 'file'), 'w') as f:
+            f.write('new content')
+        self.run_command(['pack', 'mysnap'])
+
+        self.assertThat(self.popen_spy.call_count, Equals(2))
+
+    def test_pack_changed_mode(self):
+        self.run_command(['pack', 'mysnap'])
+        os.chmod(os.path.join(self.meta_dir, 'snap.yaml'), 0o600)
+        self.run_command(['pack', 'mysnap'])
+
+        self.assertThat(self.popen_spy.call_count, Equals(2))
+
+    def test_pack_changed_profile(self):
+        self.run_command(['pack', 'mysnap'])
+        self.run_command(['pack', 'mysnap', '--profile', 'dev'])
+
+        self.assertThat(self.popen_spy.call_count, Equals(2))
+
+    def test_pack_replaced_snap(self):
+        self.run_command(['pack', 'mysnap'])
+        with open('my_snap_99_amd64.snap', 'w') as f:
+            f.write('replaced')
+        self.run_command(['pack', 'mysnap'])
+
+        self.assertThat(self.popen_spy.call_count, Equals(2))
+
+
+class PrimeDigestTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join('prime', 'dir'))
+        with open(os.path.join('prime', 'dir', 'file'), 'w') as f:
+            f.write('content')
+        os.symlink('dir', os.path.join('prime', 'link'))
+
+    def test_digest_is_stable(self):
+        digest = _packer._calculate_digest('prime', {}, 'store app')
+
+        self.assertThat(
+            _packer._calculate_digest('prime', {}, 'store app')['digest'],
+            Equals(digest['digest']))
+        self.assertThat(list(digest['files'].keys()), Equals(
+            [os.path.join('dir', 'file')]))
+
+    def test_digest_changes_with_symlink_target(self):
+        digest = _packer._calculate_digest('prime', {}, 'store app')
+        os.unlink(os.path.join('prime', 'link'))
+        os.symlink('dir/file', os.path.join('prime', 'link'))
+
+        self.assertThat(
+            _packer._calculate_digest('prime', {}, 'store app')['digest'],
+            Not(Equals(digest['digest'])))
+
+    def test_digest_changes_with_pack_options(self):
+        digest = _packer._calculate_digest('prime', {}, 'store app')
+
+        self.assertThat(
+            _packer._calculate_digest('prime', {}, 'store os')['digest'],
+            Not(Equals(digest['digest'])))
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        digest = _packer._calculate_digest('prime', {}, 'store app')
+
+        with mock.patch('snapcraft.file_utils.calculate_hash') as mock_hash:
+            new_digest = _packer._calculate_digest(
+                'prime', digest['files'], 'store app')
+
+        mock_hash.assert_not_called()
+        self.assertThat(new_digest, Equals(digest))
+
+
+class PackProfileTestCase(unit.TestCase):
+
+    def test_invalid_profile(self):
+        raised = self.assertRaises(
+            errors.InvalidPackProfileError,
+            lifecycle.pack, 'mysnap', profile='invalid')
+
+        self.assertThat(str(raised), Equals(
+            "Failed to create snap: 'invalid' is not a valid pack profile.\n"
+            "Use one of 'dev' or 'store'."))
+
+    def test_report_compression(self):
+        fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(fake_logger)
+
+        _packer._report_compression(dedent("""\
+            Exportable Squashfs 4.0 filesystem, xz compressed, data block size 131072
+            Filesystem size 1024.00 Kbytes (1.00 Mbytes)
+            \t25.00% of uncompressed filesystem size (4096.00 Kbytes)
+            """), 'my_snap_99_amd64.snap', 2)  # noqa: E501
+
+        self.assertThat(fake_logger.output, Contains(
+            'Compressed 4.0 MiB into 1.0 MiB (25.0%) in 2.0s, 2.0 MiB/s'))
+
+    def test_report_compression_unknown_output(self):
+        fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(fake_logger)
+
+        _packer._report_compression('', 'my_snap_99_amd64.snap', 2)
+
+        self.assertThat(fake_logger.output, Equals(''))
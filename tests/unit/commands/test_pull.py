@@ -13,6 +13,7 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
 from unittest import mock
 from testtools.matchers import Equals, DirExists, Not
 import snapcraft.internal.errors
@@ -87,6 +88,63 @@ class PullCommandTestCase(LifecycleCommandsBaseTestCase):
 
         self.assertThat(result.exit_code, Equals(0))
 
+    @mock.patch('snapcraft.repo.Repo.get')
+    @mock.patch('snapcraft.repo.Repo.unpack')
+    @mock.patch('snapcraft.repo.Repo.__init__', return_value=None)
+    def test_pull_stage_packages_offline(self, mock_init, mock_unpack,
+                                         mock_get):
+        yaml_part = """  {step}{iter:d}:
+        plugin: nil
+        stage-packages: ['mir']"""
+        self.make_snapcraft_yaml('pull', n=3, yaml_part=yaml_part)
+
+        mock_get.return_value = '[mir=0.0]'
+
+        result = self.run_command(['pull', 'pull1', '--offline'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        project_options = mock_init.call_args[1]['project_options']
+        self.assertThat(project_options.offline, Equals(True))
+
+    @mock.patch('snapcraft.repo.Repo.get')
+    @mock.patch('snapcraft.repo.Repo.unpack')
+    @mock.patch('snapcraft.repo.Repo.__init__', return_value=None)
+    def test_pull_stage_packages_refresh_package_indexes(
+            self, mock_init, mock_unpack, mock_get):
+        yaml_part = """  {step}{iter:d}:
+        plugin: nil
+        stage-packages: ['mir']"""
+        self.make_snapcraft_yaml('pull', n=3, yaml_part=yaml_part)
+
+        mock_get.return_value = '[mir=0.0]'
+
+        result = self.run_command(
+            ['pull', 'pull1', '--refresh-package-indexes'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        project_options = mock_init.call_args[1]['project_options']
+        self.assertThat(project_options.refresh_package_indexes, Equals(True))
+
+    @mock.patch('snapcraft.repo.Repo.get')
+    @mock.patch('snapcraft.repo.Repo.unpack')
+    @mock.patch('snapcraft.repo.Repo.__init__', return_value=None)
+    def test_pull_stage_packages_local_mirror(self, mock_init, mock_unpack,
+                                              mock_get):
+        yaml_part = """  {step}{iter:d}:
+        plugin: nil
+        stage-packages: ['mir']"""
+        self.make_snapcraft_yaml('pull', n=3, yaml_part=yaml_part)
+        os.mkdir('mirror')
+
+        mock_get.return_value = '[mir=0.0]'
+
+        result = self.run_command(
+            ['pull', 'pull1', '--local-mirror', 'mirror'])
+
+        self.assertThat(result.exit_code, Equals(0))
+        project_options = mock_init.call_args[1]['project_options']
+        self.assertThat(project_options.local_mirror, Equals('mirror'))
+
     @mock.patch('snapcraft.repo.Repo.get')
     @mock.patch('snapcraft.repo.Repo.unpack')
     def test_pull_multiarch_stage_package(self, mock_unpack, mock_get):
@@ -31,6 +31,7 @@ from testtools.matchers import (
     FileContains,
     FileExists,
     Not,
+    StartsWith,
 )
 from tests import fixture_setup
 from . import CommandBaseTestCase
@@ -118,7 +119,8 @@ class SnapCommandTestCase(SnapCommandBaseTestCase):
 
         mock_run_mksquashfs.assert_called_once_with(
             mksquashfs_path, directory=self.prime_dir, snap_name='snap-test',
-            snap_type='app', output_snap_name='snap-test_1.0_amd64.snap')
+            snap_type='app', output_snap_name='snap-test_1.0_amd64.snap',
+            profile='store')
 
     @mock.patch('snapcraft.internal.common.is_docker_instance')
     @mock.patch('snapcraft.internal.repo.check_for_command')
@@ -145,7 +147,8 @@ class SnapCommandTestCase(SnapCommandBaseTestCase):
 
         mock_run_mksquashfs.assert_called_once_with(
             mksquashfs_path, directory=self.prime_dir, snap_name='snap-test',
-            snap_type='app', output_snap_name='snap-test_1.0_amd64.snap')
+            snap_type='app', output_snap_name='snap-test_1.0_amd64.snap',
+            profile='store')
 
     def test_snap_fails_with_bad_type(self):
         self.make_snapcraft_yaml(snap_type='bad-type')
@@ -296,11 +299,12 @@ class SnapCommandTestCase(SnapCommandBaseTestCase):
 
         self.assertThat(
             fake_logger.output,
-            Equals(
+            StartsWith(
                 'Skipping pull part1 (already ran)\n'
                 'Skipping build part1 (already ran)\n'
                 'Skipping stage part1 (already ran)\n'
-                'Skipping prime part1 (already ran)\n'))
+                'Skipping prime part1 (already ran)\n'
+                'Compressed '))
 
         self.popen_spy.assert_called_once_with([
             'mksquashfs', self.prime_dir, 'snap-test_1.0_amd64.snap',
@@ -399,13 +403,14 @@ type: os
         self.assertThat(result.output, Contains(
             'Snapped mysnap.snap\n'))
 
-        self.assertThat(fake_logger.output, Equals(
+        self.assertThat(fake_logger.output, StartsWith(
             'Preparing to pull part1 \n'
             'Pulling part1 \n'
             'Preparing to build part1 \n'
             'Building part1 \n'
             'Staging part1 \n'
-            'Priming part1 \n'))
+            'Priming part1 \n'
+            'Compressed '))
 
         self.popen_spy.assert_called_once_with([
             'mksquashfs', self.prime_dir, 'mysnap.snap',
@@ -456,7 +461,7 @@ type: os
 
         snap_build_renamed = snap_build + '.1234'
         self.assertThat(
-            fake_logger.output.splitlines(),
+            fake_logger.output.splitlines()[:-1],
             Equals([
                 'Preparing to pull part1 ',
                 'Pulling part1 ',
@@ -467,6 +472,8 @@ type: os
                 'Renaming stale build assertion to {}'.format(
                     snap_build_renamed),
             ]))
+        self.assertThat(
+            fake_logger.output.splitlines()[-1], StartsWith('Compressed '))
 
         self.assertThat('snap-test_1.0_amd64.snap', FileExists())
         self.assertThat(snap_build, Not(FileExists()))
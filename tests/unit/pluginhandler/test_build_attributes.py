@@ -26,3 +26,10 @@ class BuildAttributesTestCase(unit.TestCase):
 
         build_attributes = BuildAttributes(['no-system-libraries'])
         self.assertTrue(build_attributes.no_system_libraries())
+
+    def test_ccache(self):
+        build_attributes = BuildAttributes([])
+        self.assertFalse(build_attributes.ccache())
+
+        build_attributes = BuildAttributes(['ccache'])
+        self.assertTrue(build_attributes.ccache())
@@ -16,6 +16,7 @@
 
 from collections import OrderedDict
 import copy
+import logging
 import os
 import shutil
 import stat
@@ -27,7 +28,14 @@ from unittest.mock import (
     patch,
 )
 
-from testtools.matchers import Contains, Equals, FileExists, Not
+import fixtures
+from testtools.matchers import (
+    Contains,
+    DirExists,
+    Equals,
+    FileExists,
+    Not,
+)
 
 import snapcraft
 from . import mocks
@@ -824,6 +832,57 @@ class NextLastStepTestCase(unit.TestCase):
         self.assertThat(self.handler.next_step(), Equals(None))
 
 
+class CompilerCacheTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        patcher = patch('snapcraft.internal.cache.CompilerCache.zero_stats')
+        self.zero_stats_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('snapcraft.internal.cache.CompilerCache.get_stats')
+        self.get_stats_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_build_without_ccache(self):
+        handler = self.load_part('test-part')
+
+        handler.build()
+
+        self.assertFalse(handler.uses_ccache)
+        self.assertThat(handler.ccache_env(), Equals([]))
+        self.zero_stats_mock.assert_not_called()
+        self.get_stats_mock.assert_not_called()
+
+    def test_build_reports_hit_ratio(self):
+        self.get_stats_mock.return_value = (3, 1)
+        handler = self.load_part(
+            'test-part', part_properties={'build-attributes': ['ccache']})
+
+        handler.build()
+
+        self.assertTrue(handler.uses_ccache)
+        self.assertThat(handler.ccache_env(), Contains(
+            'PATH="/usr/lib/ccache:$PATH"'))
+        self.zero_stats_mock.assert_called_once_with()
+        self.assertThat(self.fake_logger.output, Contains(
+            "ccache hit ratio for 'test-part': 75.0% (3 hits, 1 misses)"))
+
+    def test_build_reports_no_compilations(self):
+        self.get_stats_mock.return_value = (0, 0)
+        handler = self.load_part(
+            'test-part', part_properties={'build-attributes': ['ccache']})
+
+        handler.build()
+
+        self.assertThat(self.fake_logger.output, Contains(
+            "No compilations for 'test-part' went through ccache"))
+
+
 class StateBaseTestCase(unit.TestCase):
 
     def setUp(self):
@@ -2568,6 +2627,35 @@ class SourcesTestCase(unit.TestCase):
             os.path.join(handler.plugin.sourcedir, 'my-snap'),
             FileExists())
 
+    def test_pull_local_source_again(self):
+        os.makedirs(os.path.join('src', 'dir'))
+        handler = self.load_part(
+            'test-part', part_properties=dict(source='src'))
+
+        handler.pull()
+        open(os.path.join(handler.plugin.sourcedir, 'dir', 'pulled'),
+             'w').close()
+        handler.pull()
+
+        # The source is only updated with what changed in it.
+        self.assertThat(
+            os.path.join(handler.plugin.sourcedir, 'dir', 'pulled'),
+            FileExists())
+
+    def test_pull_local_source_with_scriptlet_again(self):
+        os.makedirs(os.path.join('src', 'dir'))
+        handler = self.load_part('test-part', part_properties={
+            'source': 'src',
+            'override-pull': 'snapcraftctl pull && mkdir dir/patched'})
+
+        handler.pull()
+        # Fails if dir/patched is still there.
+        handler.pull()
+
+        self.assertThat(
+            os.path.join(handler.plugin.sourcedir, 'dir', 'patched'),
+            DirExists())
+
     def test_source_with_unrecognized_source_must_raise_exception(self):
         properties = dict(source='unrecognized://test_source')
 
@@ -138,7 +138,7 @@ class AmentPluginTestCase(unit.TestCase):
         # Verify that the source space was built as expected, and that the
         # system's PYTHONPATH was included while building
         mock_check_call.assert_called_once_with([
-            mock.ANY, mock.ANY, 'ament', 'build', plugin.sourcedir,
+            'ament', 'build', plugin.sourcedir,
             '--build-space', plugin.builddir, '--install-space',
             plugin.installdir, '--cmake-args', '-DCMAKE_BUILD_TYPE=Release'],
             cwd=mock.ANY, env=check_env())
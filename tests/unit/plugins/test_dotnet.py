@@ -30,7 +30,7 @@ from testtools.matchers import (
 
 import snapcraft
 from snapcraft import file_utils
-from snapcraft.internal import sources
+from snapcraft.internal import cache
 from snapcraft.plugins import dotnet
 from tests import unit
 
@@ -131,7 +131,7 @@ class DotNetProjectBaseTestCase(unit.TestCase):
         self.addCleanup(patcher.stop)
 
         def side_effect(cmd, *args, **kwargs):
-            if cmd[2].endswith('dotnet'):
+            if cmd[0].endswith('dotnet'):
                 pass
             else:
                 original_check_call(cmd, *args, **kwargs)
@@ -185,9 +185,11 @@ class DotNetProjectTestCase(DotNetProjectBaseTestCase):
     def test_pull_sdk(self):
         plugin = dotnet.DotNetPlugin(
             'test-part', self.options, self.project)
-        with mock.patch.object(
-                sources.Tar, 'download', return_value='test-sdk.tar'):
-            plugin.pull()
+        # The SDK tarball is found in the cache so nothing is downloaded.
+        cache.FileCache().cache(
+            filename='test-sdk.tar', algorithm='sha512',
+            hash=file_utils.calculate_hash('test-sdk.tar', algorithm='sha512'))
+        plugin.pull()
 
         self.assertThat(
             os.path.join('parts', 'test-part', 'dotnet', 'sdk', 'test-sdk'),
@@ -231,10 +233,10 @@ class DotNetProjectBuildCommandsTestCase(DotNetProjectBaseTestCase):
         self.assertThat(
             self.mock_check_call.mock_calls, Equals([
                 mock.call([
-                    mock.ANY, mock.ANY, dotnet_command,
-                    'build', '-c', self.configuration], cwd=mock.ANY),
+                    dotnet_command, 'build', '-c', self.configuration],
+                    cwd=mock.ANY, env=mock.ANY),
                 mock.call([
-                    mock.ANY, mock.ANY, dotnet_command,
-                    'publish', '-c', self.configuration,
+                    dotnet_command, 'publish', '-c', self.configuration,
                     '-o', plugin.installdir,
-                    '--self-contained', '-r', 'linux-x64'], cwd=mock.ANY)]))
+                    '--self-contained', '-r', 'linux-x64'],
+                    cwd=mock.ANY, env=mock.ANY)]))
@@ -255,6 +255,13 @@ ACCEPT=n
 """
         self.assertThat(config_contents, Equals(expected_config))
 
+    def test_make_cmd_with_ccache(self):
+        self.options.build_attributes = ['ccache']
+        plugin = kbuild.KBuildPlugin('test-part', self.options,
+                                     self.project_options)
+
+        self.assertThat(plugin.make_cmd[-1], Equals('CC=ccache gcc'))
+
 
 class KBuildCrossCompilePluginTestCase(unit.TestCase):
 
@@ -308,3 +315,14 @@ class KBuildCrossCompilePluginTestCase(unit.TestCase):
                            os.environ.copy().get('PATH', ''),
                            self.project_options.arch_triplet)]),
         ])
+
+    def test_cross_compile_with_ccache(self):
+        self.options.build_attributes = ['ccache']
+        plugin = kbuild.KBuildPlugin('test-part', self.options,
+                                     self.project_options)
+        plugin.enable_cross_compilation()
+
+        cc = [c for c in plugin.make_cmd if c.startswith('CC=')]
+        self.assertThat(cc, Equals([
+            'CC=ccache {}gcc'.format(
+                self.project_options.cross_compiler_prefix)]))
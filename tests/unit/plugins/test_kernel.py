@@ -1103,6 +1103,7 @@ class KernelPluginDefaulTargetsTestCase(unit.TestCase):
             kernel_initrd_firmware = []
             kernel_device_trees = []
             kernel_initrd_compression = 'gz'
+            build_attributes = []
 
         self.options = Options()
 
@@ -193,16 +193,13 @@ class RubyPluginTestCase(unit.TestCase):
             clean_target=False, keep_tarball=True)
         mock_check_call.assert_has_calls([
             mock.call(
-                [mock.ANY, mock.ANY,
-                 './configure', '--disable-install-rdoc', '--prefix=/'],
+                ['./configure', '--disable-install-rdoc', '--prefix=/'],
                 cwd=ruby_expected_dir, env=mock.ANY),
             mock.call(
-                [mock.ANY, mock.ANY,
-                 'make', '-j{}'.format(plugin.parallel_build_count)],
+                ['make', '-j{}'.format(plugin.parallel_build_count)],
                 cwd=ruby_expected_dir, env=mock.ANY),
             mock.call(
-                [mock.ANY, mock.ANY,
-                 'make', 'install', 'DESTDIR={}'.format(plugin.installdir)],
+                ['make', 'install', 'DESTDIR={}'.format(plugin.installdir)],
                 cwd=ruby_expected_dir, env=mock.ANY)
         ])
 
@@ -217,8 +214,7 @@ class RubyPluginTestCase(unit.TestCase):
 
         test_part_dir = os.path.join(self.path, 'parts', 'test-part')
         mock_check_call.assert_called_with(
-            [mock.ANY, mock.ANY,
-             os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
+            [os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
              os.path.join(test_part_dir,  'install', 'bin', 'gem'),
              'install', '--env-shebang', 'test-gem-1', 'test-gem-2'],
             cwd=os.path.join(test_part_dir, 'build'),
@@ -237,16 +233,14 @@ class RubyPluginTestCase(unit.TestCase):
         test_part_dir = os.path.join(self.path, 'parts', 'test-part')
         mock_check_call.assert_has_calls([
             mock.call(
-                [mock.ANY, mock.ANY,
-                 os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
+                [os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
                  os.path.join(test_part_dir,  'install', 'bin', 'gem'),
                  'install', '--env-shebang',
                  'test-gem-1', 'test-gem-2', 'bundler'],
                 cwd=os.path.join(test_part_dir, 'build'),
                 env=mock.ANY),
             mock.call(
-                [mock.ANY, mock.ANY,
-                 os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
+                [os.path.join(test_part_dir, 'install', 'bin', 'ruby'),
                  os.path.join(test_part_dir,  'install', 'bin', 'bundle'),
                  'install'],
                 cwd=os.path.join(test_part_dir, 'build'),
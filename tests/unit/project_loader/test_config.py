@@ -93,11 +93,15 @@ class ProjectTestCase(YamlBaseTestCase):
     def test_project_with_arguments(self):
         project = snapcraft.project.Project(
             use_geoip=True, parallel_builds=False,
-            target_deb_arch='armhf', debug=True)
+            target_deb_arch='armhf', debug=True, offline=True,
+            local_mirror='mirror', refresh_package_indexes=True)
         self.assertThat(project.use_geoip, Equals(True))
         self.assertThat(project.parallel_builds, Equals(False))
         self.assertThat(project.deb_arch, Equals('armhf'))
         self.assertThat(project.debug, Equals(True))
+        self.assertThat(project.offline, Equals(True))
+        self.assertThat(project.local_mirror, Equals('mirror'))
+        self.assertThat(project.refresh_package_indexes, Equals(True))
 
     def test_project_from_config(self):
         self.make_snapcraft_yaml("""name: foo
@@ -2201,15 +2205,44 @@ parts:
                 '{stage_dir}/lib:'
                 '{stage_dir}/usr/lib:'
                 '{stage_dir}/lib/{arch_triplet}:'
-                '{stage_dir}/usr/lib/{arch_triplet}:'
-                '{stage_dir}/lib:'
-                '{stage_dir}/usr/lib:'
-                '{stage_dir}/lib/{arch_triplet}:'
                 '{stage_dir}/usr/lib/{arch_triplet}'.format(
                     parts_dir=self.parts_dir,
                     stage_dir=self.stage_dir,
                     arch_triplet=self.arch_triplet)))
 
+    def test_parts_build_env_with_diamond_deps(self):
+        self.make_snapcraft_yaml("""name: test
+version: "1"
+summary: test
+description: test
+confinement: strict
+grade: stable
+
+parts:
+  part1:
+    plugin: nil
+  part2:
+    plugin: nil
+    after: [part1]
+  part3:
+    plugin: nil
+    after: [part1]
+  part4:
+    plugin: nil
+    after: [part2, part3]
+""")
+        config = _config.Config()
+        part4 = config.parts.get_part('part4')
+        part1 = config.parts.get_part('part1')
+
+        with unittest.mock.patch.object(
+                part1, 'env', wraps=part1.env) as mock_env:
+            env = config.parts.build_env_for_part(part4)
+
+        # part1 is reachable through part2 and part3 but only visited once.
+        self.assertThat(mock_env.call_count, Equals(2))
+        self.assertThat(len(env), Equals(len(set(env))))
+
     def test_parts_build_env_contains_parallel_build_count(self):
         self.useFixture(fixture_setup.FakeProjectOptions(
             parallel_build_count='fortytwo'))
@@ -2230,6 +2263,32 @@ parts:
         env = config.parts.build_env_for_part(part1)
         self.assertIn('SNAPCRAFT_PARALLEL_BUILD_COUNT=fortytwo', env)
 
+    def test_parts_build_env_with_ccache(self):
+        self.make_snapcraft_yaml("""name: test
+version: "1"
+summary: test
+description: test
+confinement: strict
+grade: stable
+
+parts:
+  part1:
+    plugin: nil
+    build-attributes: [ccache]
+  part2:
+    plugin: nil
+    after: [part1]
+""")
+        config = _config.Config()
+        part1 = config.parts.get_part('part1')
+        part2 = config.parts.get_part('part2')
+
+        self.assertIn('ccache', config.parts.build_tools)
+        self.assertIn('PATH="/usr/lib/ccache:$PATH"',
+                      config.parts.build_env_for_part(part1))
+        self.assertNotIn('PATH="/usr/lib/ccache:$PATH"',
+                         config.parts.build_env_for_part(part2))
+
 
 class ValidationBaseTestCase(unit.TestCase):
 
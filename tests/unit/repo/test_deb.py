@@ -14,14 +14,24 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
+import logging
 import os
+import re
+import tarfile
+import threading
+import urllib.parse
 from subprocess import CalledProcessError
 from unittest.mock import ANY, call, patch, MagicMock
 
+import apt
+import fixtures
 from testtools.matchers import (
     Contains,
     Equals,
+    FileContains,
     FileExists,
+    MatchesRegex,
 )
 
 import snapcraft
@@ -49,6 +59,7 @@ class UbuntuTestCase(RepoBaseTestCase):
 
         self.mock_package = MagicMock()
         self.mock_package.candidate.fetch_binary.side_effect = _fetch_binary
+        self.mock_package.candidate.priority = 'optional'
         self.mock_cache.return_value.get_changes.return_value = [
             self.mock_package]
 
@@ -67,12 +78,12 @@ class UbuntuTestCase(RepoBaseTestCase):
         self.assertThat(name, Equals('hello'))
         self.assertThat(version, Equals('2.10-1'))
 
-    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
+    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binaries')
     @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
-    def test_get_package(self, mock_apt_pkg, mock_fetch_binary):
+    def test_get_package(self, mock_apt_pkg, mock_fetch_binaries):
         fake_package_path = os.path.join(self.path, 'fake-package.deb')
         open(fake_package_path, 'w').close()
-        mock_fetch_binary.return_value = fake_package_path
+        mock_fetch_binaries.return_value = [fake_package_path]
         self.mock_cache().is_virtual_package.return_value = False
 
         project_options = snapcraft.ProjectOptions(
@@ -106,12 +117,12 @@ class UbuntuTestCase(RepoBaseTestCase):
             os.path.join(self.tempdir, 'download', 'fake-package.deb'),
             FileExists())
 
-    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binary')
+    @patch('snapcraft.internal.repo._deb._AptCache.fetch_binaries')
     @patch('snapcraft.internal.repo._deb.apt.apt_pkg')
-    def test_get_multiarch_package(self, mock_apt_pkg, mock_fetch_binary):
+    def test_get_multiarch_package(self, mock_apt_pkg, mock_fetch_binaries):
         fake_package_path = os.path.join(self.path, 'fake-package.deb')
         open(fake_package_path, 'w').close()
-        mock_fetch_binary.return_value = fake_package_path
+        mock_fetch_binaries.return_value = [fake_package_path]
         self.mock_cache().is_virtual_package.return_value = False
 
         project_options = snapcraft.ProjectOptions(
@@ -225,25 +236,589 @@ deb http://ports.ubuntu.com/ubuntu-ports trusty-security multiverse
         self.assertFalse(mock_cc.called)
 
 
-class UbuntuTestCaseWithFakeAptCache(RepoBaseTestCase):
+class UpdateIndexesTestCase(RepoBaseTestCase):
 
     def setUp(self):
         super().setUp()
-        self.fake_apt_cache = fixture_setup.FakeAptCache()
-        self.useFixture(self.fake_apt_cache)
+        patcher = patch('snapcraft.repo._deb.apt.Cache')
+        self.mock_cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache_dir = os.path.join(self.path, 'apt')
+        self.lists_dir = os.path.join(
+            self.cache_dir, 'var', 'lib', 'apt', 'lists')
+
+        def _update(**kwargs):
+            os.makedirs(self.lists_dir, exist_ok=True)
+            with open(os.path.join(self.lists_dir, 'foo_InRelease'),
+                      'w') as f:
+                f.write('release')
+
+        self.mock_cache.return_value.update.side_effect = _update
+
+    def _setup_apt(self, **kwargs):
+        apt_cache = repo._deb._AptCache('amd64', **kwargs)
+        apt_cache._setup_apt(self.cache_dir)
+
+    def test_update_once_within_ttl(self):
+        self._setup_apt(update_ttl=3600)
+        self._setup_apt(update_ttl=3600)
+
+        self.mock_cache.return_value.update.assert_called_once_with(
+            fetch_progress=ANY, sources_list=ANY)
+
+    def test_update_ttl_expired(self):
+        self._setup_apt(update_ttl=0)
+        self._setup_apt(update_ttl=0)
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+
+    def test_update_ttl_from_environment(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_APT_UPDATE_TTL', '0'))
+        self._setup_apt()
+        self._setup_apt()
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+
+    def test_invalid_update_ttl_from_environment(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_APT_UPDATE_TTL', '1h'))
+
+        raised = self.assertRaises(
+            errors.InvalidAptUpdateTTLError, self._setup_apt)
+
+        self.assertThat(str(raised), Contains("'1h'"))
+
+    def test_update_indexes_removed(self):
+        self._setup_apt(update_ttl=3600)
+        os.remove(os.path.join(self.lists_dir, 'foo_InRelease'))
+        self._setup_apt(update_ttl=3600)
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+
+    def test_refresh_package_indexes(self):
+        self._setup_apt(update_ttl=3600)
+        project_options = snapcraft.ProjectOptions(
+            refresh_package_indexes=True)
+        ubuntu = repo.Ubuntu(self.path, project_options=project_options)
+        ubuntu._apt._setup_apt(self.cache_dir)
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+
+    def test_offline_does_not_update(self):
+        self._setup_apt(update_ttl=0)
+        self._setup_apt(update_ttl=0, offline=True)
+
+        self.mock_cache.return_value.update.assert_called_once_with(
+            fetch_progress=ANY, sources_list=ANY)
+
+    def test_offline_without_indexes(self):
+        self.assertRaises(
+            errors.PackageIndexNotCachedError, self._setup_apt, offline=True)
+        self.mock_cache.return_value.update.assert_not_called()
+
+    def test_local_mirror_always_updates(self):
+        mirror_dir = os.path.join(self.path, 'mirror')
+        os.mkdir(mirror_dir)
+
+        self._setup_apt(update_ttl=3600, local_mirror=mirror_dir)
+        self._setup_apt(update_ttl=3600, local_mirror=mirror_dir,
+                        offline=True)
+
+        self.assertThat(
+            self.mock_cache.return_value.update.call_count, Equals(2))
+        sources_list = os.path.join(
+            self.cache_dir, 'etc', 'apt', 'sources.list')
+        self.assertThat(sources_list, FileContains(
+            repo._deb._mirror.LocalMirror(mirror_dir).get_sources_list()))
+
+
+class FetchBinariesTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('snapcraft.internal.repo._deb.apt.apt_pkg')
+        self.mock_apt_pkg = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        self.apt = repo._deb._AptCache('amd64')
+        self.apt.progress = MagicMock()
+        self.download_dir = os.path.join(self.path, 'download')
+        os.makedirs(self.download_dir)
+
+    def _make_candidate(self, name, size=2**20):
+        candidate = MagicMock()
+        candidate.uri = 'http://archive/{}.deb'.format(name)
+        candidate.size = size
+        candidate._records.filename = 'pool/{}.deb'.format(name)
+        candidate._records.md5_hash = 'md5-{}'.format(name)
+        return candidate
+
+    def test_fetch_binaries_uses_a_single_acquire(self):
+        candidates = [self._make_candidate('a'), self._make_candidate('b')]
+        acquire_file = self.mock_apt_pkg.AcquireFile.return_value
+        acquire_file.status = acquire_file.STAT_DONE
+
+        paths = self.apt.fetch_binaries(
+            package_candidates=candidates, destination=self.download_dir)
+
+        self.assertThat(paths, Equals([
+            os.path.join(self.download_dir, 'a.deb'),
+            os.path.join(self.download_dir, 'b.deb')]))
+        self.mock_apt_pkg.Acquire.assert_called_once_with(self.apt.progress)
+        acquire = self.mock_apt_pkg.Acquire.return_value
+        self.mock_apt_pkg.AcquireFile.assert_has_calls([
+            call(acquire, 'http://archive/a.deb', 'md5-a', 2**20, 'a.deb',
+                 destfile=os.path.join(self.download_dir, 'a.deb')),
+            call(acquire, 'http://archive/b.deb', 'md5-b', 2**20, 'b.deb',
+                 destfile=os.path.join(self.download_dir, 'b.deb'))])
+        acquire.run.assert_called_once_with()
+        self.assertThat(
+            self.fake_logger.output,
+            Contains('Downloading 2 stage packages (2.0 MiB)'))
+
+    def test_fetch_binaries_links_local_files(self):
+        local_deb = os.path.join(self.path, 'mirror dir', 'a.deb')
+        os.makedirs(os.path.dirname(local_deb))
+        open(local_deb, 'w').close()
+        candidate = self._make_candidate('a')
+        candidate.uri = 'file:' + urllib.parse.quote(local_deb)
+
+        paths = self.apt.fetch_binaries(
+            package_candidates=[candidate], destination=self.download_dir)
+
+        self.assertThat(paths, Equals(
+            [os.path.join(self.download_dir, 'a.deb')]))
+        self.assertThat(
+            os.stat(paths[0]).st_ino, Equals(os.stat(local_deb).st_ino))
+        self.mock_apt_pkg.AcquireFile.assert_not_called()
+        self.mock_apt_pkg.Acquire.return_value.run.assert_not_called()
+
+    @patch('snapcraft.internal.repo._deb.apt.package._file_is_same')
+    def test_fetch_binaries_skips_cached(self, mock_file_is_same):
+        mock_file_is_same.side_effect = lambda path, *args: path.endswith(
+            'a.deb')
+        candidates = [self._make_candidate('a'), self._make_candidate('b')]
+        acquire_file = self.mock_apt_pkg.AcquireFile.return_value
+        acquire_file.status = acquire_file.STAT_DONE
+
+        paths = self.apt.fetch_binaries(
+            package_candidates=candidates, destination=self.download_dir)
+
+        self.assertThat(paths, Equals([
+            os.path.join(self.download_dir, 'a.deb'),
+            os.path.join(self.download_dir, 'b.deb')]))
+        self.mock_apt_pkg.AcquireFile.assert_called_once_with(
+            self.mock_apt_pkg.Acquire.return_value, 'http://archive/b.deb',
+            'md5-b', 2**20, 'b.deb',
+            destfile=os.path.join(self.download_dir, 'b.deb'))
+        self.assertThat(
+            self.fake_logger.output,
+            Contains('Downloading 1 stage package (1.0 MiB)'))
+
+    @patch('snapcraft.internal.repo._deb.apt.package._file_is_same')
+    def test_fetch_binaries_all_cached(self, mock_file_is_same):
+        mock_file_is_same.return_value = True
+
+        self.apt.fetch_binaries(
+            package_candidates=[self._make_candidate('a')],
+            destination=self.download_dir)
+
+        self.mock_apt_pkg.AcquireFile.assert_not_called()
+        self.mock_apt_pkg.Acquire.return_value.run.assert_not_called()
+
+    def test_fetch_binaries_offline(self):
+        self.apt._offline = True
+
+        raised = self.assertRaises(
+            errors.PackagesNotCachedError, self.apt.fetch_binaries,
+            package_candidates=[self._make_candidate('a')],
+            destination=self.download_dir)
+
+        self.assertThat(raised.packages, Equals('a.deb'))
+        self.mock_apt_pkg.Acquire.return_value.run.assert_not_called()
+
+    def test_fetch_binaries_error(self):
+        acquire_file = self.mock_apt_pkg.AcquireFile.return_value
+        acquire_file.destfile = 'a.deb'
+        acquire_file.error_text = 'not found'
+
+        raised = self.assertRaises(
+            apt.package.FetchError, self.apt.fetch_binaries,
+            package_candidates=[self._make_candidate('a')],
+            destination=self.download_dir)
+
+        self.assertThat(str(raised), Equals(
+            "The item 'a.deb' could not be fetched: not found"))
+
+
+def _make_deb(path, files, control=None):
+    """Write a minimal .deb to path with files (name: content) as data."""
+    members = [('debian-binary', b'2.0\n')]
+    if control is not None:
+        control_tar = io.BytesIO()
+        with tarfile.open(fileobj=control_tar, mode='w:gz') as tar:
+            info = tarfile.TarInfo('./control')
+            info.size = len(control.encode())
+            tar.addfile(info, io.BytesIO(control.encode()))
+        members.append(('control.tar.gz', control_tar.getvalue()))
+
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for name, content in sorted(files.items()):
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                tar.addfile(info)
+            elif content.startswith('->'):
+                info.type = tarfile.SYMTYPE
+                info.linkname = content[2:]
+                tar.addfile(info)
+            else:
+                content = content.encode()
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+
+    with open(path, 'wb') as deb:
+        deb.write(b'!<arch>\n')
+        for name, content in members + [('data.tar.gz', data.getvalue())]:
+            deb.write('{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n'.format(
+                name, 0, 0, 0, 100644, len(content)).encode())
+            deb.write(content)
+            if len(content) % 2:
+                deb.write(b'\n')
+
+
+class UnpackTestCase(RepoBaseTestCase):
+
+    scenarios = [
+        ('serial', dict(jobs=1)),
+        ('parallel', dict(jobs=2)),
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.fake_logger = fixtures.FakeLogger(level=logging.DEBUG)
+        self.useFixture(self.fake_logger)
+
+        project_options = snapcraft.ProjectOptions(use_geoip=False)
+        self.ubuntu = repo.Ubuntu(
+            self.tempdir, project_options=project_options)
+        self.download_dir = os.path.join(self.tempdir, 'download')
+        os.makedirs(self.download_dir)
+        self.unpack_dir = os.path.join(self.tempdir, 'install')
+
+    def test_unpack(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/bin/a': 'a'})
+        _make_deb(os.path.join(self.download_dir, 'b.deb'), {
+            'usr': None, 'usr/lib': None, 'usr/lib/b': 'b'})
+
+        self.ubuntu.unpack(self.unpack_dir, jobs=self.jobs)
+
+        for name, content in [('usr/bin/a', 'a'), ('usr/lib/b', 'b')]:
+            path = os.path.join(self.unpack_dir, name)
+            self.assertThat(path, FileContains(content))
+        self.assertThat(self.fake_logger.output, MatchesRegex(
+            r".*Unpacked 'a\.deb' in [\d.]+s\nUnpacked 'b\.deb' in [\d.]+s",
+            re.DOTALL))
+
+    def test_unpack_overwrites_in_package_order(self):
+        _make_deb(os.path.join(self.download_dir, 'b.deb'), {
+            'usr': None, 'usr/lib': None, 'usr/lib/conflict': 'b',
+            'usr/lib/link': 'b'})
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/lib': None, 'usr/lib/conflict': 'a',
+            'usr/lib/link': '->conflict'})
+
+        self.ubuntu.unpack(self.unpack_dir, jobs=self.jobs)
+
+        lib_dir = os.path.join(self.unpack_dir, 'usr', 'lib')
+        self.assertThat(
+            os.path.join(lib_dir, 'conflict'), FileContains('b'))
+        self.assertThat(os.path.join(lib_dir, 'link'), FileContains('b'))
+
+    def test_unpack_through_directory_symlink(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/lib': None, 'lib': '->usr/lib'})
+        _make_deb(os.path.join(self.download_dir, 'b.deb'), {
+            'lib': None, 'lib/b': 'b'})
+
+        self.ubuntu.unpack(self.unpack_dir, jobs=self.jobs)
+
+        self.assertTrue(os.path.islink(os.path.join(self.unpack_dir, 'lib')))
+        self.assertThat(
+            os.path.join(self.unpack_dir, 'usr', 'lib', 'b'),
+            FileContains('b'))
+
+
+class UnpackCacheTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        project_options = snapcraft.ProjectOptions(use_geoip=False)
+        self.ubuntu = repo.Ubuntu(
+            self.tempdir, project_options=project_options)
+        self.download_dir = os.path.join(self.tempdir, 'download')
+        os.makedirs(self.download_dir)
+
+    def test_unpack_reuses_cached_tree(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/bin/a': 'a'})
+        first_dir = os.path.join(self.tempdir, 'first')
+        second_dir = os.path.join(self.tempdir, 'second')
+
+        self.ubuntu.unpack(first_dir, jobs=1)
+        with patch('snapcraft.internal.repo._deb._unpack_deb') as mock_unpack:
+            self.ubuntu.unpack(second_dir, jobs=1)
+
+        mock_unpack.assert_not_called()
+        first_file = os.path.join(first_dir, 'usr', 'bin', 'a')
+        second_file = os.path.join(second_dir, 'usr', 'bin', 'a')
+        self.assertThat(second_file, FileContains('a'))
+        # Clones of the cached tree, never links to it.
+        self.assertFalse(os.path.samefile(first_file, second_file))
+
+    def test_unpack_looks_up_each_package_once(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/bin/a': 'a'})
+
+        self.ubuntu.unpack(os.path.join(self.tempdir, 'first'), jobs=1)
+        self.ubuntu.unpack(os.path.join(self.tempdir, 'second'), jobs=1)
+
+        stats = self.ubuntu._unpacked_cache._load_stats()
+        self.assertThat(stats['unpacked-stage-packages'],
+                        Equals(dict(hits=1, misses=1)))
+
+    def test_unpack_uses_the_tree_just_cached(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/bin/a': 'a'})
+        unpack_dir = os.path.join(self.tempdir, 'install')
+
+        # Any later lookup would miss, as after a concurrent prune.
+        with patch.object(self.ubuntu._unpacked_cache, 'get',
+                          return_value=None):
+            self.ubuntu.unpack(unpack_dir, jobs=1)
+
+        self.assertThat(os.path.join(unpack_dir, 'usr', 'bin', 'a'),
+                        FileContains('a'))
+
+    def test_unpack_location_dependent_fixes(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/lib': None,
+            'usr/bin/xml2-config': 'prefix=/usr\n',
+            'usr/lib/a.pc': 'prefix=/usr\n'})
+        first_dir = os.path.join(self.tempdir, 'first')
+        second_dir = os.path.join(self.tempdir, 'second')
+
+        self.ubuntu.unpack(first_dir, jobs=1)
+        self.ubuntu.unpack(second_dir, jobs=1)
+
+        for unpack_dir in (first_dir, second_dir):
+            expected = 'prefix={}/usr\n'.format(unpack_dir)
+            self.assertThat(
+                os.path.join(unpack_dir, 'usr', 'bin', 'xml2-config'),
+                FileContains(expected))
+            self.assertThat(
+                os.path.join(unpack_dir, 'usr', 'lib', 'a.pc'),
+                FileContains(expected))
+
+    def test_unpack_edits_leave_cache_intact(self):
+        _make_deb(os.path.join(self.download_dir, 'a.deb'), {
+            'usr': None, 'usr/bin': None, 'usr/bin/a': 'a\n'})
+        first_dir = os.path.join(self.tempdir, 'first')
+        second_dir = os.path.join(self.tempdir, 'second')
+
+        self.ubuntu.unpack(first_dir, jobs=1)
+        first_file = os.path.join(first_dir, 'usr', 'bin', 'a')
+        # As any plugin or scriptlet could, even as root.
+        with open(first_file, 'a') as f:
+            f.write('edited\n')
+        os.chmod(first_file, 0o755)
+        self.ubuntu.unpack(second_dir, jobs=1)
+
+        second_file = os.path.join(second_dir, 'usr', 'bin', 'a')
+        self.assertThat(first_file, FileContains('a\nedited\n'))
+        self.assertThat(second_file, FileContains('a\n'))
+        self.assertThat(os.stat(second_file).st_mode & 0o777, Equals(0o644))
+
+
+class UbuntuAptLockTestCase(RepoBaseTestCase):
+
+    def test_apt_use_waits_for_other_threads(self):
+        checked = threading.Event()
+
+        def check():
+            repo.Ubuntu.build_package_is_valid('fake-package')
+            checked.set()
+
+        with patch('snapcraft.internal.repo._deb._session.host_has_package',
+                   return_value=True):
+            with repo._deb._apt_lock:
+                thread = threading.Thread(target=check)
+                thread.start()
+                self.assertFalse(checked.wait(0.1))
+            thread.join()
+
+        self.assertTrue(checked.is_set())
+
+
+class UbuntuDpkgDatabaseTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch(
+            'snapcraft.internal.repo._deb._session.get_dpkg_database')
+        self.dpkg_database = patcher.start().return_value
+        self.addCleanup(patcher.stop)
 
     def test_get_installed_packages(self):
-        for name, version, installed in (
-                ('test-installed-package', 'test-installed-package-version',
-                 True),
-                ('test-not-installed-package', 'dummy', False)):
-            self.fake_apt_cache.add_package(
-                fixture_setup.FakeAptCachePackage(
-                    name, version, installed=installed))
+        self.dpkg_database.get_installed_packages.return_value = {
+            'test-installed-package': 'test-installed-package-version',
+            'another-package:i386': '1.0'}
 
         self.assertThat(
             repo.Repo.get_installed_packages(),
-            Equals(['test-installed-package=test-installed-package-version']))
+            Equals(['another-package:i386=1.0',
+                    'test-installed-package=test-installed-package-version']))
+
+    def test_get_packages_libraries(self):
+        lib_dir = os.path.join(self.path, 'lib')
+        os.makedirs(lib_dir)
+        lib_path = os.path.join(lib_dir, 'libfoo.so')
+        open(lib_path, 'w').close()
+        self.dpkg_database.get_files.return_value = {
+            'foo': [lib_dir, lib_path, os.path.join(lib_dir, 'missing.so')],
+            'bar': [os.path.join(self.path, 'bin')]}
+
+        self.assertThat(
+            repo.Ubuntu.get_packages_libraries(['foo', 'bar']),
+            Equals({'foo': {lib_path}, 'bar': set()}))
+        self.dpkg_database.get_files.assert_called_once_with(['foo', 'bar'])
+
+        # Already known.
+        self.assertThat(
+            repo.Ubuntu.get_package_libraries('foo'), Equals({lib_path}))
+        self.dpkg_database.get_files.assert_called_once_with(['foo', 'bar'])
+
+
+class FilterBasePackagesTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fake_apt_cache = fixture_setup.FakeAptCache()
+        self.useFixture(self.fake_apt_cache)
+        self.fake_apt_cache.add_package(fixture_setup.FakeAptCachePackage(
+            'essential', priority='essential'))
+        self.fake_apt_cache.add_package(fixture_setup.FakeAptCachePackage(
+            'unrelated-essential', priority='essential'))
+        self.fake_apt_cache.add_package(fixture_setup.FakeAptCachePackage(
+            'regular'))
+
+        project_options = snapcraft.ProjectOptions(use_geoip=False)
+        self.ubuntu = repo.Ubuntu(
+            self.tempdir, project_options=project_options)
+
+    def _mark(self, *names):
+        for name in names:
+            self.fake_apt_cache.cache[name].marked_install = True
+
+    def test_filter_base_packages(self):
+        self._mark('essential', 'adduser', 'regular')
+
+        with patch.object(self.fake_apt_cache.Cache, '__iter__') as mock_iter:
+            self.ubuntu._filter_base_packages(
+                self.fake_apt_cache.cache, ['regular'])
+
+        mock_iter.assert_not_called()
+        self.assertThat(
+            [p.name for p in self.fake_apt_cache.cache.get_changes()],
+            Equals(['regular']))
+
+    def test_filter_base_packages_keeps_requested(self):
+        self._mark('essential', 'adduser')
+
+        self.ubuntu._filter_base_packages(
+            self.fake_apt_cache.cache, ['essential', 'adduser'])
+
+        self.assertThat(
+            sorted(p.name for p in self.fake_apt_cache.cache.get_changes()),
+            Equals(['adduser', 'essential']))
+
+
+class AptSessionTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fake_apt_cache = fixture_setup.FakeAptCache()
+        self.useFixture(self.fake_apt_cache)
+        self.fake_apt_cache.add_package(fixture_setup.FakeAptCachePackage(
+            'installed', installed=True))
+        self.fake_apt_cache.add_package(fixture_setup.FakeAptCachePackage(
+            'not-installed'))
+
+    def test_build_package_is_valid_opens_the_cache_once(self):
+        self.assertTrue(repo.Ubuntu.build_package_is_valid('installed'))
+        self.assertTrue(repo.Ubuntu.build_package_is_valid('not-installed'))
+        self.assertFalse(repo.Ubuntu.build_package_is_valid('missing'))
+        self.assertFalse(repo.Ubuntu.build_package_is_valid('missing'))
+
+        self.fake_apt_cache.mock_apt_cache.assert_called_once_with()
+
+    def test_is_package_installed_memoized(self):
+        self.assertTrue(repo.Ubuntu.is_package_installed('installed'))
+        self.fake_apt_cache.cache['installed'].installed = None
+
+        self.assertTrue(repo.Ubuntu.is_package_installed('installed'))
+        self.assertFalse(repo.Ubuntu.is_package_installed('not-installed'))
+        self.fake_apt_cache.mock_apt_cache.assert_called_once_with()
+
+    @patch('subprocess.check_call')
+    def test_install_build_packages_resets_host(self, mock_check_call):
+        self.assertFalse(repo.Ubuntu.is_package_installed('not-installed'))
+
+        repo.Ubuntu.install_build_packages(['not-installed'])
+        self.fake_apt_cache.cache['not-installed'].installed = True
+
+        self.assertTrue(repo.Ubuntu.is_package_installed('not-installed'))
+
+    def test_is_valid_shares_the_archive(self):
+        project_options = snapcraft.ProjectOptions(use_geoip=False)
+        ubuntu = repo.Ubuntu(self.tempdir, project_options=project_options)
+        other_ubuntu = repo.Ubuntu(
+            os.path.join(self.tempdir, 'other'),
+            project_options=project_options)
+
+        self.assertTrue(ubuntu.is_valid('installed'))
+        self.assertTrue(other_ubuntu.is_valid('not-installed'))
+        self.assertFalse(other_ubuntu.is_valid('missing'))
+        ubuntu.get(['not-installed'])
+
+        self.fake_apt_cache.mock_apt_cache.assert_called_once_with(
+            rootdir=ANY, memonly=True)
+        self.assertFalse(
+            self.fake_apt_cache.cache['not-installed'].marked_install)
+
+    def test_reset_session(self):
+        repo.Ubuntu.build_package_is_valid('installed')
+        repo.reset_session()
+        repo.Ubuntu.build_package_is_valid('installed')
+
+        self.assertThat(
+            self.fake_apt_cache.mock_apt_cache.call_count, Equals(2))
 
 
 class BuildPackagesTestCase(unit.TestCase):
@@ -320,6 +895,45 @@ class BuildPackagesTestCase(unit.TestCase):
             lambda c, env: error if 'apt-mark' in c else None
         self.install_test_packages(['package-not-installed'])
 
+    def _patch_host_package_state(self):
+        status = os.path.join(self.path, 'status')
+        lists = os.path.join(self.path, 'lists')
+        open(status, 'w').close()
+        os.mkdir(lists)
+        patcher = patch('snapcraft.repo._deb._HOST_PACKAGE_STATE_PATHS',
+                        (status, lists))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return status
+
+    @patch('subprocess.check_call')
+    def test_install_build_packages_skipped_when_satisfied(
+            self, mock_check_call):
+        self._patch_host_package_state()
+        self.install_test_packages(['package-not-installed'])
+        self.fake_apt_cache.cache['package-not-installed'].installed = True
+        mock_check_call.reset_mock()
+
+        self.assertThat(
+            repo.Ubuntu.install_build_packages(['package-not-installed']),
+            Equals([]))
+
+        mock_check_call.assert_not_called()
+        self.fake_apt_cache.mock_apt_cache.assert_called_once_with()
+
+    @patch('subprocess.check_call')
+    def test_install_build_packages_rechecked_after_host_change(
+            self, mock_check_call):
+        status = self._patch_host_package_state()
+        self.install_test_packages(['package-installed'])
+        os.utime(status, (0, 0))
+
+        self.install_test_packages(['package-installed'])
+        self.install_test_packages(['package-installed', 'another-installed'])
+
+        self.assertThat(
+            self.fake_apt_cache.mock_apt_cache.call_count, Equals(3))
+
     def test_invalid_package_requested(self):
         self.assertRaises(
             errors.BuildPackageNotFoundError,
@@ -0,0 +1,127 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from textwrap import dedent
+from unittest import mock
+
+from testtools.matchers import Equals
+
+from snapcraft.internal.repo import _dpkg
+from . import RepoBaseTestCase
+
+
+class DpkgDatabaseTestCase(RepoBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin_dir = os.path.join(self.path, 'dpkg')
+        os.makedirs(os.path.join(self.admin_dir, 'info'))
+        with open(os.path.join(self.admin_dir, 'status'), 'w') as f:
+            f.write(dedent("""\
+                Package: foo
+                Status: install ok installed
+                Architecture: all
+                Version: 1.0
+                Description: foo
+                 Version: not-a-field
+
+                Package: libbar
+                Status: install ok installed
+                Architecture: amd64
+                Multi-Arch: same
+                Version: 2.0
+
+                Package: libbar
+                Status: install ok installed
+                Architecture: i386
+                Multi-Arch: same
+                Version: 2.0
+
+                Package: removed
+                Status: deinstall ok config-files
+                Architecture: amd64
+                Version: 3.0
+                """))
+        self._write_list('foo.list', ['/.', '/usr', '/usr/bin/foo'])
+        self._write_list('libbar:amd64.list', ['/usr/lib/libbar.so.2'])
+        self._write_list('libbar:i386.list', ['/usr/lib/i386/libbar.so.2'])
+
+        self.database = _dpkg.DpkgDatabase(
+            admin_dir=self.admin_dir, native_arch='amd64')
+
+    def _write_list(self, name, paths):
+        with open(os.path.join(self.admin_dir, 'info', name), 'w') as f:
+            f.write('\n'.join(paths) + '\n')
+
+    def test_get_installed_packages(self):
+        self.assertThat(self.database.get_installed_packages(), Equals({
+            'foo': '1.0', 'libbar': '2.0', 'libbar:i386': '2.0'}))
+
+    def test_get_files(self):
+        self.assertThat(
+            self.database.get_files(['foo', 'libbar', 'libbar:i386',
+                                     'missing']),
+            Equals({
+                'foo': ['/usr', '/usr/bin/foo'],
+                'libbar': ['/usr/lib/libbar.so.2'],
+                'libbar:i386': ['/usr/lib/i386/libbar.so.2'],
+                'missing': [],
+            }))
+
+    def test_get_files_lists_info_once(self):
+        self._write_list('libbaz:i386.list', ['/usr/lib/i386/libbaz.so.1'])
+
+        with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            files = self.database.get_files(['foo', 'libbar', 'libbaz',
+                                             'missing'])
+
+        self.assertThat(files['libbaz'], Equals(['/usr/lib/i386/libbaz.so.1']))
+        # Only for libbaz and missing, which have no list of their own.
+        self.assertThat(mock_listdir.call_count, Equals(1))
+
+    def test_get_files_without_foreign_packages_does_not_list_info(self):
+        with mock.patch('os.listdir', wraps=os.listdir) as mock_listdir:
+            self.database.get_files(['foo', 'libbar'])
+
+        mock_listdir.assert_not_called()
+
+    def test_cached_on_disk(self):
+        self.database.get_files(['foo'])
+        self.database.get_installed_packages()
+        os.remove(os.path.join(self.admin_dir, 'info', 'foo.list'))
+
+        database = _dpkg.DpkgDatabase(
+            admin_dir=self.admin_dir, native_arch='amd64')
+        with mock.patch('builtins.open', wraps=open) as mock_open:
+            self.assertThat(database.get_files(['foo']), Equals({
+                'foo': ['/usr', '/usr/bin/foo']}))
+            self.assertThat(
+                database.get_installed_packages()['foo'], Equals('1.0'))
+
+        opened = [c[0][0] for c in mock_open.call_args_list]
+        self.assertNotIn(os.path.join(self.admin_dir, 'status'), opened)
+
+    def test_cache_invalidated_when_status_changes(self):
+        self.database.get_files(['foo'])
+        self._write_list('foo.list', ['/usr/bin/new-foo'])
+        status_file = os.path.join(self.admin_dir, 'status')
+        stat = os.stat(status_file)
+        os.utime(status_file, ns=(stat.st_atime_ns,
+                                  stat.st_mtime_ns + 1000000000))
+
+        self.assertThat(self.database.get_files(['foo']), Equals({
+            'foo': ['/usr/bin/new-foo']}))
@@ -0,0 +1,117 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from textwrap import dedent
+from unittest import mock
+
+from testtools.matchers import Contains, Equals, FileContains, Not
+
+from snapcraft.file_utils import calculate_hash
+from snapcraft.internal.repo import _mirror, errors
+from tests import unit
+from .test_deb import _make_deb
+
+
+def _control(name, version='1.0'):
+    return dedent("""\
+        Package: {}
+        Version: {}
+        Architecture: amd64
+        Description: test package
+        """).format(name, version)
+
+
+class LocalMirrorTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mirror_dir = os.path.join(self.path, 'mirror')
+        os.makedirs(os.path.join(self.mirror_dir, 'sub'))
+        self.foo_deb = os.path.join(self.mirror_dir, 'foo_1.0_amd64.deb')
+        _make_deb(self.foo_deb, {'foo': 'foo'}, control=_control('foo'))
+        _make_deb(os.path.join(self.mirror_dir, 'sub', 'bar_2.0_amd64.deb'),
+                  {'bar': 'bar'}, control=_control('bar', '2.0'))
+        self.mirror = _mirror.LocalMirror(self.mirror_dir)
+        self.packages_file = os.path.join(self.mirror.index_dir, 'Packages')
+
+    def test_sources_list(self):
+        self.assertThat(self.mirror.get_sources_list(), Equals(
+            'deb [trusted=yes] file:/ {}/\n'.format(
+                self.mirror.index_dir.lstrip('/'))))
+
+    def test_index_outside_of_mirror(self):
+        self.mirror.update_index()
+
+        self.assertThat(sorted(os.listdir(self.mirror_dir)), Equals(
+            ['foo_1.0_amd64.deb', 'sub']))
+
+    def test_update_index(self):
+        self.mirror.update_index()
+
+        self.assertThat(self.packages_file, FileContains(matcher=Contains(
+            dedent("""\
+                Package: foo
+                Version: 1.0
+                Architecture: amd64
+                Description: test package
+                Filename: {}
+                Size: {}
+                MD5sum: {}
+                SHA256: {}
+                """).format(
+                    self.foo_deb.lstrip('/'), os.path.getsize(self.foo_deb),
+                    calculate_hash(self.foo_deb, algorithm='md5'),
+                    calculate_hash(self.foo_deb, algorithm='sha256')))))
+        self.assertThat(self.packages_file, FileContains(
+            matcher=Contains('Package: bar\nVersion: 2.0\n')))
+        self.assertThat(
+            os.path.join(self.mirror.index_dir, 'Release'),
+            FileContains(matcher=Contains(' {} {} Packages\n'.format(
+                calculate_hash(self.packages_file, algorithm='sha256'),
+                os.path.getsize(self.packages_file)))))
+
+    def test_update_index_only_reads_new_packages(self):
+        self.mirror.update_index()
+        os.unlink(self.foo_deb)
+        _make_deb(os.path.join(self.mirror_dir, 'baz_1.0_amd64.deb'),
+                  {'baz': 'baz'}, control=_control('baz'))
+
+        with mock.patch(
+                'snapcraft.internal.repo._mirror._read_control',
+                wraps=_mirror._read_control) as read_control:
+            _mirror.LocalMirror(self.mirror_dir).update_index()
+
+        read_control.assert_called_once_with(
+            os.path.join(self.mirror_dir, 'baz_1.0_amd64.deb'))
+        self.assertThat(self.packages_file, FileContains(
+            matcher=Not(Contains('Package: foo\n'))))
+        self.assertThat(self.packages_file, FileContains(
+            matcher=Contains('Package: baz\n')))
+
+    def test_invalid_deb(self):
+        _make_deb(os.path.join(self.mirror_dir, 'broken.deb'), {})
+
+        raised = self.assertRaises(
+            errors.InvalidLocalMirrorError, self.mirror.update_index)
+
+        self.assertThat(str(raised), Contains('broken.deb'))
+
+    def test_missing_mirror(self):
+        mirror = _mirror.LocalMirror(os.path.join(self.path, 'missing'))
+
+        self.assertRaises(
+            errors.InvalidLocalMirrorError, mirror.update_index)
@@ -33,6 +33,7 @@ class FakeSnapCommand(fixtures.Fixture):
         self.calls = []
         self.install_success = True
         self.refresh_success = True
+        self.sudo_success = True
         self._email = '-'
 
     def _setUp(self):
@@ -46,7 +47,11 @@ class FakeSnapCommand(fixtures.Fixture):
             return side_effect(original_check_output, cmd, *args, **kwargs)
 
         def side_effect(original, cmd, *args, **kwargs):
-            if self._is_snap_command(cmd):
+            if cmd == ['sudo', '-v']:
+                self.calls.append(cmd)
+                if not self.sudo_success:
+                    raise subprocess.CalledProcessError(returncode=1, cmd=cmd)
+            elif self._is_snap_command(cmd):
                 self.calls.append(cmd)
                 return self._fake_snap_command(cmd, *args, **kwargs)
             else:
@@ -405,32 +410,107 @@ class SnapPackageLifecycleTest(SnapPackageBaseTestCase):
         self.fake_snapd.find_result = [{
             'fake-snap': {'channels': {
                 'classic/stable': {'confinement': 'classic'}}}}]
+        self.fake_snapd.snaps_result = [
+            {'name': 'fake-snap', 'channel': 'stable', 'revision': 'old'}]
 
         def snap_details(handler_instance, snap_name):
-            if snap_name == 'fake-snap':
-                return (200, {'channel': 'stable', 'revision': 'dummy'})
-            # XXX The query for the new-fake-snap details must fail the first
-            # time, but succeed the second.
-            elif snap_name == 'new-fake-snap':
-                if not handler_instance._private_data[
-                        'new_fake_snap_installed']:
-                    handler_instance._private_data[
-                        'new_fake_snap_installed'] = True
-                    return (404, {})
-                else:
-                    return (200, {'channel': 'stable', 'revision': 'dummy'})
+            return (200, {'channel': 'stable', 'revision': 'new'})
 
         self.fake_snapd.snap_details_func = snap_details
-        snaps.install_snaps([
+        installed_snaps = snaps.install_snaps([
             'fake-snap/classic/stable',
             'new-fake-snap'
         ])
-        self.assertThat(self.fake_snap_command.calls, Equals([
-            ['snap', 'whoami'],
+
+        # sudo authenticates once, then the changes run concurrently, in no
+        # particular order.
+        self.assertThat(self.fake_snap_command.calls[:2], Equals(
+            [['snap', 'whoami'], ['sudo', '-v']]))
+        self.assertThat(sorted(self.fake_snap_command.calls[2:]), Equals([
+            ['sudo', 'snap', 'install', 'new-fake-snap'],
             ['sudo', 'snap', 'refresh', 'fake-snap',
-             '--channel', 'classic/stable', '--classic'],
+             '--channel', 'classic/stable', '--classic']]))
+        self.assertThat(installed_snaps, Equals(
+            ['fake-snap=new', 'new-fake-snap=new']))
+
+    def test_install_multiple_snaps_sudo_failed(self):
+        self.fake_snapd.find_result = [
+            {'fake-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}},
+            {'other-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}}]
+        self.fake_snap_command.sudo_success = False
+        self.fake_snapd.snap_details_func = (
+            lambda handler, snap_name: (200, {'revision': '1'}))
+
+        snaps.install_snaps(['fake-snap', 'other-snap'])
+
+        # One at a time, in order.
+        self.assertThat(self.fake_snap_command.calls, Equals([
             ['snap', 'whoami'],
-            ['sudo', 'snap', 'install', 'new-fake-snap']]))
+            ['sudo', '-v'],
+            ['sudo', 'snap', 'install', 'fake-snap'],
+            ['sudo', 'snap', 'install', 'other-snap']]))
+
+    def test_install_multiple_snaps_logged_in(self):
+        self.fake_snapd.find_result = [
+            {'fake-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}},
+            {'other-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}}]
+        self.fake_snap_command.login('user@example.com')
+        self.fake_snapd.snap_details_func = (
+            lambda handler, snap_name: (200, {'revision': '1'}))
+
+        snaps.install_snaps(['fake-snap', 'other-snap'])
+
+        self.assertThat(sorted(self.fake_snap_command.calls[1:]), Equals([
+            ['snap', 'install', 'fake-snap'],
+            ['snap', 'install', 'other-snap']]))
+
+    def test_install_snaps_already_installed(self):
+        self.fake_snapd.find_result = [{
+            'fake-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}}]
+        self.fake_snapd.snaps_result = [
+            {'name': 'fake-snap', 'channel': 'stable', 'revision': '10'}]
+
+        installed_snaps = snaps.install_snaps(['fake-snap'])
+
+        self.assertThat(self.fake_snap_command.calls, Equals([]))
+        self.assertThat(installed_snaps, Equals(['fake-snap=10']))
+
+    def test_install_snaps_shares_session(self):
+        self.fake_snapd.find_result = [
+            {'fake-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}},
+            {'other-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}}]
+        self.fake_snapd.snaps_result = [
+            {'name': 'fake-snap', 'channel': 'stable', 'revision': '1'},
+            {'name': 'other-snap', 'channel': 'stable', 'revision': '2'}]
+
+        with mock.patch.object(snaps.requests_unixsocket.Session,
+                               '__enter__', autospec=True,
+                               side_effect=lambda session: session) as enter:
+            snaps.install_snaps(['fake-snap', 'other-snap'])
+
+        self.assertThat(enter.call_count, Equals(1))
+
+    def test_install_snaps_nothing_to_install(self):
+        with mock.patch('requests_unixsocket.Session') as session:
+            self.assertThat(snaps.install_snaps([]), Equals([]))
+
+        session.assert_not_called()
+
+    def test_install_snaps_fails(self):
+        self.fake_snapd.find_result = [{
+            'fake-snap': {'channels': {
+                'latest/stable': {'confinement': 'strict'}}}}]
+        self.fake_snap_command.install_success = False
+
+        self.assertRaises(errors.SnapInstallError,
+                          snaps.install_snaps, ['fake-snap'])
 
 
 class InstalledSnapsTestCase(SnapPackageBaseTestCase):
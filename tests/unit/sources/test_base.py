@@ -17,10 +17,12 @@
 import os
 from unittest import mock
 
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileContains, FileExists, Not
 
-from snapcraft.internal.sources import _base
-from tests import unit
+from snapcraft import file_utils
+from snapcraft.internal.cache import FileCache
+from snapcraft.internal.sources import _base, errors
+from tests import fake_servers, unit
 
 
 class TestFileBase(unit.TestCase):
@@ -82,7 +84,8 @@ class TestFileBase(unit.TestCase):
         mock_requests.get.assert_called_once_with(
             file_src.source, stream=True, allow_redirects=True)
         mock_request.raise_for_status.assert_called_once_with()
-        mock_download.assert_called_once_with(mock_request, file_src.file)
+        mock_download.assert_called_once_with(
+            mock_request, file_src.file, algorithm=None)
 
     @mock.patch(
         'snapcraft.internal.sources._base.download_urllib_source')
@@ -106,3 +109,250 @@ class TestFileBase(unit.TestCase):
             mock_urlretrieve.call_args[0][0], Equals(file_src.source))
         self.assertThat(
             mock_urlretrieve.call_args[0][1], Equals(file_src.file))
+
+    @mock.patch('snapcraft.internal.sources._base.clone_or_link')
+    @mock.patch('snapcraft.internal.sources._base.requests')
+    def test_download_cache_hit_links(self, mock_requests, mock_clone):
+        with open('cached', 'w') as f:
+            f.write('data')
+        digest = file_utils.calculate_hash('cached', algorithm='sha384')
+        cache_file = FileCache().cache(
+            filename='cached', algorithm='sha384', hash=digest)
+        file_src = _base.FileBase(
+            'http://snapcraft.io/snapcraft.yaml', 'dir',
+            source_checksum='sha384/' + digest)
+
+        file_src.download()
+
+        mock_requests.get.assert_not_called()
+        mock_clone.assert_called_once_with(cache_file, file_src.file)
+
+
+class TestExtractionDir(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.mkdir('dst')
+        with open(os.path.join('dst', 'old'), 'w') as f:
+            f.write('old')
+        with open(os.path.join('dst', 'archive'), 'w') as f:
+            f.write('archive')
+        self.archive = os.path.join('dst', 'archive')
+
+        # Keep track of the removals to wait for them.
+        self.removals = []
+        remove_in_background = _base._remove_in_background
+
+        def _remove_in_background(path):
+            thread = remove_in_background(path)
+            self.removals.append(thread)
+            return thread
+
+        patcher = mock.patch(
+            'snapcraft.internal.sources._base._remove_in_background',
+            side_effect=_remove_in_background)
+        self.remove_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _extract(self, target):
+        with open(os.path.join(target, 'new'), 'w') as f:
+            f.write('new')
+
+    def _wait_for_removal(self):
+        for thread in self.removals:
+            thread.join()
+
+    def test_clean_target_replaces_previous_tree(self):
+        with _base.extraction_dir('dst', self.archive, clean_target=True,
+                                  keep_archive=False) as target:
+            self.assertThat(target, Not(Equals(os.path.abspath('dst'))))
+            self._extract(target)
+        self._wait_for_removal()
+
+        self.assertThat(os.listdir('dst'), Equals(['new']))
+        # Only the new tree is left behind.
+        self.assertThat(os.listdir(), Equals(['dst']))
+
+    def test_clean_target_keeps_archive(self):
+        with _base.extraction_dir('dst', self.archive, clean_target=True,
+                                  keep_archive=True) as target:
+            self._extract(target)
+        self._wait_for_removal()
+
+        self.assertThat(sorted(os.listdir('dst')),
+                        Equals(['archive', 'new']))
+        self.assertThat(self.archive, FileContains('archive'))
+
+    def test_clean_target_removes_archive_outside_target(self):
+        os.rename(self.archive, 'archive')
+
+        with _base.extraction_dir('dst', 'archive', clean_target=True,
+                                  keep_archive=False) as target:
+            self._extract(target)
+        self._wait_for_removal()
+
+        self.assertThat('archive', Not(FileExists()))
+
+    def test_clean_target_without_target(self):
+        with _base.extraction_dir('missing', None, clean_target=True,
+                                  keep_archive=False) as target:
+            self._extract(target)
+
+        self.assertThat(os.path.join('missing', 'new'), FileContains('new'))
+        self.remove_mock.assert_not_called()
+
+    def test_clean_target_replaces_file(self):
+        os.rename(self.archive, 'archive')
+        os.rename('dst', 'old')
+        open('dst', 'w').close()
+
+        with _base.extraction_dir('dst', 'archive', clean_target=True,
+                                  keep_archive=True) as target:
+            self._extract(target)
+
+        self.assertThat(os.listdir('dst'), Equals(['new']))
+        self.assertThat(sorted(os.listdir()),
+                        Equals(['archive', 'dst', 'old']))
+        self.remove_mock.assert_not_called()
+
+    def test_clean_target_removes_stale_staging(self):
+        # Left behind by a killed extraction.
+        os.mkdir('.dst-abcd_123')
+        os.mkdir('.dst-efgh_456.old')
+        open(os.path.join('.dst-efgh_456.old', 'old'), 'w').close()
+        # The staging dir of another target.
+        os.mkdir('.dst-other-abcd_123')
+
+        with _base.extraction_dir('dst', self.archive, clean_target=True,
+                                  keep_archive=False) as target:
+            self._extract(target)
+        self._wait_for_removal()
+
+        self.assertThat(sorted(os.listdir()),
+                        Equals(['.dst-other-abcd_123', 'dst']))
+
+    def test_failed_extraction_keeps_previous_tree(self):
+        def _extract_and_fail():
+            with _base.extraction_dir('dst', self.archive,
+                                      clean_target=True,
+                                      keep_archive=False) as target:
+                self._extract(target)
+                raise RuntimeError('extraction failed')
+
+        self.assertRaises(RuntimeError, _extract_and_fail)
+
+        self.assertThat(sorted(os.listdir('dst')),
+                        Equals(['archive', 'old']))
+        # The staging directory is cleaned up.
+        self.assertThat(os.listdir(), Equals(['dst']))
+        self.remove_mock.assert_not_called()
+
+    def test_extract_on_top(self):
+        with _base.extraction_dir('dst', self.archive, clean_target=False,
+                                  keep_archive=False) as target:
+            self.assertThat(target, Equals('dst'))
+            self._extract(target)
+
+        self.assertThat(sorted(os.listdir('dst')), Equals(['new', 'old']))
+
+
+class TestFileBaseDownload(unit.FakeFileHTTPServerBasedTestCase):
+
+    # sha384 of 'Test fake file', the content served by the fake server.
+    digest = ('d9da1f5d54432edc8963cd817ceced83f7c6d61d350ad76d1c2f50c4935d11'
+              'd50211945ca0ecb980c04c98099085b0c3')
+
+    def setUp(self):
+        super().setUp()
+
+        os.mkdir('dir')
+        self.source = 'http://{}:{}/file'.format(*self.server.server_address)
+
+    def test_download_hashes_while_writing(self):
+        file_src = _base.FileBase(self.source, 'dir',
+                                  source_checksum='sha384/' + self.digest)
+
+        mock_calculate_hash = mock.Mock()
+        for module in ('sources._base', 'sources._checksum', 'cache._file'):
+            patcher = mock.patch(
+                'snapcraft.internal.{}.calculate_hash'.format(module),
+                new=mock_calculate_hash)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        file_src.download()
+
+        # Neither verifying nor caching read the file again.
+        mock_calculate_hash.assert_not_called()
+        cache_file = FileCache().get(algorithm='sha384', hash=self.digest)
+        with open(cache_file) as f:
+            self.assertThat(f.read(), Equals('Test fake file'))
+
+    def test_download_digest_mismatch(self):
+        file_src = _base.FileBase(self.source, 'dir',
+                                  source_checksum='sha384/' + '0' * 96)
+
+        self.assertRaises(errors.DigestDoesNotMatchError, file_src.download)
+        self.assertThat(FileCache().get(algorithm='sha384', hash='0' * 96),
+                        Equals(None))
+
+
+class TestFileBaseSegmentedDownload(unit.FakeFileHTTPServerBasedTestCase):
+
+    def setUp(self):
+        self.request_handler = type(
+            'Handler', (fake_servers.FakeRangeHTTPRequestHandler,),
+            dict(ranges=[], short_offsets=set()))
+        super().setUp()
+
+        patcher = mock.patch(
+            'snapcraft.internal.indicators._SEGMENTED_MIN_SIZE', 100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with open('file', 'wb') as f:
+            f.write(os.urandom(1000))
+        self.digest = file_utils.calculate_hash('file', algorithm='sha384')
+        os.mkdir('dir')
+
+    def test_download_in_segments(self):
+        file_src = _base.FileBase(
+            'http://{}:{}/file'.format(*self.server.server_address), 'dir',
+            source_checksum='sha384/' + self.digest)
+
+        file_src.download()
+
+        self.assertThat(len(self.request_handler.ranges), Equals(4))
+        self.assertThat(file_utils.calculate_hash(
+            file_src.file, algorithm='sha384'), Equals(self.digest))
+        self.assertThat(
+            FileCache().get(algorithm='sha384', hash=self.digest),
+            Not(Equals(None)))
+
+    def test_download_range_not_supported(self):
+        self.request_handler.ignore_ranges = True
+        file_src = _base.FileBase(
+            'http://{}:{}/file'.format(*self.server.server_address), 'dir',
+            source_checksum='sha384/' + self.digest)
+
+        file_src.download()
+
+        self.assertThat(file_utils.calculate_hash(
+            file_src.file, algorithm='sha384'), Equals(self.digest))
+
+    def test_download_discards_pending_segments(self):
+        file_src = _base.FileBase(
+            'http://{}:{}/file'.format(*self.server.server_address), 'dir')
+        with open(os.path.join('dir', 'file'), 'wb') as f:
+            f.truncate(1000)
+        open(os.path.join('dir', 'file.segments'), 'w').close()
+
+        with mock.patch(
+                'snapcraft.internal.sources._base.supports_segmented_download',
+                return_value=False):
+            file_src.download()
+
+        self.assertThat(file_utils.calculate_hash(
+            file_src.file, algorithm='sha384'), Equals(self.digest))
+        self.assertFalse(os.path.exists(file_src.file + '.segments'))
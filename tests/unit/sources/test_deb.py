@@ -14,11 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import os
+import subprocess
 import sys
+import tarfile
 from unittest import mock
 
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileContains
 
 from snapcraft.internal import sources
 from tests import unit
@@ -35,6 +38,10 @@ class TestDeb(unit.FakeFileHTTPServerBasedTestCase):
             'data.tar.gz', 'control.tar.gz', 'debian-binary']
         self.addCleanup(patcher.stop)
 
+        patcher = mock.patch('snapcraft.internal.sources._deb.decompress')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         patcher = mock.patch('tarfile.open')
         patcher.start()
         self.addCleanup(patcher.stop)
@@ -89,3 +96,42 @@ class TestDeb(unit.FakeFileHTTPServerBasedTestCase):
 
         self.assertRaises(sources.errors.InvalidDebError,
                           deb_source.provision, dst=dest_dir, keep_deb=True)
+
+
+def _make_deb(path, data_member_name, data):
+    """Write an ar archive with the members dpkg expects."""
+    members = [
+        ('debian-binary', b'2.0\n'),
+        ('control.tar.gz', b''),
+        (data_member_name, data),
+    ]
+    with open(path, 'wb') as deb:
+        deb.write(b'!<arch>\n')
+        for name, content in members:
+            deb.write('{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n'.format(
+                name, 0, 0, 0, 100644, len(content)).encode())
+            deb.write(content)
+            if len(content) % 2:
+                deb.write(b'\n')
+
+
+class TestDebExtract(unit.TestCase):
+
+    def test_extract_xz_data(self):
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w:xz') as tar:
+            info = tarfile.TarInfo('usr/share/doc/README')
+            info.size = len(b'readme')
+            tar.addfile(info, io.BytesIO(b'readme'))
+        _make_deb('test.deb', 'data.tar.xz', data.getvalue())
+        os.mkdir('dst')
+        deb_source = sources.Deb('test.deb', 'dst')
+
+        with mock.patch('subprocess.Popen',
+                        wraps=subprocess.Popen) as mock_popen:
+            deb_source.provision('dst', src='test.deb', keep_deb=True)
+
+        self.assertThat(os.path.join('dst', 'usr', 'share', 'doc', 'README'),
+                        FileContains('readme'))
+        self.assertThat(mock_popen.call_args[0][0],
+                        Equals(['xz', '-dc', '-T0']))
@@ -0,0 +1,182 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import gzip
+import io
+import lzma
+import os
+import stat
+import subprocess
+import textwrap
+from unittest import mock
+
+import fixtures
+from testtools.matchers import Equals
+
+from snapcraft.internal import errors as snapcraft_errors
+from snapcraft.internal.sources import _decompress, errors
+from tests import unit
+
+
+_DATA = b'data to decompress' * 1000
+
+
+class _FailingStream(io.RawIOBase):
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        data = self._data.read(size)
+        if not data:
+            raise ConnectionError('connection lost')
+        return data
+
+
+class DecompressTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        patcher = mock.patch('subprocess.Popen', wraps=subprocess.Popen)
+        self.mock_popen = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_file(self, data):
+        with open('compressed', 'wb') as f:
+            f.write(data)
+        return open('compressed', 'rb')
+
+    def assert_decompressed_with(self, command):
+        self.assertThat(self.mock_popen.call_args[0][0], Equals(command))
+
+    def test_xz_file(self):
+        with self.write_file(lzma.compress(_DATA)) as f:
+            with _decompress.decompress(f) as data:
+                self.assertThat(data.read(), Equals(_DATA))
+
+        self.assert_decompressed_with(['xz', '-dc', '-T0'])
+
+    def test_xz_stream(self):
+        stream = io.BytesIO(lzma.compress(_DATA))
+
+        with _decompress.decompress(stream) as data:
+            self.assertThat(data.read(), Equals(_DATA))
+
+        self.assert_decompressed_with(['xz', '-dc', '-T0'])
+
+    def test_partial_read_drains_decompressor(self):
+        stream = io.BytesIO(lzma.compress(_DATA))
+
+        with _decompress.decompress(stream) as data:
+            data.read(10)
+
+        self.assertThat(stream.read(), Equals(b''))
+
+    def test_gzip_with_pigz(self):
+        # gzip takes the same options for decompressing.
+        bin_dir = os.path.join(self.path, 'bin')
+        os.mkdir(bin_dir)
+        pigz = os.path.join(bin_dir, 'pigz')
+        with open(pigz, 'w') as f:
+            f.write(textwrap.dedent("""\
+                #!/bin/sh
+                exec gzip "$@"
+                """))
+        os.chmod(pigz, os.stat(pigz).st_mode | stat.S_IEXEC)
+        self.useFixture(fixtures.EnvironmentVariable(
+            'PATH', '{}:{}'.format(bin_dir, os.environ['PATH'])))
+        stream = io.BytesIO(gzip.compress(_DATA))
+
+        with _decompress.decompress(stream) as data:
+            self.assertThat(data.read(), Equals(_DATA))
+
+        self.assert_decompressed_with(['pigz', '-dc'])
+
+    def test_without_decompressor_file_is_left_alone(self):
+        compressed = gzip.compress(_DATA)
+
+        with mock.patch('shutil.which', return_value=None):
+            with self.write_file(compressed) as f:
+                with _decompress.decompress(f) as data:
+                    self.assertThat(data.read(), Equals(compressed))
+
+        self.mock_popen.assert_not_called()
+
+    def test_without_decompressor_stream_is_left_alone(self):
+        compressed = lzma.compress(_DATA)
+
+        with mock.patch('shutil.which', return_value=None):
+            with _decompress.decompress(io.BytesIO(compressed)) as data:
+                self.assertThat(data.read(3), Equals(compressed[:3]))
+                self.assertThat(data.read(), Equals(compressed[3:]))
+
+        self.mock_popen.assert_not_called()
+
+    def test_uncompressed_stream(self):
+        with _decompress.decompress(io.BytesIO(_DATA)) as data:
+            self.assertThat(data.read(), Equals(_DATA))
+
+        self.mock_popen.assert_not_called()
+
+    def test_zstd_without_decompressor(self):
+        stream = io.BytesIO(b'\x28\xb5\x2f\xfd' + _DATA)
+
+        with mock.patch('shutil.which', return_value=None), mock.patch(
+                'snapcraft.internal.sources._decompress.zstandard', None):
+            raised = self.assertRaises(
+                snapcraft_errors.MissingCommandError,
+                _decompress.decompress(stream).__enter__)
+
+        self.assertThat(raised.required_commands, Equals(['zstd']))
+
+    def test_zstd_with_zstandard(self):
+        mock_zstandard = self.useFixture(fixtures.MockPatch(
+            'snapcraft.internal.sources._decompress.zstandard')).mock
+        mock_reader = (mock_zstandard.ZstdDecompressor.return_value.
+                       stream_reader)
+        stream = io.BytesIO(b'\x28\xb5\x2f\xfd' + _DATA)
+
+        with mock.patch('shutil.which', return_value=None):
+            with _decompress.decompress(stream) as data:
+                self.assertThat(data, Equals(mock_reader.return_value))
+
+        wrapped = mock_reader.call_args[0][0]
+        self.assertThat(wrapped.read(), Equals(b'\x28\xb5\x2f\xfd' + _DATA))
+
+    def test_corrupt_data(self):
+        stream = io.BytesIO(lzma.compress(_DATA)[:100] + b'garbage')
+
+        def _read_all():
+            with _decompress.decompress(stream) as data:
+                data.read()
+
+        raised = self.assertRaises(errors.DecompressionError, _read_all)
+
+        self.assertThat(raised.command, Equals('xz -dc -T0'))
+        self.assertThat(raised.exit_code, Equals(1))
+
+    def test_stream_error_is_raised(self):
+        stream = _FailingStream(lzma.compress(_DATA))
+
+        def _read_all():
+            with _decompress.decompress(stream) as data:
+                data.read()
+
+        raised = self.assertRaises(ConnectionError, _read_all)
+
+        self.assertThat(str(raised), Equals('connection lost'))
@@ -14,14 +14,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import glob
 import os
 import shutil
 from subprocess import CalledProcessError
 from unittest import mock
 
-from testtools.matchers import Equals
+import fixtures
+from testtools.matchers import DirExists, Equals, FileExists, HasLength, Not
 
 from snapcraft.internal import sources
+from snapcraft.internal.cache import GitMirrorCache
 from tests import unit
 from tests.subprocess_utils import (
     call,
@@ -40,14 +43,20 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
         self.mock_get_source_details.return_value = ""
         self.addCleanup(patcher.stop)
 
+        patcher = mock.patch('snapcraft.internal.cache.GitMirrorCache.update')
+        self.mock_update_mirror = patcher.start()
+        self.mock_update_mirror.return_value.__enter__.return_value = (
+            'mirror_dir')
+        self.addCleanup(patcher.stop)
+
     def test_pull(self):
         git = sources.Git('git://my-source', 'source_dir')
 
         git.pull()
 
         self.mock_run.assert_called_once_with(
-            ['git', 'clone', '--recursive', 'git://my-source',
-             'source_dir'])
+            ['git', 'clone', '--recursive', '--reference', 'mirror_dir',
+             '--dissociate', 'git://my-source', 'source_dir'])
 
     def test_pull_with_depth(self):
         git = sources.Git('git://my-source', 'source_dir', source_depth=2)
@@ -58,6 +67,13 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
             ['git', 'clone', '--recursive', '--depth', '2', 'git://my-source',
              'source_dir'])
 
+    def test_pull_with_depth_without_mirror(self):
+        git = sources.Git('git://my-source', 'source_dir', source_depth=2)
+
+        git.pull()
+
+        self.mock_update_mirror.assert_not_called()
+
     def test_pull_branch(self):
         git = sources.Git('git://my-source', 'source_dir',
                           source_branch='my-branch')
@@ -65,7 +81,8 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
 
         self.mock_run.assert_called_once_with(
             ['git', 'clone', '--recursive', '--branch',
-             'my-branch', 'git://my-source', 'source_dir'])
+             'my-branch', '--reference', 'mirror_dir', '--dissociate',
+             'git://my-source', 'source_dir'])
 
     def test_pull_tag(self):
         git = sources.Git('git://my-source', 'source_dir', source_tag='tag')
@@ -73,6 +90,7 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
 
         self.mock_run.assert_called_once_with(
             ['git', 'clone', '--recursive', '--branch', 'tag',
+             '--reference', 'mirror_dir', '--dissociate',
              'git://my-source', 'source_dir'])
 
     def test_pull_commit(self):
@@ -82,12 +100,143 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
         git.pull()
 
         self.mock_run.assert_has_calls([
-            mock.call(['git', 'clone', '--recursive', 'git://my-source',
+            mock.call(['git', '-C', 'source_dir', 'init']),
+            mock.call(['git', '-C', 'source_dir', 'remote', 'add', 'origin',
+                       'git://my-source']),
+            mock.call(['git', '-C', 'source_dir', 'fetch', '--depth', '1',
+                       'origin', '2514f9533ec9b45d07883e10a561b248497a8e3c']),
+            mock.call(['git', '-C', 'source_dir', 'checkout',
+                       '2514f9533ec9b45d07883e10a561b248497a8e3c']),
+            mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
+                       '--init', '--recursive', '--force']),
+        ])
+        self.mock_update_mirror.assert_not_called()
+
+    def test_pull_commit_refused(self):
+        def refuse_fetch(command, **kwargs):
+            if 'fetch' in command:
+                raise CalledProcessError(128, command)
+        self.mock_run.side_effect = refuse_fetch
+
+        git = sources.Git(
+            'git://my-source', 'source_dir',
+            source_commit='2514f9533ec9b45d07883e10a561b248497a8e3c')
+        git.pull()
+
+        self.mock_run.assert_has_calls([
+            mock.call(['git', 'clone', '--recursive', '--reference',
+                       'mirror_dir', '--dissociate', 'git://my-source',
                        'source_dir']),
             mock.call(['git', '-C', 'source_dir', 'checkout',
                        '2514f9533ec9b45d07883e10a561b248497a8e3c'])
         ])
 
+    def test_pull_short_commit(self):
+        git = sources.Git('git://my-source', 'source_dir',
+                          source_commit='2514f95')
+        git.pull()
+
+        self.mock_run.assert_has_calls([
+            mock.call(['git', 'clone', '--recursive', '--reference',
+                       'mirror_dir', '--dissociate', 'git://my-source',
+                       'source_dir']),
+            mock.call(['git', '-C', 'source_dir', 'checkout', '2514f95'])
+        ])
+
+    def test_pull_commit_with_existing_mirror(self):
+        os.makedirs(GitMirrorCache().get_mirror_path('git://my-source'))
+        git = sources.Git(
+            'git://my-source', 'source_dir',
+            source_commit='2514f9533ec9b45d07883e10a561b248497a8e3c')
+        git.pull()
+
+        self.mock_run.assert_has_calls([
+            mock.call(['git', 'clone', '--recursive', '--reference',
+                       'mirror_dir', '--dissociate', 'git://my-source',
+                       'source_dir']),
+            mock.call(['git', '-C', 'source_dir', 'checkout',
+                       '2514f9533ec9b45d07883e10a561b248497a8e3c'])
+        ])
+
+    def test_pull_existing_pinned_commit(self):
+        os.makedirs(os.path.join('source_dir', '.git'))
+        open(os.path.join('source_dir', '.git', 'shallow'), 'w').close()
+        self.mock_path_exists.return_value = True
+
+        git = sources.Git(
+            'git://my-source', 'source_dir',
+            source_commit='2514f9533ec9b45d07883e10a561b248497a8e3c')
+        git.pull()
+
+        self.mock_run.assert_has_calls([
+            mock.call(['git', '-C', 'source_dir', 'fetch', '--depth', '1',
+                       'origin', '2514f9533ec9b45d07883e10a561b248497a8e3c']),
+            mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
+                       '2514f9533ec9b45d07883e10a561b248497a8e3c']),
+            mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
+                       '--init', '--recursive', '--force']),
+        ])
+        self.mock_update_mirror.assert_not_called()
+
+    def test_pull_partial_clone(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_GIT_PARTIAL_CLONE', 'y'))
+        git = sources.Git('git://my-source', 'source_dir')
+
+        git.pull()
+
+        self.mock_run.assert_called_once_with(
+            ['git', 'clone', '--recursive', '--filter=blob:none',
+             'git://my-source', 'source_dir'])
+        self.mock_update_mirror.assert_not_called()
+
+    def test_pull_commit_partial_clone(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_GIT_PARTIAL_CLONE', 'y'))
+        git = sources.Git(
+            'git://my-source', 'source_dir',
+            source_commit='2514f9533ec9b45d07883e10a561b248497a8e3c')
+
+        git.pull()
+
+        self.mock_run.assert_any_call(
+            ['git', '-C', 'source_dir', 'fetch', '--depth', '1',
+             '--filter=blob:none', 'origin',
+             '2514f9533ec9b45d07883e10a561b248497a8e3c'])
+
+    def test_pull_submodule_jobs(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_GIT_SUBMODULE_JOBS', '4'))
+        git = sources.Git('git://my-source', 'source_dir')
+
+        git.pull()
+
+        self.mock_run.assert_called_once_with(
+            ['git', 'clone', '--recursive', '--jobs', '4', '--reference',
+             'mirror_dir', '--dissociate', 'git://my-source', 'source_dir'])
+
+    def test_pull_existing_submodule_jobs(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_GIT_SUBMODULE_JOBS', '4'))
+        self.mock_path_exists.return_value = True
+        git = sources.Git('git://my-source', 'source_dir')
+
+        git.pull()
+
+        self.mock_run.assert_called_with(
+            ['git', '-C', 'source_dir', 'submodule', 'update',
+             '--recursive', '--force', '--jobs', '4'])
+
+    def test_invalid_submodule_jobs(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_GIT_SUBMODULE_JOBS', 'many'))
+
+        raised = self.assertRaises(
+            sources.errors.InvalidGitSubmoduleJobsError,
+            sources.Git, 'git://my-source', 'source_dir')
+
+        self.assertThat(raised.jobs, Equals('many'))
+
     def test_pull_existing(self):
         self.mock_path_exists.return_value = True
 
@@ -95,14 +244,39 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
         git.pull()
 
         self.mock_run.assert_has_calls([
-            mock.call(['git', '-C', 'source_dir', 'fetch',
-                       '--prune', '--recurse-submodules=yes']),
+            mock.call(['git', '-C', 'source_dir', 'fetch', '--prune',
+                       '--recurse-submodules=yes', 'mirror_dir',
+                       '+refs/heads/*:refs/remotes/origin/*',
+                       '+refs/tags/*:refs/tags/*']),
             mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
                        'origin/master']),
             mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
                        '--recursive', '--force'])
         ])
 
+    def test_pull_local_source_without_mirror(self):
+        git = sources.Git('my-source', 'source_dir')
+
+        git.pull()
+
+        self.mock_update_mirror.assert_not_called()
+        self.mock_run.assert_called_once_with(
+            ['git', 'clone', '--recursive', 'my-source', 'source_dir'])
+
+    def test_pull_existing_local_source_without_mirror(self):
+        self.mock_path_exists.return_value = True
+
+        git = sources.Git('my-source', 'source_dir')
+        git.pull()
+
+        self.mock_update_mirror.assert_not_called()
+        self.mock_run.assert_has_calls([
+            mock.call(['git', '-C', 'source_dir', 'fetch', '--prune',
+                       '--recurse-submodules=yes']),
+            mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
+                       'origin/master']),
+        ])
+
     def test_pull_existing_with_tag(self):
         self.mock_path_exists.return_value = True
 
@@ -111,7 +285,9 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
 
         self.mock_run.assert_has_calls([
             mock.call(['git', '-C', 'source_dir', 'fetch', '--prune',
-                       '--recurse-submodules=yes']),
+                       '--recurse-submodules=yes', 'mirror_dir',
+                       '+refs/heads/*:refs/remotes/origin/*',
+                       '+refs/tags/*:refs/tags/*']),
             mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
                        'refs/tags/tag']),
             mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
@@ -128,7 +304,9 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
 
         self.mock_run.assert_has_calls([
             mock.call(['git', '-C', 'source_dir', 'fetch', '--prune',
-                       '--recurse-submodules=yes']),
+                       '--recurse-submodules=yes', 'mirror_dir',
+                       '+refs/heads/*:refs/remotes/origin/*',
+                       '+refs/tags/*:refs/tags/*']),
             mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
                        '2514f9533ec9b45d07883e10a561b248497a8e3c']),
             mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
@@ -144,7 +322,9 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
 
         self.mock_run.assert_has_calls([
             mock.call(['git', '-C', 'source_dir', 'fetch', '--prune',
-                       '--recurse-submodules=yes']),
+                       '--recurse-submodules=yes', 'mirror_dir',
+                       '+refs/heads/*:refs/remotes/origin/*',
+                       '+refs/tags/*:refs/tags/*']),
             mock.call(['git', '-C', 'source_dir', 'reset', '--hard',
                        'refs/heads/my-branch']),
             mock.call(['git', '-C', 'source_dir', 'submodule', 'update',
@@ -350,6 +530,79 @@ class TestGitConflicts(GitBaseTestCase):
                                  'fake 1')
 
 
+class GitMirrorTestCase(GitBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.remote = os.path.join(self.path, 'remote.git')
+        call(['git', 'init', '--bare', self.remote])
+        self.source = 'file://' + self.remote
+        self.clone_repo(self.remote, os.path.join(self.path, 'work'))
+        self.add_file('file-1', '1', 'first')
+        call(['git', 'push', self.remote, 'HEAD:master'])
+        os.chdir(self.path)
+
+    def push_file(self, filename):
+        os.chdir(os.path.join(self.path, 'work'))
+        self.add_file(filename, filename, filename)
+        call(['git', 'push', self.remote, 'HEAD:master'])
+        os.chdir(self.path)
+
+    def test_clone_uses_mirror(self):
+        sources.Git(self.source, 'src', silent=True).pull()
+
+        mirror = GitMirrorCache().get_mirror_path(self.source)
+        self.assertThat(os.path.join('src', 'file-1'), FileExists())
+        self.assertThat(
+            call_with_output(['git', '-C', mirror, 'rev-parse', 'master']),
+            Equals(call_with_output(['git', '-C', 'src', 'rev-parse',
+                                     'HEAD'])))
+        # The clone does not depend on the mirror.
+        self.assertThat(
+            os.path.join('src', '.git', 'objects', 'info', 'alternates'),
+            Not(FileExists()))
+
+    def test_clones_share_mirror(self):
+        sources.Git(self.source, 'src1', silent=True).pull()
+        self.push_file('file-2')
+
+        sources.Git(self.source, 'src2', silent=True).pull()
+
+        self.assertThat(os.path.join('src2', 'file-2'), FileExists())
+        self.assertThat(glob.glob(os.path.join(
+            GitMirrorCache().mirrors_dir, '*.git')), HasLength(1))
+
+    def test_pull_existing_fetches_into_mirror(self):
+        sources.Git(self.source, 'src', silent=True).pull()
+        self.push_file('file-2')
+
+        sources.Git(self.source, 'src', silent=True).pull()
+
+        self.assertThat(os.path.join('src', 'file-2'), FileExists())
+        mirror = GitMirrorCache().get_mirror_path(self.source)
+        self.assertThat(
+            call_with_output(['git', '-C', mirror, 'rev-parse', 'master']),
+            Equals(call_with_output(['git', '-C', 'src', 'rev-parse',
+                                     'HEAD'])))
+
+    def test_pull_commit_fetches_commit_only(self):
+        commit = call_with_output(['git', '-C', self.remote, 'rev-parse',
+                                   'master'])
+        self.push_file('file-2')
+
+        sources.Git(self.source, 'src', silent=True,
+                    source_commit=commit).pull()
+
+        self.assertThat(
+            call_with_output(['git', '-C', 'src', 'rev-parse', 'HEAD']),
+            Equals(commit))
+        self.assertThat(os.path.join('src', 'file-2'), Not(FileExists()))
+        self.assertThat(os.path.join('src', '.git', 'shallow'), FileExists())
+        self.assertThat(GitMirrorCache().get_mirror_path(self.source),
+                        Not(DirExists()))
+
+
 class GitDetailsTestCase(GitBaseTestCase):
 
     def setUp(self):
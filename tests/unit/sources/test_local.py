@@ -16,11 +16,15 @@
 
 import copy
 import os
+import shutil
 from unittest import mock
 from testtools.matchers import (
     DirExists,
     Equals,
-    FileExists
+    FileContains,
+    FileExists,
+    Is,
+    Not,
 )
 
 from snapcraft.internal import common
@@ -126,6 +130,7 @@ class TestLocal(unit.TestCase):
         open(os.path.join('src', 'snapcraft.yaml'), 'w').close()
         open(os.path.join('src', '.snapcraft.yaml'), 'w').close()
         open(os.path.join('src', 'foo.snap'), 'w').close()
+        open(os.path.join('src', 'foo.snap.digest'), 'w').close()
 
         # Now make some real files
         os.makedirs(os.path.join('src', 'dir'))
@@ -146,6 +151,8 @@ class TestLocal(unit.TestCase):
             os.path.exists(os.path.join('destination', '.snapcraft.yaml')))
         self.assertFalse(
             os.path.exists(os.path.join('destination', 'foo.snap')))
+        self.assertFalse(
+            os.path.exists(os.path.join('destination', 'foo.snap.digest')))
 
         # Verify that the real stuff made it in.
         self.assertFalse(os.path.islink('destination'))
@@ -178,6 +185,133 @@ class TestLocal(unit.TestCase):
         self.assertTrue(sources._source_handler['local'] is sources.Local)
 
 
+class TestLocalUpdate(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs(os.path.join('src', 'dir'))
+        with open(os.path.join('src', 'dir', 'file'), 'w') as f:
+            f.write('file')
+        with open(os.path.join('src', 'other'), 'w') as f:
+            f.write('other')
+
+        self.local = sources.Local('src', 'destination')
+        self.local.pull()
+
+    def _assert_changes(self, changes, added=set(), updated=set(),
+                        removed=set()):
+        self.expectThat(changes.added, Equals(added))
+        self.expectThat(changes.updated, Equals(updated))
+        self.expectThat(changes.removed, Equals(removed))
+
+    def _replace(self, path, content):
+        # Replace rather than write so the hardlink is not modified.
+        os.remove(path)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def test_first_pull_adds_everything(self):
+        self._assert_changes(
+            self.local.changes,
+            added={'dir', os.path.join('dir', 'file'), 'other'})
+        self.assertThat(
+            '.destination.manifest', FileExists())
+
+    def test_pack_artefacts_are_not_changes(self):
+        open(os.path.join('src', 'foo.snap'), 'w').close()
+        open(os.path.join('src', 'foo.snap.digest'), 'w').close()
+
+        self._assert_changes(self.local.get_changes())
+
+    def test_pull_without_changes_does_not_link(self):
+        with mock.patch('snapcraft.file_utils.link_or_copy') as mock_link:
+            self.local.pull()
+
+        mock_link.assert_not_called()
+        self._assert_changes(self.local.changes)
+
+    def test_pull_updates_changed_file(self):
+        self._replace(os.path.join('src', 'other'), 'changed')
+
+        self._assert_changes(self.local.get_changes(), updated={'other'})
+        self.local.pull()
+
+        self._assert_changes(self.local.changes, updated={'other'})
+        self.assertThat(
+            os.path.join('destination', 'other'), FileContains('changed'))
+
+    def test_pull_adds_new_entries(self):
+        os.mkdir(os.path.join('src', 'new'))
+        open(os.path.join('src', 'new', 'file'), 'w').close()
+
+        self.local.pull()
+
+        self._assert_changes(
+            self.local.changes, added={'new', os.path.join('new', 'file')})
+        self.assertThat(
+            os.path.join('destination', 'new', 'file'), FileExists())
+
+    def test_pull_removes_deleted_entries(self):
+        os.remove(os.path.join('src', 'other'))
+        os.remove(os.path.join('src', 'dir', 'file'))
+        os.rmdir(os.path.join('src', 'dir'))
+
+        self.local.pull()
+
+        self._assert_changes(
+            self.local.changes,
+            removed={'dir', os.path.join('dir', 'file'), 'other'})
+        self.expectThat(
+            os.path.join('destination', 'other'), Not(FileExists()))
+        self.expectThat(
+            os.path.join('destination', 'dir'), Not(DirExists()))
+
+    def test_pull_keeps_entries_not_from_the_source(self):
+        open(os.path.join('destination', 'dir', 'generated'), 'w').close()
+        os.remove(os.path.join('src', 'dir', 'file'))
+        os.rmdir(os.path.join('src', 'dir'))
+
+        self.local.pull()
+
+        self.assertThat(
+            os.path.join('destination', 'dir', 'generated'), FileExists())
+
+    def test_pull_replaces_file_with_directory(self):
+        os.remove(os.path.join('src', 'other'))
+        os.mkdir(os.path.join('src', 'other'))
+        open(os.path.join('src', 'other', 'file'), 'w').close()
+
+        self.local.pull()
+
+        self._assert_changes(
+            self.local.changes, added={os.path.join('other', 'file')},
+            updated={'other'})
+        self.assertThat(
+            os.path.join('destination', 'other', 'file'), FileExists())
+
+    def test_get_changes_without_pull(self):
+        local = sources.Local('src', 'other-destination')
+
+        self.assertThat(local.get_changes(), Is(None))
+        self.assertFalse(local.is_pulled())
+
+    def test_not_pulled_if_source_dir_recreated(self):
+        self.assertTrue(self.local.is_pulled())
+
+        shutil.rmtree('destination')
+        os.mkdir('destination')
+
+        self.assertFalse(self.local.is_pulled())
+
+    def test_not_pulled_if_source_changes(self):
+        os.mkdir('other-src')
+
+        local = sources.Local('other-src', 'destination')
+
+        self.assertFalse(local.is_pulled())
+
+
 class TestLocalIgnores(unit.TestCase):
     """Verify that the snapcraft root dir does not get copied into itself."""
 
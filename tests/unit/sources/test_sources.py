@@ -29,6 +29,8 @@ class TestUri(unit.TestCase):
         ('tar.gz', dict(result='tar', source='https://golang.tar.xz')),
         ('tar.bz2', dict(result='tar', source='https://golang.tar.bz2')),
         ('tgz', dict(result='tar', source='https://golang.tgz')),
+        ('tar.zst', dict(result='tar', source='https://golang.tar.zst')),
+        ('tzst', dict(result='tar', source='https://golang.tzst')),
         ('tar', dict(result='tar', source='https://golang.tar')),
         ('git:', dict(result='git',
                       source='git://github.com:snapcore/snapcraft.git')),
@@ -14,15 +14,26 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import os
+import subprocess
 import tarfile
 import fixtures
 from unittest import mock
 
 import requests
-from testtools.matchers import Equals
+from testtools.matchers import (
+    DirExists,
+    Equals,
+    FileContains,
+    FileExists,
+    Not,
+)
 
+from snapcraft import file_utils
 from snapcraft.internal import sources
+from snapcraft.internal.cache import FileCache
+from snapcraft.internal.sources import errors
 from tests import unit
 
 
@@ -37,41 +48,6 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
         self.useFixture(fixtures.EnvironmentVariable('TERM', self.term))
         super().setUp()
 
-    @mock.patch('snapcraft.sources.Tar.provision')
-    def test_pull_tarball_must_download_to_sourcedir(self, mock_prov):
-        plugin_name = 'test_plugin'
-        dest_dir = os.path.join('parts', plugin_name, 'src')
-        os.makedirs(dest_dir)
-        tar_file_name = 'test.tar'
-        source = 'http://{}:{}/{file_name}'.format(
-            *self.server.server_address, file_name=tar_file_name)
-        tar_source = sources.Tar(source, dest_dir)
-
-        tar_source.pull()
-
-        source_file = os.path.join(dest_dir, tar_file_name)
-        mock_prov.assert_called_once_with(dest_dir, src=source_file)
-        with open(os.path.join(dest_dir, tar_file_name), 'r') as tar_file:
-            self.assertThat(tar_file.read(), Equals('Test fake file'))
-
-    @mock.patch('snapcraft.sources.Tar.provision')
-    def test_pull_twice_downloads_once(self, mock_prov):
-        """If a source checksum is defined, the cache should be tried first."""
-        source = 'http://{}:{}/{file_name}'.format(
-            *self.server.server_address, file_name='test.tar')
-        expected_checksum = ('sha384/d9da1f5d54432edc8963cd817ceced83f7c6d61d3'
-                             '50ad76d1c2f50c4935d11d50211945ca0ecb980c04c98099'
-                             '085b0c3')
-        tar_source = sources.Tar(source, self.path,
-                                 source_checksum=expected_checksum)
-
-        tar_source.pull()
-        with mock.patch(
-            'requests.get',
-                new=mock.Mock(wraps=requests.get)) as download_spy:
-            tar_source.pull()
-            self.assertThat(download_spy.call_count, Equals(0))
-
     def test_strip_common_prefix(self):
         # Create tar file for testing
         os.makedirs(os.path.join('src', 'test_prefix'))
@@ -148,5 +124,192 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
         self.assertTrue(os.path.exists(os.path.join('dst', 'test.txt')))
         self.assertTrue(os.path.exists(os.path.join('dst', 'link.txt')))
 
+    def test_pull_xz(self):
+        os.mkdir('src')
+        _make_tarball(os.path.join('src', 'test.tar.xz'),
+                      ['project/', 'project/README'], mode='w:xz')
+
+        tar_source = sources.Tar(os.path.join('src', 'test.tar.xz'), 'dst')
+        os.mkdir('dst')
+        with mock.patch('subprocess.Popen',
+                        wraps=subprocess.Popen) as mock_popen:
+            tar_source.pull()
+
+        self.assertThat(os.path.join('dst', 'README'),
+                        FileContains('project/README'))
+        self.assertThat(mock_popen.call_args[0][0],
+                        Equals(['xz', '-dc', '-T0']))
+
+    def test_provision_replaces_previous_tree(self):
+        os.makedirs('dst')
+        open(os.path.join('dst', 'stale'), 'w').close()
+        _make_tarball(os.path.join('dst', 'test.tar.gz'),
+                      ['project/', 'project/README'])
+
+        tar_source = sources.Tar('test.tar.gz', 'dst')
+        tar_source.provision('dst', keep_tarball=True)
+
+        self.assertThat(sorted(os.listdir('dst')),
+                        Equals(['README', 'test.tar.gz']))
+
+    def test_failed_provision_keeps_previous_tree(self):
+        os.makedirs('dst')
+        open(os.path.join('dst', 'stale'), 'w').close()
+        with open(os.path.join('dst', 'test.tar'), 'wb') as f:
+            f.write(b'not a tarball')
+
+        tar_source = sources.Tar('test.tar', 'dst')
+        self.assertRaises(tarfile.ReadError, tar_source.provision, 'dst')
+
+        self.assertThat(sorted(os.listdir('dst')),
+                        Equals(['stale', 'test.tar']))
+
     def test_has_source_handler_entry(self):
         self.assertTrue(sources._source_handler['tar'] is sources.Tar)
+
+
+def _make_tarball(path, files, mode='w:gz'):
+    with tarfile.open(path, mode) as tar:
+        for name in files:
+            if name.endswith('/'):
+                info = tarfile.TarInfo(name.rstrip('/'))
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                tar.addfile(info)
+            else:
+                data = name.encode()
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+
+class TestTarStream(unit.FakeDirectoryHTTPServerBasedTestCase):
+
+    scenarios = [
+        ('TERM=dumb', dict(term='dumb')),
+        ('TERM=vt100', dict(term='vt100')),
+    ]
+
+    def setUp(self):
+        self.useFixture(fixtures.EnvironmentVariable('TERM', self.term))
+        super().setUp()
+
+        self.dest_dir = os.path.join('parts', 'test_plugin', 'src')
+        os.makedirs(self.dest_dir)
+
+    def _get_source(self, file_name):
+        return 'http://{}:{}/{file_name}'.format(
+            *self.server.server_address, file_name=file_name)
+
+    @mock.patch('snapcraft.sources.Tar.provision')
+    def test_pull_extracts_while_downloading(self, mock_prov):
+        _make_tarball('test.tar.gz', [
+            'project-1.0/', 'project-1.0/README', 'project-1.0/src/main.c'])
+        tar_source = sources.Tar(self._get_source('test.tar.gz'),
+                                 self.dest_dir)
+
+        tar_source.pull()
+
+        mock_prov.assert_not_called()
+        self.assertThat(sorted(os.listdir(self.dest_dir)),
+                        Equals(['README', 'src']))
+        self.assertThat(os.path.join(self.dest_dir, 'src', 'main.c'),
+                        FileContains('project-1.0/src/main.c'))
+        # Nothing is cached without a checksum to key it on.
+        self.assertThat(FileCache().file_cache, Not(DirExists()))
+
+    def test_pull_with_checksum_caches_tarball(self):
+        _make_tarball('test.tar.gz', ['project/', 'project/README'])
+        digest = file_utils.calculate_hash('test.tar.gz', algorithm='sha384')
+        tar_source = sources.Tar(self._get_source('test.tar.gz'),
+                                 self.dest_dir,
+                                 source_checksum='sha384/' + digest)
+
+        tar_source.pull()
+
+        self.assertThat(os.path.join(self.dest_dir, 'README'),
+                        FileContains('project/README'))
+        cached_file = FileCache().get(algorithm='sha384', hash=digest)
+        self.assertThat(cached_file, FileExists())
+        self.assertThat(file_utils.calculate_hash(
+            cached_file, algorithm='sha384'), Equals(digest))
+        # Only the cached copy is left behind.
+        self.assertThat(os.listdir(os.path.dirname(cached_file)),
+                        Equals([digest]))
+
+    def test_pull_xz_with_checksum(self):
+        _make_tarball('test.tar.xz', ['project/', 'project/README'],
+                      mode='w:xz')
+        digest = file_utils.calculate_hash('test.tar.xz', algorithm='sha384')
+        tar_source = sources.Tar(self._get_source('test.tar.xz'),
+                                 self.dest_dir,
+                                 source_checksum='sha384/' + digest)
+
+        tar_source.pull()
+
+        self.assertThat(os.path.join(self.dest_dir, 'README'),
+                        FileContains('project/README'))
+        self.assertThat(FileCache().get(algorithm='sha384', hash=digest),
+                        FileExists())
+
+    def test_pull_twice_downloads_once(self):
+        """If a source checksum is defined, the cache should be tried first."""
+        _make_tarball('test.tar.gz', ['project/', 'project/README'])
+        digest = file_utils.calculate_hash('test.tar.gz', algorithm='sha384')
+        tar_source = sources.Tar(self._get_source('test.tar.gz'),
+                                 self.dest_dir,
+                                 source_checksum='sha384/' + digest)
+
+        tar_source.pull()
+        with mock.patch(
+            'requests.get',
+                new=mock.Mock(wraps=requests.get)) as download_spy:
+            tar_source.pull()
+            self.assertThat(download_spy.call_count, Equals(0))
+
+        self.assertThat(os.listdir(self.dest_dir), Equals(['README']))
+
+    def test_pull_checksum_mismatch(self):
+        _make_tarball('test.tar.gz', ['project/', 'project/README'])
+        tar_source = sources.Tar(self._get_source('test.tar.gz'),
+                                 self.dest_dir,
+                                 source_checksum='sha384/' + '0' * 96)
+
+        self.assertRaises(errors.DigestDoesNotMatchError, tar_source.pull)
+        self.assertThat(
+            FileCache().get(algorithm='sha384', hash='0' * 96), Equals(None))
+
+    def test_pull_strips_prefix_shortened_midway(self):
+        # The prefix guessed from the first member turns out too long once
+        # the last member comes along.
+        _make_tarball('test.tar', [
+            'top/lib/one', 'top/lib/sub/two', 'top/bin/three'], mode='w')
+        tar_source = sources.Tar(self._get_source('test.tar'), self.dest_dir)
+
+        tar_source.pull()
+
+        self.assertThat(sorted(os.listdir(self.dest_dir)),
+                        Equals(['bin', 'lib']))
+        self.assertThat(os.path.join(self.dest_dir, 'lib', 'one'),
+                        FileContains('top/lib/one'))
+        self.assertThat(os.path.join(self.dest_dir, 'lib', 'sub', 'two'),
+                        FileContains('top/lib/sub/two'))
+        self.assertThat(os.path.join(self.dest_dir, 'bin', 'three'),
+                        FileContains('top/bin/three'))
+
+    def test_pull_without_common_prefix(self):
+        _make_tarball('test.tar', ['one/file', 'two/file'], mode='w')
+        tar_source = sources.Tar(self._get_source('test.tar'), self.dest_dir)
+
+        tar_source.pull()
+
+        self.assertThat(os.path.join(self.dest_dir, 'one', 'file'),
+                        FileContains('one/file'))
+        self.assertThat(os.path.join(self.dest_dir, 'two', 'file'),
+                        FileContains('two/file'))
+
+    def test_pull_not_found(self):
+        tar_source = sources.Tar(self._get_source('missing.tar'),
+                                 self.dest_dir)
+
+        self.assertRaises(requests.exceptions.HTTPError, tar_source.pull)
@@ -17,6 +17,7 @@
 import json
 import logging
 import os
+import shutil
 import tempfile
 from textwrap import dedent
 from unittest import mock
@@ -30,6 +31,7 @@ from snapcraft import (
     storeapi,
     ProjectOptions,
 )
+from snapcraft.internal import errors as snapcraft_errors
 from snapcraft.storeapi import (
     errors,
     constants
@@ -203,6 +205,79 @@ class DownloadTestCase(StoreTestCase):
             'Successfully downloaded test-snap at {}'.format(download_path),
             self.fake_logger.output)
 
+    @mock.patch('snapcraft.storeapi._store_client.download_segmented')
+    @mock.patch(
+        'snapcraft.storeapi._store_client.supports_segmented_download',
+        return_value=True)
+    def test_download_snap_in_segments(self, mock_supports, mock_download):
+        def fake_download(uri, destination, size, *, session):
+            shutil.copyfile(os.path.join(
+                os.path.dirname(tests.__file__), 'data', 'test-snap.snap'),
+                destination)
+        mock_download.side_effect = fake_download
+        self.client.login('dummy', 'test correct password')
+        download_path = os.path.join(self.path, 'test-snap.snap')
+
+        self.client.download('test-snap', 'test-channel', download_path)
+
+        mock_download.assert_called_once_with(
+            mock.ANY, download_path, mock.ANY,
+            session=self.client.cpi.session)
+
+    @mock.patch('snapcraft.storeapi._store_client.download_segmented')
+    @mock.patch(
+        'snapcraft.storeapi._store_client.supports_segmented_download',
+        return_value=True)
+    def test_download_snap_range_not_supported(self, mock_supports,
+                                               mock_download):
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+        mock_download.side_effect = (
+            snapcraft_errors.DownloadRangeNotSupportedError('url', 200))
+        self.client.login('dummy', 'test correct password')
+        download_path = os.path.join(self.path, 'test-snap.snap')
+
+        self.client.download('test-snap', 'test-channel', download_path)
+
+        self.assertIn(
+            'Successfully downloaded test-snap at {}'.format(download_path),
+            self.fake_logger.output)
+
+    @mock.patch('snapcraft.storeapi._store_client.download_segmented')
+    @mock.patch(
+        'snapcraft.storeapi._store_client.supports_segmented_download',
+        return_value=True)
+    def test_download_snap_resumes_pending_segments(self, mock_supports,
+                                                    mock_download):
+        def fake_download(uri, destination, size, *, session):
+            shutil.copyfile(os.path.join(
+                os.path.dirname(tests.__file__), 'data', 'test-snap.snap'),
+                destination)
+        mock_download.side_effect = fake_download
+        self.client.login('dummy', 'test correct password')
+        download_path = os.path.join(self.path, 'test-snap.snap')
+        # What a failed segmented download leaves behind.
+        with open(download_path, 'wb') as f:
+            f.truncate(1000)
+        open(download_path + '.segments', 'w').close()
+
+        with mock.patch('requests.head') as mock_head, mock.patch.object(
+                self.client.cpi, 'get', wraps=self.client.cpi.get) as spy:
+            # Redirected to the CDN that supports resuming.
+            def fake_head(url):
+                return mock.Mock(is_redirect=True,
+                                 headers={'Location': url + '?internap'})
+            mock_head.side_effect = fake_head
+            self.client.download('test-snap', 'test-channel', download_path)
+
+        # The preallocated file was not resumed from its full size.
+        for args, kwargs in spy.call_args_list:
+            if 'download-snap' in args[0]:
+                self.assertThat(kwargs.get('headers'), Equals({}))
+        mock_download.assert_called_once_with(
+            mock.ANY, download_path, mock.ANY,
+            session=self.client.cpi.session)
+
     def test_download_from_branded_store_requires_login(self):
         err = self.assertRaises(
             errors.SnapNotFoundError,
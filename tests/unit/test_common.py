@@ -15,6 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import threading
+from unittest import mock
 
 from testtools.matchers import Equals
 
@@ -40,6 +42,78 @@ class CommonTestCase(unit.TestCase):
         self.assertFalse(common.isurl('/fo:o'))
 
 
+class RunTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        common.reset_env()
+        self.addCleanup(common.reset_env)
+
+    def test_run_output_evaluates_env(self):
+        common.env = ['FOO="bar baz"', 'BAR="$FOO qux"']
+
+        self.assertThat(
+            common.run_output(['sh', '-c', 'echo "$BAR"']),
+            Equals('bar baz qux'))
+
+    def test_run_output_env_on_top_of_given_env(self):
+        common.env = ['FOO="$FOO:bar"']
+
+        self.assertThat(
+            common.run_output(['sh', '-c', 'echo "$FOO"'],
+                              env={'FOO': 'foo', 'PATH': os.environ['PATH']}),
+            Equals('foo:bar'))
+
+    def test_run_output_sets_pwd_to_cwd(self):
+        common.env = ['FOO=bar']
+        os.mkdir('dir')
+
+        self.assertThat(
+            common.run_output(['sh', '-c', 'echo "$PWD"'], cwd='dir'),
+            Equals(os.path.join(self.path, 'dir')))
+
+    def test_env_is_materialized_once(self):
+        common.env = ['FOO=bar']
+
+        with mock.patch('snapcraft.internal.common._materialize_env',
+                        wraps=common._materialize_env) as mock_materialize:
+            common.run(['true'])
+            common.run(['true'])
+            common.run_output(['true'])
+
+        mock_materialize.assert_called_once_with(os.environ)
+
+    def test_reset_env_drops_materialized_env(self):
+        common.env = ['FOO=bar']
+        common.run(['true'])
+
+        common.reset_env()
+        common.env = ['FOO=bar']
+
+        with mock.patch('snapcraft.internal.common._materialize_env',
+                        wraps=common._materialize_env) as mock_materialize:
+            common.run(['true'])
+
+        mock_materialize.assert_called_once_with(os.environ)
+
+    def test_thread_env_overrides_env_in_thread(self):
+        common.env = ['FOO=main']
+        outputs = []
+
+        def run_in_thread():
+            with common.thread_env(['FOO=thread']):
+                outputs.append(common.run_output(['sh', '-c', 'echo "$FOO"']))
+            outputs.append(common.run_output(['sh', '-c', 'echo "$FOO"']))
+
+        thread = threading.Thread(target=run_in_thread)
+        thread.start()
+        thread.join()
+
+        self.assertThat(outputs, Equals(['thread', 'main']))
+        self.assertThat(common.run_output(['sh', '-c', 'echo "$FOO"']),
+                        Equals('main'))
+
+
 class CommonMigratedTestCase(unit.TestCase):
 
     def test_parallel_build_count_migration_message(self):
@@ -429,6 +429,20 @@ class ErrorFormattingTestCase(unit.TestCase):
                 "again."
             )
         }),
+        ('PartsPullError', {
+            'exception': errors.PartsPullError,
+            'kwargs': {
+                'failures': {
+                    'part1': errors.PluginError('bad plugin'),
+                    'part2': errors.SnapcraftEnvironmentError('bad env'),
+                },
+            },
+            'expected_message': (
+                "Failed to pull 'part1' and 'part2':\n"
+                "- part1: Failed to load plugin: bad plugin\n"
+                "- part2: bad env"
+            )
+        }),
     )
 
     def test_error_formatting(self):
@@ -14,13 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import errno
 import os
 import re
 import subprocess
 from unittest import mock
 
 import fixtures
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileContains
 
 from snapcraft import file_utils
 from snapcraft.internal.errors import (
@@ -88,6 +89,39 @@ class ReplaceInFileTestCase(unit.TestCase):
             self.assertThat(f.read(), Equals(file_info['expected']))
 
 
+class BreakHardLinkTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open('shared', 'w') as f:
+            f.write('prefix=/usr')
+        os.chmod('shared', 0o444)
+        os.link('shared', 'linked')
+
+    def test_break_hard_link(self):
+        file_utils.break_hard_link('linked')
+
+        self.assertFalse(os.path.samefile('shared', 'linked'))
+        self.assertThat('linked', FileContains('prefix=/usr'))
+        self.assertThat(os.stat('linked').st_mode & 0o777, Equals(0o644))
+        self.assertThat(os.stat('shared').st_mode & 0o777, Equals(0o444))
+
+    def test_break_hard_link_not_linked(self):
+        os.unlink('linked')
+        inode = os.stat('shared').st_ino
+
+        file_utils.break_hard_link('shared')
+
+        self.assertThat(os.stat('shared').st_ino, Equals(inode))
+
+    def test_search_and_replace_contents_breaks_hard_link(self):
+        file_utils.search_and_replace_contents(
+            'linked', re.compile(r'prefix=/usr'), 'prefix=/install/usr')
+
+        self.assertThat('linked', FileContains('prefix=/install/usr'))
+        self.assertThat('shared', FileContains('prefix=/usr'))
+
+
 class TestLinkOrCopyTree(unit.TestCase):
 
     def setUp(self):
@@ -179,6 +213,93 @@ class TestLinkOrCopy(unit.TestCase):
         self.assertTrue(os.path.isfile('foo2/bar/baz/4'))
 
 
+class CloneOrLinkTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with open('source', 'w') as f:
+            f.write('data')
+
+    def test_clone_or_link(self):
+        file_utils.clone_or_link('source', 'destination')
+
+        with open('destination') as f:
+            self.assertThat(f.read(), Equals('data'))
+
+    def test_link_if_reflink_not_supported(self):
+        with mock.patch('fcntl.ioctl',
+                        side_effect=OSError(errno.EOPNOTSUPP, 'no')):
+            file_utils.clone_or_link('source', 'destination')
+
+        self.assertTrue(os.path.samefile('source', 'destination'))
+
+    def test_copy_if_link_fails(self):
+        with mock.patch('fcntl.ioctl',
+                        side_effect=OSError(errno.EOPNOTSUPP, 'no')):
+            with mock.patch('os.link', side_effect=OSError(errno.EXDEV,
+                                                           'no')):
+                file_utils.clone_or_link('source', 'destination')
+
+        self.assertFalse(os.path.samefile('source', 'destination'))
+        with open('destination') as f:
+            self.assertThat(f.read(), Equals('data'))
+
+    def test_replaces_destination(self):
+        with open('destination', 'w') as f:
+            f.write('old')
+        os.chmod('destination', 0o444)
+
+        file_utils.clone_or_link('source', 'destination')
+
+        with open('destination') as f:
+            self.assertThat(f.read(), Equals('data'))
+
+
+class CloneOrCopyTestCase(unit.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        with open('source', 'w') as f:
+            f.write('data')
+
+    def test_clone_or_copy(self):
+        file_utils.clone_or_copy('source', 'destination')
+
+        self.assertFalse(os.path.samefile('source', 'destination'))
+        with open('destination') as f:
+            self.assertThat(f.read(), Equals('data'))
+
+    def test_copy_if_reflink_not_supported(self):
+        with mock.patch('fcntl.ioctl',
+                        side_effect=OSError(errno.EOPNOTSUPP, 'no')):
+            file_utils.clone_or_copy('source', 'destination')
+
+        self.assertFalse(os.path.samefile('source', 'destination'))
+        with open('destination') as f:
+            self.assertThat(f.read(), Equals('data'))
+
+    def test_copy_symlink(self):
+        os.symlink('source', 'link')
+
+        file_utils.clone_or_copy('link', 'destination')
+
+        self.assertThat(os.readlink('destination'), Equals('source'))
+
+
+class HashingWriterTestCase(unit.TestCase):
+
+    def test_hexdigest(self):
+        with open('file', 'wb') as f:
+            writer = file_utils.HashingWriter(f, algorithm='sha384')
+            writer.write(b'Test ')
+            writer.write(b'fake file')
+
+        self.assertThat(writer.hexdigest(), Equals(
+            file_utils.calculate_hash('file', algorithm='sha384')))
+
+
 class ExecutableExistsTestCase(unit.TestCase):
 
     def test_file_does_not_exist(self):
@@ -15,15 +15,18 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import fixtures
+import json
 import os
 import progressbar
 import requests
+import urllib3
 from unittest.mock import patch
 
-from testtools.matchers import Equals
+from testtools.matchers import Equals, FileExists, Not
 
-from snapcraft.internal import indicators
-from tests import unit
+from snapcraft import file_utils
+from snapcraft.internal import errors, indicators
+from tests import fake_servers, unit
 
 
 class DumbTerminalTests(unit.TestCase):
@@ -99,7 +102,246 @@ class IndicatorsDownloadTests(unit.FakeFileHTTPServerBasedTestCase):
 
         self.assertTrue(os.path.exists(self.dest_file))
 
+    def test_download_request_stream_with_algorithm(self):
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digest = indicators.download_requests_stream(
+            request, self.dest_file, algorithm='sha384')
+
+        self.assertThat(digest, Equals(file_utils.calculate_hash(
+            self.dest_file, algorithm='sha384')))
+
+    def test_download_request_stream_resumed_with_algorithm(self):
+        with open(self.dest_file, 'wb') as f:
+            f.write(b'Resumed ')
+        request = requests.get(self.source, stream=True, allow_redirects=True)
+        digest = indicators.download_requests_stream(
+            request, self.dest_file, total_read=8, algorithm='sha384')
+
+        self.assertThat(digest, Equals(file_utils.calculate_hash(
+            self.dest_file, algorithm='sha384')))
+
     def test_download_urllib_source(self):
         indicators.download_urllib_source(self.source, self.dest_file)
 
         self.assertTrue(os.path.exists(self.dest_file))
+
+
+class _FakeRaw:
+    """Serve size bytes, recording how much was asked for on each read."""
+
+    def __init__(self, size, *, error=None):
+        self._left = size
+        self._error = error
+        self.requested = []
+
+    def read(self, amt, decode_content=None):
+        self.requested.append(amt)
+        if self._error and not self._left:
+            raise self._error
+        read = min(amt, self._left)
+        self._left -= read
+        return b'x' * read
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class _FakeRequest:
+
+    def __init__(self, raw, headers=None):
+        self.raw = raw
+        self.headers = headers if headers else {}
+
+
+class IterRequestChunksTests(unit.TestCase):
+
+    def test_chunk_size_grows(self):
+        raw = _FakeRaw(40 * 2**20)
+        chunks = [len(c) for c in indicators.iter_request_chunks(
+            _FakeRequest(raw))]
+
+        self.assertThat(sum(chunks), Equals(40 * 2**20))
+        self.assertThat(raw.requested[:5], Equals(
+            [2**20, 2 * 2**20, 4 * 2**20, 8 * 2**20, 8 * 2**20]))
+
+    @patch('time.monotonic')
+    def test_chunk_size_shrinks_on_slow_reads(self, mock_monotonic):
+        # Two fast reads followed by slow ones.
+        mock_monotonic.side_effect = [0, 0, 0, 0, 0, 2, 2, 4, 4, 6, 6, 8, 8]
+        raw = _FakeRaw(11 * 2**20)
+        list(indicators.iter_request_chunks(_FakeRequest(raw)))
+
+        self.assertThat(raw.requested, Equals(
+            [2**20, 2 * 2**20, 4 * 2**20, 2 * 2**20, 2**20, 2**20, 2**20]))
+
+    def test_readinto_reuses_buffer(self):
+        raw = _FakeRaw(3 * 2**20)
+        with patch.object(raw, 'read', wraps=raw.read) as mock_read:
+            chunks = list(indicators.iter_request_chunks(_FakeRequest(raw)))
+
+        # Only the buffer given to readinto was filled in.
+        self.assertThat(mock_read.call_count, Equals(3))
+        self.assertTrue(all(isinstance(c, memoryview) for c in chunks))
+        self.assertThat(len({id(c.obj) for c in chunks}), Equals(1))
+
+    def test_content_encoded_is_decoded(self):
+        raw = _FakeRaw(10)
+        with patch.object(raw, 'read', wraps=raw.read) as mock_read:
+            chunks = list(indicators.iter_request_chunks(
+                _FakeRequest(raw, {'Content-Encoding': 'gzip'})))
+
+        self.assertThat(chunks, Equals([b'x' * 10]))
+        mock_read.assert_called_with(2**20, decode_content=True)
+
+    def test_protocol_error_raises_chunked_encoding_error(self):
+        raw = _FakeRaw(10, error=urllib3.exceptions.ProtocolError('broken'))
+
+        self.assertRaises(
+            requests.exceptions.ChunkedEncodingError, list,
+            indicators.iter_request_chunks(_FakeRequest(raw)))
+
+
+class DownloadRequestsStreamProgressTests(unit.TestCase):
+
+    @patch('time.monotonic', return_value=10.0)
+    @patch('snapcraft.internal.indicators._init_progress_bar')
+    def test_progress_updates_are_throttled(self, mock_init, mock_monotonic):
+        raw = _FakeRaw(3 * 2**20)
+        indicators.download_requests_stream(
+            _FakeRequest(raw, {'Content-Length': str(3 * 2**20)}), 'file')
+
+        progress_bar = mock_init.return_value
+        # Time is frozen so only the first chunk is reported.
+        progress_bar.update.assert_called_once_with(2**20)
+        progress_bar.finish.assert_called_once_with()
+        self.assertThat(os.path.getsize('file'), Equals(3 * 2**20))
+
+
+class SupportsSegmentedDownloadTests(unit.TestCase):
+
+    scenarios = [
+        ('large', dict(headers={
+            'Accept-Ranges': 'bytes', 'Content-Length': str(2**30)},
+            expected=True)),
+        ('small', dict(headers={
+            'Accept-Ranges': 'bytes', 'Content-Length': '10'},
+            expected=False)),
+        ('no ranges', dict(headers={
+            'Accept-Ranges': 'none', 'Content-Length': str(2**30)},
+            expected=False)),
+        ('encoded', dict(headers={
+            'Accept-Ranges': 'bytes', 'Content-Length': str(2**30),
+            'Content-Encoding': 'gzip'},
+            expected=False)),
+    ]
+
+    def test_supports_segmented_download(self):
+        self.assertThat(indicators.supports_segmented_download(
+            _FakeRequest(None, self.headers)), Equals(self.expected))
+
+
+class SegmentedDownloadTests(unit.FakeFileHTTPServerBasedTestCase):
+
+    def setUp(self):
+        # Fresh class attributes for each test.
+        self.request_handler = type(
+            'Handler', (fake_servers.FakeRangeHTTPRequestHandler,),
+            dict(ranges=[], short_offsets=set()))
+        super().setUp()
+
+        self.data = os.urandom(1000)
+        with open('file', 'wb') as f:
+            f.write(self.data)
+        self.uri = 'http://{}:{}/file'.format(*self.server.server_address)
+        os.mkdir('dst')
+        self.dest_file = os.path.join('dst', 'file')
+
+    def assert_downloaded(self):
+        with open(self.dest_file, 'rb') as f:
+            self.assertThat(f.read(), Equals(self.data))
+        self.assertThat(self.dest_file + '.segments', Not(FileExists()))
+
+    def test_download_segmented(self):
+        digest = indicators.download_segmented(
+            self.uri, self.dest_file, len(self.data), segments=4,
+            algorithm='sha384')
+
+        self.assert_downloaded()
+        self.assertThat(digest, Equals(file_utils.calculate_hash(
+            'file', algorithm='sha384')))
+        self.assertThat(sorted(self.request_handler.ranges), Equals([
+            'bytes=0-249', 'bytes=250-499', 'bytes=500-749',
+            'bytes=750-999']))
+
+    @patch('time.sleep')
+    def test_short_segment_is_retried(self, mock_sleep):
+        self.request_handler.short_offsets.add(500)
+
+        indicators.download_segmented(
+            self.uri, self.dest_file, len(self.data), segments=4)
+
+        self.assert_downloaded()
+        # The retry picks up after what was received.
+        self.assertThat(sorted(self.request_handler.ranges), Equals([
+            'bytes=0-249', 'bytes=250-499', 'bytes=500-749',
+            'bytes=625-749', 'bytes=750-999']))
+
+    def test_resume_segments(self):
+        # The first half of each of two segments was fetched before.
+        with open(self.dest_file, 'wb') as f:
+            f.write(self.data[:250] + bytes(750))
+        with open(self.dest_file + '.segments', 'w') as f:
+            json.dump({'uri': self.uri, 'size': len(self.data),
+                       'segments': [[250, 499], [750, 999]]}, f)
+
+        indicators.download_segmented(
+            self.uri, self.dest_file, len(self.data), segments=4)
+
+        # Nothing fetched before was fetched again, as the assertion on
+        # the content shows what was missing is all there now.
+        self.assertThat(sorted(self.request_handler.ranges), Equals([
+            'bytes=250-499', 'bytes=750-999']))
+        with open(self.dest_file, 'rb') as f:
+            content = f.read()
+        self.assertThat(content[250:500], Equals(self.data[250:500]))
+        self.assertThat(content[750:], Equals(self.data[750:]))
+
+    def test_stale_state_is_ignored(self):
+        with open(self.dest_file + '.segments', 'w') as f:
+            json.dump({'uri': self.uri, 'size': 10,
+                       'segments': [[5, 9]]}, f)
+
+        indicators.download_segmented(
+            self.uri, self.dest_file, len(self.data), segments=2)
+
+        self.assert_downloaded()
+        self.assertThat(sorted(self.request_handler.ranges), Equals([
+            'bytes=0-499', 'bytes=500-999']))
+
+    def test_failed_segment_keeps_state(self):
+        self.request_handler.short_offsets.add(0)
+
+        with patch('snapcraft.internal.indicators._SEGMENT_RETRIES', 1):
+            self.assertRaises(
+                requests.exceptions.ChunkedEncodingError,
+                indicators.download_segmented,
+                self.uri, self.dest_file, len(self.data), segments=2)
+
+        with open(self.dest_file + '.segments') as f:
+            state = json.load(f)
+        self.assertThat(state['segments'], Equals([[250, 499], [1000, 999]]))
+
+    def test_range_not_supported(self):
+        self.request_handler.ignore_ranges = True
+
+        raised = self.assertRaises(
+            errors.DownloadRangeNotSupportedError,
+            indicators.download_segmented,
+            self.uri, self.dest_file, len(self.data))
+
+        self.assertThat(raised.status_code, Equals(200))
+        # Nothing is left behind to resume from.
+        self.assertFalse(os.path.exists(self.dest_file))
+        self.assertFalse(os.path.exists(self.dest_file + '.segments'))
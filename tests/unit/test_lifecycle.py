@@ -24,6 +24,7 @@ import shutil
 import subprocess
 import sys
 import textwrap
+import threading
 from unittest import mock
 
 import fixtures
@@ -631,6 +632,103 @@ class ExecutionTestCase(BaseLifecycleTestCase):
                 "The 'bar' and 'foo' project options appear to have changed.\n"
             ))
 
+    def test_changed_local_source_rebuilds(self):
+        os.mkdir('src')
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('old')
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: dump
+                    source: src
+                """))
+
+        lifecycle.execute('build', self.project_options)
+
+        # Reset logging since we only care about the following
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        os.remove(os.path.join('src', 'file'))
+        with open(os.path.join('src', 'file'), 'w') as f:
+            f.write('new')
+
+        lifecycle.execute('build', self.project_options)
+
+        self.assertThat(
+            self.fake_logger.output,
+            Equals('Skipping cleaning priming area for part1 (source '
+                   'changed) (already clean)\n'
+                   'Skipping cleaning staging area for part1 (source '
+                   'changed) (already clean)\n'
+                   'Cleaning build for part1 (source changed)\n'
+                   'Preparing to pull part1 \n'
+                   'Pulling part1 \n'
+                   'Preparing to build part1 \n'
+                   'Building part1 \n'))
+        self.assertThat(
+            os.path.join(self.parts_dir, 'part1', 'build', 'file'),
+            FileContains('new'))
+
+    def test_unchanged_local_source_skips_pull(self):
+        os.mkdir('src')
+        open(os.path.join('src', 'file'), 'w').close()
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: dump
+                    source: src
+                """))
+
+        lifecycle.execute('pull', self.project_options)
+
+        # Reset logging since we only care about the following
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        lifecycle.execute('pull', self.project_options)
+
+        self.assertThat(
+            self.fake_logger.output,
+            Equals('Skipping pull part1 (already ran)\n'))
+
+    @mock.patch('snapcraft.internal.lifecycle._packer.repo.check_for_command')
+    @mock.patch('snapcraft.internal.lifecycle._packer._run_mksquashfs')
+    def test_packed_project_source_does_not_rebuild(
+            self, mock_run_mksquashfs, mock_check_for_command):
+        def _run_mksquashfs(mksquashfs_path, *, output_snap_name, **kwargs):
+            with open(output_snap_name, 'w') as f:
+                f.write('snap')
+        mock_run_mksquashfs.side_effect = _run_mksquashfs
+        # Keep the cache, which changes on every run, out of the project.
+        self.useFixture(fixture_setup.TempXDG(
+            self.useFixture(fixtures.TempDir()).path))
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: dump
+                    source: .
+                """))
+
+        snap_name = lifecycle.snap(self.project_options)
+        # As written next to the snap by older versions.
+        with open(snap_name + '.digest', 'w') as f:
+            f.write('{}')
+
+        # Reset logging since we only care about the following
+        self.fake_logger = fixtures.FakeLogger(level=logging.INFO)
+        self.useFixture(self.fake_logger)
+
+        lifecycle.snap(self.project_options)
+
+        self.assertThat(self.fake_logger.output, Contains(
+            'Skipping pull part1 (already ran)\n'
+            'Skipping build part1 (already ran)\n'))
+        self.assertThat(self.fake_logger.output, Contains('Reusing'))
+
     @mock.patch.object(snapcraft.BasePlugin, 'enable_cross_compilation')
     @mock.patch('snapcraft.repo.Repo.install_build_packages')
     def test_pull_is_dirty_if_target_arch_changes(
@@ -697,6 +795,134 @@ class ExecutionTestCase(BaseLifecycleTestCase):
         lifecycle.execute('pull', self.project_options)
 
 
+class ConcurrentPullTestCase(BaseLifecycleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                  part2:
+                    plugin: nil
+                  part3:
+                    plugin: nil
+                    after:
+                      - part1
+                """))
+
+    def test_parts_are_pulled_concurrently(self):
+        # Only returns once part1 and part2 are being pulled at once.
+        barrier = threading.Barrier(2, timeout=10)
+        original_pull = pluginhandler.PluginHandler.pull
+
+        def _fake_pull(part, force=False):
+            if part.name != 'part3':
+                logging.getLogger(__name__).info(
+                    'Waiting in {}'.format(part.name))
+                barrier.wait()
+            original_pull(part, force)
+
+        with mock.patch.object(pluginhandler.PluginHandler, 'pull',
+                               _fake_pull):
+            lifecycle.execute('pull', self.project_options)
+
+        self.assertThat(
+            self.fake_logger.output,
+            Equals('Preparing to pull part1 \n'
+                   'Waiting in part1\n'
+                   'Pulling part1 \n'
+                   'Preparing to pull part2 \n'
+                   'Waiting in part2\n'
+                   'Pulling part2 \n'
+                   '\'part3\' has prerequisites that need to be staged: '
+                   'part1\n'
+                   'Preparing to build part1 \n'
+                   'Building part1 \n'
+                   'Staging part1 \n'
+                   'Preparing to pull part3 \n'
+                   'Pulling part3 \n'))
+
+    def test_pull_jobs_from_environment(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_PULL_JOBS', '1'))
+        pull_threads = set()
+        original_pull = pluginhandler.PluginHandler.pull
+
+        def _fake_pull(part, force=False):
+            pull_threads.add(threading.current_thread())
+            original_pull(part, force)
+
+        with mock.patch.object(pluginhandler.PluginHandler, 'pull',
+                               _fake_pull):
+            lifecycle.execute('pull', self.project_options)
+
+        self.assertThat(pull_threads, Equals({threading.main_thread()}))
+
+    def test_invalid_pull_jobs(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'SNAPCRAFT_PULL_JOBS', '0'))
+
+        raised = self.assertRaises(
+            errors.InvalidPullJobsError,
+            lifecycle.execute, 'pull', self.project_options)
+
+        self.assertThat(raised.jobs, Equals('0'))
+
+    def test_pull_failure_is_raised(self):
+        original_pull = pluginhandler.PluginHandler.pull
+
+        def _fake_pull(part, force=False):
+            if part.name == 'part2':
+                raise errors.SnapcraftEnvironmentError('part2 failed')
+            original_pull(part, force)
+
+        with mock.patch.object(pluginhandler.PluginHandler, 'pull',
+                               _fake_pull):
+            raised = self.assertRaises(
+                errors.SnapcraftEnvironmentError,
+                lifecycle.execute, 'pull', self.project_options)
+
+        self.assertThat(str(raised), Equals('part2 failed'))
+        # The other part got pulled all the same.
+        self.assertThat(
+            self.fake_logger.output, Contains('Pulling part1 \n'))
+
+    def test_pull_failures_are_raised_together(self):
+        def _fake_pull(part, force=False):
+            raise errors.SnapcraftEnvironmentError(
+                '{} failed'.format(part.name))
+
+        with mock.patch.object(pluginhandler.PluginHandler, 'pull',
+                               _fake_pull):
+            raised = self.assertRaises(
+                errors.PartsPullError,
+                lifecycle.execute, 'pull', self.project_options)
+
+        self.assertThat(list(raised.failures), Equals(['part1', 'part2']))
+
+    def test_parts_are_pulled_with_their_env(self):
+        self.make_snapcraft_yaml(
+            textwrap.dedent("""\
+                parts:
+                  part1:
+                    plugin: nil
+                    override-pull: echo "$SNAPCRAFT_PART_INSTALL" > install
+                  part2:
+                    plugin: nil
+                    override-pull: echo "$SNAPCRAFT_PART_INSTALL" > install
+                """))
+
+        lifecycle.execute('pull', self.project_options)
+
+        for part_name in ('part1', 'part2'):
+            self.assertThat(
+                os.path.join(self.parts_dir, part_name, 'src', 'install'),
+                FileContains(os.path.join(
+                    self.parts_dir, part_name, 'install') + '\n'))
+
+
 class DirtyBuildScriptletTestCase(BaseLifecycleTestCase):
 
     scenarios = (
@@ -124,6 +124,15 @@ class TestClearExecstack(unit.TestCase):
         self.assertThat('{}.execstack'.format(elf_files[0].path),
                         FileExists())
 
+    def test_execstack_breaks_hard_link(self):
+        elf_file = self.fake_elf['fake_elf-with-execstack']
+        shared_path = os.path.join(self.path, 'shared')
+        os.link(elf_file.path, shared_path)
+
+        mangling.clear_execstack(elf_files=[elf_file])
+
+        self.assertFalse(os.path.samefile(elf_file.path, shared_path))
+
     def test_bad_execstack_does_not_blow_up(self):
         elf_files = [self.fake_elf['fake_elf-with-bad-execstack']]
 
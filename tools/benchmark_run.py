@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2018 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Measure the per call overhead of snapcraft.internal.common.run.
+
+Compares running a command through a temporary env script and /bin/sh (as
+common.run used to) with running it with the materialized environment.
+
+Usage: PYTHONPATH=. tools/benchmark_run.py [iterations]
+"""
+
+import subprocess
+import sys
+import tempfile
+import time
+
+from snapcraft.internal import common
+
+
+def _run_with_script(cmd):
+    with tempfile.NamedTemporaryFile(mode='w+') as f:
+        f.write(common.assemble_env())
+        f.write('\n')
+        f.write('exec "$@"')
+        f.flush()
+        subprocess.check_call(['/bin/sh', f.name] + cmd)
+
+
+def _measure(run, iterations):
+    start = time.monotonic()
+    for _ in range(iterations):
+        run(['true'])
+    return (time.monotonic() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    # Roughly the size of the env of a part with a few dependencies.
+    common.env = ['PATH="/stage/{0}/usr/bin:$PATH"'.format(i)
+                  for i in range(50)]
+    common.env += ['CFLAGS="$CFLAGS -I/stage/{0}/usr/include"'.format(i)
+                   for i in range(50)]
+
+    script = _measure(_run_with_script, iterations)
+    materialized = _measure(common.run, iterations)
+
+    print('env script:       {:.3f} ms per call'.format(script * 1000))
+    print('materialized env: {:.3f} ms per call'.format(materialized * 1000))
+    print('speedup:          {:.2f}x'.format(script / materialized))
+
+
+if __name__ == '__main__':
+    main()